@@ -1,9 +1,6 @@
-from calendar import c
-import re
 from PySide6.QtCore import QRect, QRectF, Qt, Signal
 from PySide6.QtGui import QPainter, QPainterPath, QPen, QBrush, QColor, QFont
 from PySide6.QtWidgets import QPushButton
-from numpy import rec
 
 
 class DecorativeButton(QPushButton):
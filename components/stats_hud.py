@@ -0,0 +1,64 @@
+from PySide6.QtCore import QTimer, Qt
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QLabel, QWidget
+from controllers.stage_timers import StageTimers
+
+hud_css = """
+            QLabel {
+                background-color: rgba(0, 0, 0, 180);
+                color: #7CFC00;
+                padding: 8px;
+                border-radius: 6px;
+            }
+        """
+
+
+class StatsHud(QLabel):
+    """
+    Overlay showing preview FPS, dropped frames and per-stage latency percentiles.
+
+    Refreshes twice a second while shown. The stage timers are held on while
+    it is shown, see StageTimers.acquire.
+    """
+
+    def __init__(self, timers: StageTimers, parent: QWidget) -> None:
+        super().__init__(parent)
+        self._timers = timers
+        self.setFont(QFont("Monospace", 9))
+        self.setStyleSheet(hud_css)
+        self.setTextFormat(Qt.TextFormat.PlainText)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def toggle(self):
+        if self.isVisible():
+            self._timer.stop()
+            self._timers.release()
+            self.hide()
+        else:
+            self._timers.acquire()
+            self.refresh()
+            self.show()
+            self.raise_()
+            self._timer.start(500)
+
+    def refresh(self):
+        counters = self._timers.counters()
+        lines = [
+            f"camera {self._timers.rate('camera_frames'):5.1f} fps   "
+            f"preview {self._timers.rate('preview_frames'):5.1f} fps",
+            f"dropped {counters.get('dropped_frames', 0)}   "
+            f"read failures {counters.get('camera_read_failures', 0)}",
+            "",
+            f"{'stage':<16}{'n':>5}{'p50':>8}{'p95':>8}{'p99':>8}  ms",
+        ]
+        for stage, stats in sorted(self._timers.snapshot().items()):
+            lines.append(
+                f"{stage:<16}{stats['count']:>5}{stats['p50_ms']:>8.1f}"
+                f"{stats['p95_ms']:>8.1f}{stats['p99_ms']:>8.1f}"
+            )
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.move(10, 10)
@@ -1,5 +1,6 @@
-from PIL import Image
-from utils.utils import get_png_file_paths
+import json
+import os
+from pathlib import Path
 
 
 def rgb_to_hex(r, g, b):
@@ -43,31 +44,179 @@ templates_config = {
     },
 }
 
-templates_path = get_png_file_paths("./resources/templates/v0.1/")
-# print(templates_path)
+TEMPLATES_DIR = "./resources/templates/v0.1/"
+
+"""Cached per-template metadata so startup only opens new or modified templates."""
+MANIFEST_FILENAME = ".template_manifest.json"
+MANIFEST_VERSION = 1
 
 templates_config_dict = dict()
 
 
+def _layout_for(template_path):
+    """Return (layout kind, layout key in templates_config) for a template file."""
+    # Only the file name, folders above it may contain "horizontal" too
+    if "horizontal" in Path(template_path).name.lower():
+        return "horizontal", 4
+    return "vertical", 8
+
+
+def _scan_template_files(directory):
+    """
+    Recursively find PNG templates and stat them.
+
+    Returns:
+        dict: Absolute path to os.stat_result, for every PNG under directory
+    """
+    found = {}
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(".png") and entry.is_file():
+                    found[str(Path(entry.path).absolute())] = entry.stat()
+    return found
+
+
+def _examine_template(template_path, stat, relative_path):
+    """Open a template to build its manifest entry."""
+    # PIL is only needed for templates missing from the manifest
+    from PIL import Image
+
+    with Image.open(template_path) as img:
+        pixel_10_rgb = img.getpixel((10, 10))
+    if pixel_10_rgb is None or type(pixel_10_rgb) != tuple or len(pixel_10_rgb) < 3:
+        raise Exception(f"Could not get pixel at (10,10) for {template_path}")
+    # print(f"Pixel at (10,10): {pixel_10_rgb}")
+    layout, layout_key = _layout_for(template_path)
+    return {
+        "path": relative_path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "layout": layout,
+        "color": list(pixel_10_rgb),
+        "slots": [list(slot) for slot in templates_config[layout_key]["slots"]],
+    }
+
+
+def _is_entry_current(entry, stat):
+    """Check a manifest entry still matches the file and the hardcoded slots."""
+    if entry is None:
+        return False
+    if entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime_ns:
+        return False
+    layout_key = 4 if entry.get("layout") == "horizontal" else 8
+    return entry.get("slots") == [list(s) for s in templates_config[layout_key]["slots"]]
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return {entry["path"]: entry for entry in manifest["templates"]}
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ignoring unreadable template manifest {manifest_path}: {e}")
+    return {}
+
+
+def _save_manifest(manifest_path, entries):
+    tmp_path = f"{manifest_path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "templates": entries}, f, indent=2
+            )
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        print(f"Could not write template manifest {manifest_path}: {e}")
+
+
+def index_templates(directory=TEMPLATES_DIR, known_paths=None):
+    """
+    Index the templates on disk without touching templates_config_dict.
+
+    Templates whose size and mtime match the manifest are taken from it,
+    only new or modified files are opened. Files that cannot be read, e.g.
+    still being copied, are left out until they are indexed again. The
+    manifest is rewritten when anything changed. Safe to call from a worker
+    thread.
+
+    Args:
+        directory: Templates directory to index
+        known_paths: Paths currently indexed, used to report removals
+            (defaults to the keys of templates_config_dict)
+
+    Returns:
+        tuple: (config, changed) where config is the new templates_config_dict
+            content in sorted order and changed is the set of absolute paths
+            that were added, modified or removed
+    """
+    if known_paths is None:
+        known_paths = set(templates_config_dict)
+    else:
+        known_paths = set(known_paths)
+
+    manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+    manifest = _load_manifest(manifest_path)
+    found = _scan_template_files(directory)
+
+    entries = {}
+    examined = set()
+    for template_path in sorted(found):
+        stat = found[template_path]
+        relative_path = os.path.relpath(template_path, os.path.abspath(directory))
+        entry = manifest.get(relative_path)
+        if not _is_entry_current(entry, stat):
+            try:
+                entry = _examine_template(template_path, stat, relative_path)
+            except Exception as e:
+                print(f"Skipping unreadable template {template_path}: {e}")
+                continue
+            examined.add(template_path)
+        entries[template_path] = entry
+
+    stale_manifest = set(manifest) != {e["path"] for e in entries.values()}
+    if examined or stale_manifest:
+        _save_manifest(manifest_path, list(entries.values()))
+
+    # Sorted order, swatches are shown in this order
+    config = {}
+    for template_path, entry in entries.items():
+        layout_key = 4 if entry["layout"] == "horizontal" else 8
+        config[template_path] = {
+            "num_photos": layout_key,
+            "display_text": "2 x 2" if layout_key == 4 else "2 x 4",
+            "color": tuple(entry["color"]),
+            "slots": templates_config[layout_key]["slots"],
+        }
+
+    changed = examined | (known_paths ^ set(config))
+    return config, changed
+
+
+def apply_templates_config(config):
+    """Replace the content of templates_config_dict, keeping the same dict object."""
+    templates_config_dict.clear()
+    templates_config_dict.update(config)
+
+
+def update_templates_config_dict(directory=TEMPLATES_DIR):
+    """
+    Bring templates_config_dict in line with the templates on disk.
+
+    Returns:
+        set: Absolute paths of templates that were added, modified or removed
+    """
+    config, changed = index_templates(directory)
+    apply_templates_config(config)
+    return changed
+
+
 def initialize_templates_config_dict():
-    templates_path.sort()
-    for template in templates_path:
-        pixel_10_rgb = Image.open(template).getpixel((10, 10))
-        if pixel_10_rgb is None or type(pixel_10_rgb) != tuple or len(pixel_10_rgb) < 3:
-            raise Exception(f"Could not get pixel at (10,10) for {template}")
-        # print(f"Pixel at (10,10): {pixel_10_rgb}")
-        if "horizontal" in template.lower():
-            templates_config_dict[template] = {
-                "num_photos": 4,
-                "display_text": "2 x 2",
-                "color": pixel_10_rgb,
-                "slots": templates_config[4]["slots"],
-            }
-        else:
-            templates_config_dict[template] = {
-                "num_photos": 8,
-                "display_text": "2 x 4",
-                "color": pixel_10_rgb,
-                "slots": templates_config[8]["slots"],
-            }
+    update_templates_config_dict()
     # print(f"Initialized templates_config_dict: {templates_config_dict.keys()}")
@@ -5,6 +5,8 @@ import os
 from dotenv import load_dotenv
 from PIL import Image
 import io
+import time
+from controllers.stage_timers import stage_timers
 
 load_dotenv()
 
@@ -25,10 +27,12 @@ class CameraController(QObject):
         self._frames_to_skip = 90  # Skip first N frames to hide startup logo
         self._frame_count = 0
         self._ready_emitted = False
+        self._last_frame_at = None
 
     def start_camera(self, camera_index: int = 0):
         self._camera = cv.VideoCapture(camera_index)
         if not self._camera.isOpened():
+            stage_timers.count("camera_reconnects")
             self._camera = cv.VideoCapture(camera_index)
 
         if self._is_running:
@@ -76,7 +80,8 @@ class CameraController(QObject):
     def _update_frame(self):
         if not self._camera or not self._camera.isOpened():
             return
-        ret, frame = self._camera.read()
+        with stage_timers.time("camera_read"):
+            ret, frame = self._camera.read()
         if ret:
             # Skip initial frames to hide camera startup logo
             if self._frame_count < self._frames_to_skip:
@@ -90,10 +95,27 @@ class CameraController(QObject):
                     self.camera_ready.emit()
                 return
 
+            if stage_timers.enabled:
+                self._count_frame()
+            else:
+                # The gap while the timers were off is not dropped frames
+                self._last_frame_at = None
             self.frame_ready.emit(frame)
         else:
+            stage_timers.count("camera_read_failures")
             self.camera_error.emit("Failed to read frame")
 
+    def _count_frame(self):
+        """Record a frame and count timer ticks lost to a busy GUI thread as dropped."""
+        now = time.perf_counter()
+        if self._last_frame_at is not None:
+            interval_s = self._timer.interval() / 1000
+            missed = round((now - self._last_frame_at) / interval_s) - 1
+            if missed > 0:
+                stage_timers.count("dropped_frames", missed)
+        self._last_frame_at = now
+        stage_timers.event("camera_frames")
+
     def capture_photo(self):
         """
         Capture a photo.
@@ -103,7 +125,8 @@ class CameraController(QObject):
         """
         if not self._camera or not self._camera.isOpened():
             return None
-        ret, frame = self._camera.read()
+        with stage_timers.time("capture"):
+            ret, frame = self._camera.read()
         if ret:
             print(f"Captured {frame.shape[1]}×{frame.shape[0]} image via OpenCV")
             return frame
@@ -0,0 +1,143 @@
+import datetime
+import itertools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+import cv2 as cv
+from PIL import Image
+from controllers.image_processor import ImageProcessor, RenderQuality
+from controllers.stage_timers import stage_timers
+
+
+class CompositePipeline:
+    """
+    Renders the final print composite and saves it to disk in the background.
+
+    Rendering and encoding run on separate single-thread workers so a save
+    can overlap the render of the next composite. Both stages hand back
+    futures; nothing here touches Qt, callers marshal results back to the
+    GUI thread themselves.
+    """
+
+    def __init__(self, image_processor: Optional[ImageProcessor] = None) -> None:
+        # Only used from the render worker, keeps decoded templates cached
+        self._image_processor = image_processor or ImageProcessor()
+        self._render_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="composite_render"
+        )
+        self._save_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="composite_save"
+        )
+        self._preload_futures: List[Future] = []
+
+    def submit_render(
+        self, photo_paths: List[str], template_path: str, session_id: Optional[str] = None
+    ) -> Future:
+        """
+        Queue a print quality composite render.
+
+        session_id attributes the render in the session trace.
+
+        Returns:
+            Future resolving to the composite (BGR numpy array)
+        """
+        return self._render_executor.submit(
+            self._render, list(photo_paths), template_path, session_id
+        )
+
+    def submit_save(
+        self,
+        render_future: Future,
+        photo_paths: List[str],
+        output_dir,
+        session_id: Optional[str] = None,
+    ) -> Future:
+        """
+        Queue encoding of a rendered composite once its render finishes.
+
+        The DPI of the first photo is written to the PNG, defaulting to 300.
+
+        Returns:
+            Future resolving to the path of the saved composite
+        """
+        return self._save_executor.submit(
+            self._save, render_future, list(photo_paths), str(output_dir), session_id
+        )
+
+    def preload_templates(self, template_paths):
+        """Decode templates into the worker's cache ahead of the first render."""
+        self._preload_futures = [
+            self._render_executor.submit(
+                self._image_processor.load_template, template_path
+            )
+            for template_path in template_paths
+        ]
+
+    def cancel_preloads(self):
+        """Drop template decodes not started yet, so a guest's render goes first."""
+        for future in self._preload_futures:
+            future.cancel()
+        self._preload_futures = []
+
+    def invalidate_templates(self, template_paths):
+        """Drop cached decodes of changed templates, in order with queued renders."""
+        self._render_executor.submit(
+            self._image_processor.invalidate_templates, list(template_paths)
+        )
+
+    def shutdown(self):
+        """Drop queued work and stop both workers."""
+        self._render_executor.shutdown(wait=False, cancel_futures=True)
+        self._save_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _render(self, photo_paths: List[str], template_path: str, session_id=None):
+        with stage_timers.time("composite", session_id):
+            return self._image_processor.create_photo_composite(
+                photo_paths, template_path, RenderQuality.PRINT
+            )
+
+    @staticmethod
+    def _save(
+        render_future: Future, photo_paths: List[str], output_dir: str, session_id=None
+    ) -> str:
+        composite = render_future.result()
+        with stage_timers.time("composite_save", session_id):
+            return CompositePipeline._write(composite, photo_paths, output_dir)
+
+    @staticmethod
+    def _write(composite, photo_paths: List[str], output_dir: str) -> str:
+        # Get DPI from the photos (preserves original or defaults to 300)
+        dpi = ImageProcessor._get_image_dpi(photo_paths[0]) if photo_paths else (300, 300)
+
+        # Convert BGR to RGB for PIL
+        composite_rgb = cv.cvtColor(composite, cv.COLOR_BGR2RGB)
+
+        # Save with PIL to preserve/set DPI
+        img = Image.fromarray(composite_rgb)
+        output_path, f = _create_composite_file(output_dir)
+        with f:
+            img.save(f, format="PNG", dpi=dpi)
+        print(f"Composite saved to: {output_path} (DPI: {dpi})")
+        return output_path
+
+
+def _create_composite_file(output_dir: str):
+    """
+    Create a composite file that does not overwrite an earlier one.
+
+    A guest can go back and save another layout within the same second,
+    while the earlier composite is queued for printing or download, so names
+    have milliseconds and a counter if that is not enough.
+
+    Returns:
+        (path, file opened for writing)
+    """
+    now = datetime.datetime.now()
+    base_name = f"{now:final_composite_%Y%m%d_%H%M%S}_{now.microsecond // 1000:03d}"
+    name = base_name
+    for attempt in itertools.count(1):
+        path = os.path.join(output_dir, f"{name}.png")
+        try:
+            return path, open(path, "xb")
+        except FileExistsError:
+            name = f"{base_name}_{attempt}"
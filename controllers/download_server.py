@@ -0,0 +1,309 @@
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import socket
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import formatdate
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+import cv2 as cv
+
+_TOKEN_RE = re.compile(r"^[0-9a-f]{20}$")
+_FILE_RE = re.compile(r"^[\w.-]+\.jpg$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class DownloadServer:
+    """
+    Local HTTP service for guests to download their composite.
+
+    Every session gets an unguessable URL, derived from the session id with a
+    secret kept in the downloads directory, so it is known before the
+    composite is saved and stays valid across restarts. Web sized JPEGs are
+    made on one background worker when a composite is saved; the worker is
+    paused while the camera screen is capturing. Files are served with
+    ETag/Last-Modified conditional GET and single byte range support. Old
+    token folders are removed by the housekeeper.
+    """
+
+    def __init__(
+        self,
+        downloads_dir,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        public_url: Optional[str] = None,
+        sizes: Sequence[int] = (1600, 800),
+        jpeg_quality: int = 85,
+        path_resolver: Optional[Callable[[str], str]] = None,
+    ) -> None:
+        self.downloads_dir = Path(downloads_dir)
+        self.downloads_dir.mkdir(parents=True, exist_ok=True)
+        self._secret = self._load_secret()
+        self._sizes = sorted(sizes, reverse=True)
+        self._jpeg_quality = jpeg_quality
+        self._path_resolver = path_resolver or (lambda path: path)
+
+        self._running = threading.Event()
+        self._running.set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="download_derivatives"
+        )
+
+        handler = type("Handler", (_DownloadHandler,), {"server_ref": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self.public_url = (public_url or f"http://{_local_ip()}:{self.port}").rstrip("/")
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="download_server", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        print(f"Download server listening on {self.public_url}")
+
+    def stop(self):
+        self._running.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._thread.is_alive():
+            self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def pause(self):
+        """Hold off encoding derivatives, e.g. while the camera screen is capturing."""
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def _load_secret(self) -> bytes:
+        secret_path = self.downloads_dir / ".secret"
+        if not secret_path.exists():
+            tmp_path = secret_path.with_suffix(".tmp")
+            tmp_path.write_bytes(secrets.token_bytes(32))
+            os.replace(tmp_path, secret_path)
+        return secret_path.read_bytes()
+
+    def token_for(self, session_id: str) -> str:
+        return hmac.new(self._secret, session_id.encode(), hashlib.sha256).hexdigest()[:20]
+
+    def url_for(self, session_id: str) -> str:
+        """Download page of a session, valid before its composite is published."""
+        return f"{self.public_url}/d/{self.token_for(session_id)}/"
+
+    def publish(self, session_id: str, composite_path) -> Future:
+        """
+        Queue web versions of a saved composite.
+
+        Returns:
+            Future resolving to the paths of the written files
+        """
+        return self._executor.submit(self._make_derivatives, session_id, str(composite_path))
+
+    def _make_derivatives(self, session_id: str, composite_path: str):
+        self._running.wait()
+        image = cv.imread(self._path_resolver(composite_path))
+        if image is None:
+            raise IOError(f"Could not read {composite_path}")
+
+        folder = self.downloads_dir / self.token_for(session_id)
+        folder.mkdir(exist_ok=True)
+        paths = []
+        for size in self._sizes:
+            height, width = image.shape[:2]
+            scale = size / max(width, height)
+            if scale < 1:
+                image = cv.resize(
+                    image,
+                    (round(width * scale), round(height * scale)),
+                    interpolation=cv.INTER_AREA,
+                )
+            path = folder / f"photo_{size}.jpg"
+            tmp_path = folder / f".photo_{size}.tmp.jpg"
+            if not cv.imwrite(
+                str(tmp_path), image, [cv.IMWRITE_JPEG_QUALITY, self._jpeg_quality]
+            ):
+                raise IOError(f"Could not encode {path}")
+            os.replace(tmp_path, path)
+            paths.append(str(path))
+        print(f"Download ready for {session_id}: {self.url_for(session_id)}")
+        return paths
+
+    def files(self, token: str):
+        """Published files of a token, largest first, None for an unknown token."""
+        if not _TOKEN_RE.match(token):
+            return None
+        paths = [self.downloads_dir / token / f"photo_{size}.jpg" for size in self._sizes]
+        return [path for path in paths if path.exists()]
+
+    def file_path(self, token: str, name: str) -> Optional[Path]:
+        if not _TOKEN_RE.match(token) or not _FILE_RE.match(name):
+            return None
+        path = self.downloads_dir / token / name
+        return path if path.is_file() else None
+
+
+class _DownloadHandler(BaseHTTPRequestHandler):
+    server_ref: DownloadServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Guests' phones poll the page, keep the console for the booth
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(head_only=True)
+
+    def do_GET(self, head_only=False):
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "d":
+            self._send_page(parts[1], head_only)
+        elif len(parts) == 3 and parts[0] == "d":
+            self._send_file(parts[1], parts[2], head_only)
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND)
+
+    def _send_page(self, token: str, head_only: bool):
+        files = self.server_ref.files(token)
+        if files is None:
+            self._send_error(HTTPStatus.NOT_FOUND)
+            return
+        if files:
+            preview, full = files[-1].name, files[0].name
+            body = (
+                f"<a href='{full}' download><img src='{preview}' "
+                "style='max-width:100%'></a>"
+                f"<p><a href='{full}' download>Download your photo</a></p>"
+            )
+            refresh = ""
+        else:
+            body = "<p>Your photo is being prepared, this page will refresh.</p>"
+            refresh = "<meta http-equiv='refresh' content='3'>"
+        content = (
+            "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            "<meta name='viewport' content='width=device-width, initial-scale=1'>"
+            f"{refresh}<title>Your photobooth photo</title></head>"
+            f"<body style='font-family:sans-serif;text-align:center'>{body}</body></html>"
+        ).encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(content)
+
+    def _send_file(self, token: str, name: str, head_only: bool):
+        path = self.server_ref.file_path(token, name)
+        if path is None:
+            self._send_error(HTTPStatus.NOT_FOUND)
+            return
+        stat = path.stat()
+        size = stat.st_size
+        # Derivatives are replaced, never edited, so mtime and size identify them
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        if_none_match = self.headers.get("If-None-Match")
+        not_modified = (
+            etag in [t.strip() for t in if_none_match.split(",")] or if_none_match == "*"
+            if if_none_match
+            else self.headers.get("If-Modified-Since") == last_modified
+        )
+        if not_modified:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, size - 1
+        status = HTTPStatus.OK
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (not if_range or if_range in (etag, last_modified)):
+            match = _RANGE_RE.match(range_header.strip())
+            if match is None:
+                # Several ranges are valid HTTP, the whole file is a valid answer
+                range_header = None
+            else:
+                first, last = match.groups()
+                if first:
+                    start = int(first)
+                    end = min(int(last), size - 1) if last else size - 1
+                elif last:
+                    start = max(0, size - int(last))
+                if not (first or last) or start >= size or start > end:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = HTTPStatus.PARTIAL_CONTENT
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("Cache-Control", "public, max-age=86400")
+        if status == HTTPStatus.PARTIAL_CONTENT:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if head_only:
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def _send_error(self, status: HTTPStatus):
+        content = f"{status.value} {status.phrase}".encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def _local_ip() -> str:
+    """Address of the interface with the default route, what phones on the LAN reach."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        try:
+            # No packet is sent, connect only picks the outgoing interface
+            s.connect(("10.255.255.255", 1))
+            return s.getsockname()[0]
+        except OSError:
+            return "127.0.0.1"
+
+
+def create_download_server_from_env(
+    base_dir, path_resolver=None
+) -> Optional[DownloadServer]:
+    """
+    Build the download server from the environment, None unless DOWNLOAD_SERVER=1.
+
+    DOWNLOAD_DIR (default base_dir/downloads), DOWNLOAD_HOST, DOWNLOAD_PORT
+    and DOWNLOAD_PUBLIC_URL, the address printed in QR codes, tune it.
+    """
+    if os.getenv("DOWNLOAD_SERVER", "0") != "1":
+        return None
+    return DownloadServer(
+        os.getenv("DOWNLOAD_DIR", os.path.join(base_dir, "downloads")),
+        host=os.getenv("DOWNLOAD_HOST", "0.0.0.0"),
+        port=int(os.getenv("DOWNLOAD_PORT", "8080")),
+        public_url=os.getenv("DOWNLOAD_PUBLIC_URL") or None,
+        path_resolver=path_resolver,
+    )
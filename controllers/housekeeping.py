@@ -0,0 +1,313 @@
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+import cv2 as cv
+
+# Marks a session whose photos have been re-encoded
+COMPACTED_MARKER = ".compacted"
+
+
+class Housekeeper:
+    """
+    Background retention and disk quota manager for session folders.
+
+    Each pass over the persistent session directory:
+        1. deletes intermediate artifacts (preview strips) of closed sessions
+        2. re-encodes photos of sessions older than compact_after_s from PNG
+           to JPEG, final composites are kept as they are
+        3. warns when the directory is over its quota; only with
+           delete_photos are the photos of the oldest sessions deleted until
+           it fits, final composites are never deleted. Guests' originals are
+           not deleted by default, compaction is what keeps usage down
+        4. deletes guest download folders (downloads_dir) untouched for
+           downloads_retention_s
+    Photos compacted or deleted are updated in the catalog, if given. Work
+    is paused while a guest is capturing and file I/O is throttled to
+    max_bytes_per_s so the live path is not disturbed.
+    """
+
+    def __init__(
+        self,
+        sessions_dir,
+        quota_bytes: int = 20 * 1024**3,
+        compact_after_s: float = 24 * 3600,
+        max_bytes_per_s: float = 20 * 1024**2,
+        interval_s: float = 300,
+        jpeg_quality: int = 92,
+        protected_folders: Optional[Callable[[], Iterable[str]]] = None,
+        catalog=None,
+        delete_photos: bool = False,
+        downloads_dir=None,
+        downloads_retention_s: float = 7 * 24 * 3600,
+    ) -> None:
+        self._sessions_dir = Path(sessions_dir)
+        self._quota_bytes = quota_bytes
+        self._compact_after_s = compact_after_s
+        self._max_bytes_per_s = max_bytes_per_s
+        self._interval_s = interval_s
+        self._jpeg_quality = jpeg_quality
+        # Folder names of sessions still in use, never touched
+        self._protected_folders = protected_folders or (lambda: ())
+        self._catalog = catalog
+        # Guests' originals are only deleted to meet the quota when asked to
+        self._delete_photos = delete_photos
+        self._downloads_dir = Path(downloads_dir) if downloads_dir else None
+        self._downloads_retention_s = downloads_retention_s
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._thread = threading.Thread(
+            target=self._run, name="housekeeping", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._running.set()
+        self._wake.set()
+
+    def pause(self):
+        """Hold off file work, e.g. while the camera screen is capturing."""
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def run_now(self):
+        """Start a pass without waiting for the interval."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pass()
+            except Exception as e:
+                print(f"Housekeeping pass failed: {e}")
+            self._wake.wait(self._interval_s)
+            self._wake.clear()
+
+    def run_pass(self) -> dict:
+        """Run one pass of every housekeeping step, returns what was done."""
+        stats = {
+            "artifacts_removed": 0,
+            "photos_compacted": 0,
+            "photos_removed": 0,
+            "downloads_removed": 0,
+        }
+        start = time.perf_counter()
+        sessions = self._closed_sessions()
+
+        for session in sessions:
+            for path in session.glob("*preview_strip*"):
+                if self._remove(path):
+                    stats["artifacts_removed"] += 1
+
+        cutoff = time.time() - self._compact_after_s
+        for session in sessions:
+            if self._stop.is_set():
+                return stats
+            marker = session / COMPACTED_MARKER
+            if marker.exists() or _session_time(session) > cutoff:
+                continue
+            stats["photos_compacted"] += self._compact_session(session)
+            if not self._stop.is_set():
+                marker.touch()
+
+        usage = self._usage()
+        if usage is None:
+            return stats
+        if usage > self._quota_bytes and self._delete_photos:
+            usage -= self._delete_oldest_photos(sessions, usage, stats)
+        if usage > self._quota_bytes:
+            print(
+                f"Session storage is {usage / 1024**3:.1f} GB, over its "
+                f"{self._quota_bytes / 1024**3:.1f} GB quota"
+            )
+
+        stats["downloads_removed"] = self._remove_old_downloads()
+
+        if any(stats.values()):
+            print(
+                f"Housekeeping: {stats} in {time.perf_counter() - start:.1f}s, "
+                f"{usage / 1024**3:.2f} GB used"
+            )
+        return stats
+
+    def _usage(self) -> Optional[int]:
+        """Bytes used by every session folder, None if stopped while counting."""
+        usage = 0
+        for session in self._session_folders():
+            # Stats only, no data is read, but it still waits for a guest
+            self._wait_until_idle(0)
+            if self._stop.is_set():
+                return None
+            usage += _directory_size(session)
+        return usage
+
+    def _delete_oldest_photos(
+        self, sessions: List[Path], usage: int, stats: dict
+    ) -> int:
+        """Delete photos of the oldest sessions until under quota, returns bytes freed."""
+        freed = 0
+        for session in sessions:  # oldest first
+            if usage - freed <= self._quota_bytes or self._stop.is_set():
+                break
+            removed = []
+            for path in _photos(session):
+                try:
+                    size = path.stat().st_size
+                except FileNotFoundError:
+                    continue
+                if self._remove(path):
+                    freed += size
+                    removed.append(path)
+            if removed:
+                stats["photos_removed"] += len(removed)
+                print(f"Deleted {len(removed)} photos of {session.name} to meet the quota")
+                if self._catalog is not None:
+                    # Rows of compacted photos still have the .png path
+                    self._catalog.remove_photos(
+                        removed + [path.with_suffix(".png") for path in removed]
+                    )
+        return freed
+
+    def _remove_old_downloads(self) -> int:
+        """Delete download folders of guests whose files are past retention."""
+        if self._downloads_dir is None or not self._downloads_dir.exists():
+            return 0
+        cutoff = time.time() - self._downloads_retention_s
+        removed = 0
+        for entry in os.scandir(self._downloads_dir):
+            if self._stop.is_set():
+                break
+            if not entry.is_dir() or entry.stat().st_mtime > cutoff:
+                continue
+            self._wait_until_idle(0)
+            try:
+                shutil.rmtree(entry.path)
+                removed += 1
+            except OSError as e:
+                print(f"Could not remove download folder {entry.path}: {e}")
+        return removed
+
+    def _session_folders(self) -> List[Path]:
+        """Every session folder, oldest first."""
+        if not self._sessions_dir.exists():
+            return []
+        sessions = [
+            Path(entry.path)
+            for entry in os.scandir(self._sessions_dir)
+            if entry.is_dir() and entry.name.startswith("session_")
+        ]
+        return sorted(sessions, key=lambda p: p.name)
+
+    def _closed_sessions(self) -> List[Path]:
+        """Session folders not in use, oldest first."""
+        protected = set(self._protected_folders())
+        return [p for p in self._session_folders() if p.name not in protected]
+
+    def _compact_session(self, session: Path) -> int:
+        compacted = 0
+        for path in session.glob("*_image.png"):
+            if self._stop.is_set():
+                break
+            self._wait_until_idle(path.stat().st_size)
+            frame = cv.imread(str(path))
+            if frame is None:
+                print(f"Could not read {path} for compaction")
+                continue
+
+            jpeg_path = path.with_suffix(".jpg")
+            tmp_path = path.with_suffix(".tmp.jpg")
+            if not cv.imwrite(
+                str(tmp_path), frame, [cv.IMWRITE_JPEG_QUALITY, self._jpeg_quality]
+            ) or cv.imread(str(tmp_path), cv.IMREAD_REDUCED_GRAYSCALE_8) is None:
+                print(f"Could not re-encode {path}")
+                self._remove(tmp_path)
+                continue
+            shutil.copystat(path, tmp_path)
+            os.replace(tmp_path, jpeg_path)
+            if self._catalog is not None:
+                self._catalog.move_photo(path, jpeg_path)
+            if self._remove(path):
+                compacted += 1
+        return compacted
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            self._wait_until_idle(0)
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Could not remove {path}: {e}")
+            return False
+
+    def _wait_until_idle(self, num_bytes: int):
+        """Block while paused, then throttle to max_bytes_per_s."""
+        self._running.wait()
+        if num_bytes and self._max_bytes_per_s:
+            self._stop.wait(num_bytes / self._max_bytes_per_s)
+
+
+def _session_time(session: Path) -> float:
+    """Creation time from the folder name, migrated folders have a fresh mtime."""
+    # Newer names end in milliseconds, e.g. session_20250601_183000_250
+    name = "_".join(session.name.split("_")[:3])
+    try:
+        return time.mktime(time.strptime(name, "session_%Y%m%d_%H%M%S"))
+    except ValueError:
+        return session.stat().st_mtime
+
+
+def _photos(session: Path) -> List[Path]:
+    """Captured photos of a session, final composites are not included."""
+    return sorted(session.glob("*_image.png")) + sorted(session.glob("*_image.jpg"))
+
+
+def _directory_size(directory: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def create_housekeeper_from_env(
+    sessions_dir, protected_folders=None, catalog=None, downloads_dir=None
+) -> Optional[Housekeeper]:
+    """
+    Build the housekeeper from the environment, None if HOUSEKEEPING=0.
+
+    HOUSEKEEPING_QUOTA_GB, HOUSEKEEPING_COMPACT_AFTER_H, HOUSEKEEPING_MAX_MBPS
+    and HOUSEKEEPING_INTERVAL_S tune it. HOUSEKEEPING_DELETE_PHOTOS=1 lets it
+    delete guests' photos of the oldest sessions when over quota, otherwise
+    it only warns. HOUSEKEEPING_DOWNLOADS_DAYS is how long guest downloads in
+    downloads_dir are kept.
+    """
+    if os.getenv("HOUSEKEEPING", "1") == "0":
+        return None
+    downloads_days = float(os.getenv("HOUSEKEEPING_DOWNLOADS_DAYS", "7"))
+    return Housekeeper(
+        sessions_dir,
+        quota_bytes=int(float(os.getenv("HOUSEKEEPING_QUOTA_GB", "20")) * 1024**3),
+        compact_after_s=float(os.getenv("HOUSEKEEPING_COMPACT_AFTER_H", "24")) * 3600,
+        max_bytes_per_s=float(os.getenv("HOUSEKEEPING_MAX_MBPS", "20")) * 1024**2,
+        interval_s=float(os.getenv("HOUSEKEEPING_INTERVAL_S", "300")),
+        protected_folders=protected_folders,
+        catalog=catalog,
+        delete_photos=os.getenv("HOUSEKEEPING_DELETE_PHOTOS", "0") == "1",
+        downloads_dir=downloads_dir,
+        downloads_retention_s=downloads_days * 24 * 3600,
+    )
@@ -0,0 +1,199 @@
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+from controllers.image_processor import ImageProcessor
+
+# Composites carry two identical columns, each one a strip once cut
+STRIPS_PER_COMPOSITE = 2
+
+
+class SheetImposer:
+    """
+    Packs photo strips onto printer sized sheets.
+
+    A strip is one column of a final composite. Strips from one or more
+    jobs are laid out in a grid on the sheet, rotated if that fits more per
+    sheet, and scaled so their physical size is kept at the sheet DPI.
+    Consecutive sheets with the same content are printed as copies of one
+    raster instead of separate jobs.
+    """
+
+    def __init__(
+        self,
+        sheet_size_in: Tuple[float, float] = (4, 6),
+        dpi: int = 300,
+        margin_in: float = 0.0,
+        gap_in: float = 0.0,
+    ) -> None:
+        self.dpi = dpi
+        self.sheet_size = (
+            round(sheet_size_in[0] * dpi),
+            round(sheet_size_in[1] * dpi),
+        )
+        self.margin = round(margin_in * dpi)
+        self.gap = round(gap_in * dpi)
+
+    def strip_size(self, composite_path: str) -> Tuple[int, int]:
+        """
+        Size of one strip of a composite in sheet pixels.
+
+        Only the image header is read.
+
+        Returns:
+            (width, height)
+        """
+        with Image.open(composite_path) as img:
+            width, height = img.size
+        composite_dpi = ImageProcessor._get_image_dpi(composite_path)[0] or self.dpi
+        scale = self.dpi / composite_dpi
+        return (
+            round(width / STRIPS_PER_COMPOSITE * scale),
+            round(height * scale),
+        )
+
+    def layout(self, strip_size: Tuple[int, int]) -> Tuple[int, int, bool]:
+        """
+        Grid of strips that fits on one sheet.
+
+        Returns:
+            (columns, rows, rotated)
+        """
+        usable_w = self.sheet_size[0] - 2 * self.margin
+        usable_h = self.sheet_size[1] - 2 * self.margin
+
+        def grid(cell_w, cell_h):
+            return (
+                max(0, (usable_w + self.gap) // (cell_w + self.gap)),
+                max(0, (usable_h + self.gap) // (cell_h + self.gap)),
+            )
+
+        cols, rows = grid(*strip_size)
+        rot_cols, rot_rows = grid(strip_size[1], strip_size[0])
+        if rot_cols * rot_rows > cols * rows:
+            return rot_cols, rot_rows, True
+        return cols, rows, False
+
+    def capacity(self, strip_size: Tuple[int, int]) -> int:
+        """Number of strips of this size per sheet."""
+        cols, rows, _ = self.layout(strip_size)
+        return cols * rows
+
+    def impose(
+        self,
+        entries: List[Tuple[str, str, int]],
+        output_dir: str,
+        prefix: str = "sheet",
+    ) -> List[Dict]:
+        """
+        Lay out strips from several jobs onto sheets and save one raster per sheet.
+
+        Args:
+            entries: (job_id, composite_path, strips) in print order
+            output_dir: Directory for the sheet rasters
+            prefix: Filename prefix for the sheets
+
+        Returns:
+            List of {"path", "copies", "jobs": {job_id: strips on the sheet}}
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Group by strip size, strips of different sizes never share a sheet
+        groups: Dict[Tuple[int, int], List[Tuple[str, str]]] = {}
+        for job_id, composite_path, strips in entries:
+            size = self.strip_size(composite_path)
+            groups.setdefault(size, []).extend([(job_id, composite_path)] * strips)
+
+        pages = []
+        for size, cells in groups.items():
+            per_sheet = self.capacity(size)
+            if per_sheet == 0:
+                raise ValueError(
+                    f"A {size[0]}x{size[1]} strip does not fit on a "
+                    f"{self.sheet_size[0]}x{self.sheet_size[1]} sheet"
+                )
+            for start in range(0, len(cells), per_sheet):
+                page = cells[start : start + per_sheet]
+                if pages and pages[-1]["cells"] == page:
+                    pages[-1]["copies"] += 1
+                else:
+                    pages.append({"cells": page, "size": size, "copies": 1})
+
+        strips = {}
+        sheets = []
+        for index, page in enumerate(pages, 1):
+            for _, composite_path in page["cells"]:
+                if composite_path not in strips:
+                    strips[composite_path] = self._load_strip(
+                        composite_path, page["size"]
+                    )
+
+            sheet_path = os.path.join(output_dir, f"{prefix}_{index}.png")
+            self._render_sheet(page["cells"], page["size"], strips).save(
+                sheet_path, dpi=(self.dpi, self.dpi)
+            )
+
+            jobs = {}
+            for job_id, _ in page["cells"]:
+                jobs[job_id] = jobs.get(job_id, 0) + page["copies"]
+            sheets.append({"path": sheet_path, "copies": page["copies"], "jobs": jobs})
+        return sheets
+
+    def _load_strip(self, composite_path: str, size: Tuple[int, int]) -> Image.Image:
+        with Image.open(composite_path) as img:
+            img = img.convert("RGB")
+            strip = img.crop((0, 0, img.width // STRIPS_PER_COMPOSITE, img.height))
+        if strip.size != size:
+            strip = strip.resize(size, Image.Resampling.LANCZOS)
+        return strip
+
+    def _render_sheet(self, cells, size, strips) -> Image.Image:
+        cols, rows, rotated = self.layout(size)
+        cell_w, cell_h = (size[1], size[0]) if rotated else size
+
+        # Centre the grid on the sheet
+        grid_w = cols * cell_w + (cols - 1) * self.gap
+        grid_h = rows * cell_h + (rows - 1) * self.gap
+        origin_x = (self.sheet_size[0] - grid_w) // 2
+        origin_y = (self.sheet_size[1] - grid_h) // 2
+
+        sheet = Image.new("RGB", self.sheet_size, "white")
+        for i, (_, composite_path) in enumerate(cells):
+            strip = strips[composite_path]
+            if rotated:
+                strip = strip.transpose(Image.Transpose.ROTATE_90)
+            col, row = i % cols, i // cols
+            sheet.paste(
+                strip,
+                (
+                    origin_x + col * (cell_w + self.gap),
+                    origin_y + row * (cell_h + self.gap),
+                ),
+            )
+        return sheet
+
+
+def create_imposer_from_env() -> Optional[SheetImposer]:
+    """
+    Build the sheet imposer from the environment.
+
+    PRINT_SHEET_SIZE is the sheet size in inches, e.g. "4x6" or "8x12".
+    Imposition is off when it is unset and composites are printed as is.
+    PRINT_SHEET_DPI, PRINT_SHEET_MARGIN and PRINT_SHEET_GAP (inches) are
+    optional.
+    """
+    sheet_size = os.getenv("PRINT_SHEET_SIZE")
+    if not sheet_size:
+        return None
+    width, _, height = sheet_size.lower().partition("x")
+    return SheetImposer(
+        sheet_size_in=(float(width), float(height)),
+        dpi=int(os.getenv("PRINT_SHEET_DPI", "300")),
+        margin_in=float(os.getenv("PRINT_SHEET_MARGIN", "0")),
+        gap_in=float(os.getenv("PRINT_SHEET_GAP", "0")),
+    )
+
+
+def composites_for_strips(strips: int) -> int:
+    """Composites to print for a number of strips when not imposing."""
+    return math.ceil(strips / STRIPS_PER_COMPOSITE)
@@ -0,0 +1,358 @@
+import os
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from controllers.housekeeping import _directory_size
+from controllers.stage_timers import HISTOGRAM_BUCKETS, stage_timers
+
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Rates computed from the event timestamps of StageTimers
+_RATES = {
+    "camera_frames": ("photobooth_capture_fps", "Camera frames read per second"),
+    "preview_frames": ("photobooth_preview_fps", "Preview frames shown per second"),
+}
+
+
+class MetricsExporter:
+    """
+    Prometheus text endpoint for the booth's health.
+
+    /metrics is rendered on the HTTP server's own threads when it is
+    scraped, from values the controllers already keep: stage latency
+    histograms and counters of the shared StageTimers, print spooler and
+    session counts, cache sizes and disk usage of the session folders.
+    Nothing is pushed and the GUI thread is never involved, reads only take
+    the short locks the controllers use themselves. Disk usage is the
+    exception: walking thousands of session folders is too slow for a
+    scrape, so it is refreshed every disk_interval_s on a background thread
+    and served from there.
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 9108,
+        session_manager=None,
+        print_spooler=None,
+        image_processor=None,
+        storage=None,
+        max_sessions: int = 50,
+        disk_interval_s: float = 300,
+    ) -> None:
+        self._session_manager = session_manager
+        self._print_spooler = print_spooler
+        self._image_processor = image_processor
+        self._storage = storage
+        self._max_sessions = max_sessions
+        self._disk_interval_s = disk_interval_s
+        # Session folder -> ((entries, newest mtime_ns), bytes), re-walked on change
+        self._folder_sizes: Dict[str, Tuple[tuple, int]] = {}
+        # Samples of the last disk refresh: (tier totals, newest sessions)
+        self._disk_samples: Tuple[list, list] = ([], [])
+        self._sizes_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._disk_thread = threading.Thread(
+            target=self._refresh_disk_usage, name="metrics_disk", daemon=True
+        )
+
+        handler = type("Handler", (_MetricsHandler,), {"exporter": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="metrics_exporter", daemon=True
+        )
+
+    def start(self):
+        # Histograms and counters are only kept while the timers are on
+        stage_timers.acquire()
+        self._thread.start()
+        if self._storage is not None:
+            self._disk_thread.start()
+        print(f"Metrics on port {self.port}/metrics")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._httpd.shutdown()
+            stage_timers.release()
+        self._httpd.server_close()
+
+    def render(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        self._camera_metrics(lines)
+        self._stage_metrics(lines)
+        self._cache_metrics(lines)
+        self._print_metrics(lines)
+        self._session_metrics(lines)
+        return "\n".join(lines) + "\n"
+
+    def _camera_metrics(self, lines: List[str]):
+        for event, (name, help_text) in _RATES.items():
+            _metric(lines, name, "gauge", help_text, [("", stage_timers.rate(event))])
+
+        counters = stage_timers.counters()
+        for counter, help_text in (
+            ("dropped_frames", "Camera frames missed between two reads"),
+            ("camera_read_failures", "Failed camera reads"),
+            ("camera_reconnects", "Times the camera had to be opened again"),
+        ):
+            _metric(
+                lines,
+                f"photobooth_{counter}_total",
+                "counter",
+                help_text,
+                [("", counters.get(counter, 0))],
+            )
+
+    def _stage_metrics(self, lines: List[str]):
+        histograms = stage_timers.histograms()
+        if not histograms:
+            return
+        lines.append(
+            "# HELP photobooth_stage_seconds Duration of pipeline stages, "
+            "print_job is from request to printed"
+        )
+        lines.append("# TYPE photobooth_stage_seconds histogram")
+        for stage, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS + ("+Inf",), histogram["buckets"]):
+                cumulative += count
+                lines.append(
+                    f'photobooth_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(
+                f'photobooth_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]:.6f}'
+            )
+            lines.append(
+                f'photobooth_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}'
+            )
+
+    def _cache_metrics(self, lines: List[str]):
+        counters = stage_timers.counters()
+        samples = []
+        for cache in ("template", "print_raster"):
+            for result, counter in (("hit", "hits"), ("miss", "misses")):
+                samples.append(
+                    (
+                        f'{{cache="{cache}",result="{result}"}}',
+                        counters.get(f"{cache}_cache_{counter}", 0),
+                    )
+                )
+        _metric(
+            lines,
+            "photobooth_cache_requests_total",
+            "counter",
+            "Cache lookups by result",
+            samples,
+        )
+
+        if self._image_processor is not None:
+            _metric(
+                lines,
+                "photobooth_template_cache_bytes",
+                "gauge",
+                "Memory held by cached template layers",
+                [("", self._image_processor.template_cache_bytes())],
+            )
+        resident = _resident_bytes()
+        if resident is not None:
+            _metric(
+                lines,
+                "photobooth_resident_memory_bytes",
+                "gauge",
+                "Resident memory of the booth process",
+                [("", resident)],
+            )
+
+    def _print_metrics(self, lines: List[str]):
+        spooler = self._print_spooler
+        if spooler is None:
+            return
+        _metric(
+            lines,
+            "photobooth_print_queue_depth",
+            "gauge",
+            "Print jobs waiting for a printer",
+            [("", spooler.queue_depth)],
+        )
+        _metric(
+            lines,
+            "photobooth_print_jobs",
+            "gauge",
+            "Print jobs known to the spooler by state",
+            [
+                (f'{{state="{state}"}}', count)
+                for state, count in spooler.job_counts().items()
+            ],
+        )
+        _metric(
+            lines,
+            "photobooth_printer_passes_total",
+            "counter",
+            "Rasters sent to the printers",
+            [("", spooler.printer_passes)],
+        )
+
+    def _session_metrics(self, lines: List[str]):
+        manager = self._session_manager
+        if manager is not None:
+            _metric(
+                lines,
+                "photobooth_sessions_finished_last_hour",
+                "gauge",
+                "Sessions finished in the last hour",
+                [("", manager.finished_in_last_hour())],
+            )
+            _metric(
+                lines,
+                "photobooth_background_sessions",
+                "gauge",
+                "Closed sessions still rendering or printing",
+                [("", len(manager.background_sessions))],
+            )
+
+        if self._storage is None:
+            return
+        with self._sizes_lock:
+            totals, per_session = self._disk_samples
+        _metric(
+            lines,
+            "photobooth_sessions_disk_bytes",
+            "gauge",
+            "Disk used by all session folders of a storage tier",
+            totals,
+        )
+        _metric(
+            lines,
+            "photobooth_session_disk_bytes",
+            "gauge",
+            "Disk used by each of the newest session folders",
+            per_session,
+        )
+
+    def _refresh_disk_usage(self):
+        while True:
+            try:
+                self.update_disk_usage()
+            except Exception as e:
+                print(f"Could not measure session disk usage: {e}")
+            if self._stop.wait(self._disk_interval_s):
+                return
+
+    def update_disk_usage(self):
+        """Walk the session folders of every tier and keep their sizes for scrapes."""
+        tiers = [("persistent", self._storage.persistent_dir)]
+        if self._storage.hot_dir is not None:
+            tiers.append(("hot", self._storage.hot_dir))
+        totals = []
+        per_session = []
+        seen = set()
+        for tier, directory in tiers:
+            folders = sorted(Path(directory).glob("session_*"))
+            seen.update(str(folder) for folder in folders)
+            sizes = [(folder, self._folder_size(folder)) for folder in folders]
+            totals.append((f'{{tier="{tier}"}}', sum(size for _, size in sizes)))
+            # Only the newest sessions are labelled, keeps the series bounded
+            for folder, size in sizes[-self._max_sessions :]:
+                per_session.append((f'{{tier="{tier}",session="{folder.name}"}}', size))
+        with self._sizes_lock:
+            self._disk_samples = (totals, per_session)
+            # Forget folders deleted or migrated since
+            for key in [key for key in self._folder_sizes if key not in seen]:
+                del self._folder_sizes[key]
+
+    def _folder_size(self, folder: Path) -> int:
+        # Files still being written change their own mtime, not the folder's
+        try:
+            with os.scandir(folder) as entries:
+                mtimes = [entry.stat().st_mtime_ns for entry in entries]
+        except OSError:
+            return 0
+        version = (len(mtimes), max(mtimes, default=0))
+        key = str(folder)
+        with self._sizes_lock:
+            cached = self._folder_sizes.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        size = _directory_size(folder)
+        with self._sizes_lock:
+            self._folder_sizes[key] = (version, size)
+        return size
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    exporter: MetricsExporter
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self._send(HTTPStatus.NOT_FOUND, "text/plain", b"404 Not Found")
+            return
+        try:
+            content = self.exporter.render().encode()
+        except Exception as e:
+            print(f"Could not render metrics: {e}")
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, "text/plain", str(e).encode())
+            return
+        self._send(HTTPStatus.OK, _CONTENT_TYPE, content)
+
+    def _send(self, status, content_type: str, content: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def _metric(lines: List[str], name: str, kind: str, help_text: str, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        if isinstance(value, float):
+            value = f"{value:.6g}"
+        lines.append(f"{name}{labels} {value}")
+
+
+def _resident_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current, ru_maxrss is in kilobytes on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if os.uname().sysname == "Darwin" else maxrss * 1024
+
+
+def create_metrics_exporter_from_env(
+    session_manager=None, print_spooler=None, image_processor=None, storage=None
+) -> Optional[MetricsExporter]:
+    """
+    Build the metrics endpoint, None unless METRICS=1.
+
+    METRICS_HOST and METRICS_PORT (default 9108) set where it listens,
+    METRICS_DISK_INTERVAL_S (default 300) how often disk usage is measured.
+    """
+    if os.getenv("METRICS", "0") != "1":
+        return None
+    return MetricsExporter(
+        host=os.getenv("METRICS_HOST", "0.0.0.0"),
+        port=int(os.getenv("METRICS_PORT", "9108")),
+        session_manager=session_manager,
+        print_spooler=print_spooler,
+        image_processor=image_processor,
+        storage=storage,
+        disk_interval_s=float(os.getenv("METRICS_DISK_INTERVAL_S", "300")),
+    )
@@ -0,0 +1,125 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+from PySide6.QtCore import QObject, Signal
+from controllers.image_processor import ImageProcessor
+from controllers.stage_timers import stage_timers
+from utils.generate_preview_strips import generate_preview_strips
+
+
+class PreviewRenderer(QObject):
+    """
+    Speculatively renders preview strips for every template colour variant.
+
+    Renders run on a single background worker in the order they are
+    requested. The default template (first in the list) is rendered on its
+    own so it is ready first, the remaining variants share their slot
+    preparation in one batched render.
+
+    Each call to render_variants starts a new generation; results from older
+    generations are still emitted but carry a stale generation number so the
+    receiver can drop them.
+
+    Emits signal
+        generation: int,
+        template_path: str,
+        strip_path: str
+    """
+
+    preview_ready = Signal(int, str, str)
+    preview_failed = Signal(int, str)
+
+    def __init__(self, image_processor: Optional[ImageProcessor] = None) -> None:
+        super().__init__()
+        # Only used from the worker thread, keeps decoded templates cached
+        self._image_processor = image_processor or ImageProcessor()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="preview_renderer"
+        )
+        self._generation = 0
+        self._futures: List[Future] = []
+        self._preload_futures: List[Future] = []
+
+    @property
+    def generation(self) -> int:
+        """Generation number of the most recent render request."""
+        return self._generation
+
+    def render_variants(
+        self, photo_paths: List[str], template_paths: List[str], output_dir
+    ) -> int:
+        """
+        Cancel any outstanding work and queue a preview render per template.
+
+        Args:
+            photo_paths: Selected photos, in selection order
+            template_paths: Templates to render, in display order
+            output_dir: Directory to write the preview strips to
+
+        Returns:
+            The generation number assigned to this batch of renders
+        """
+        self.cancel()
+        generation = self._generation
+        photos = list(photo_paths)
+        batches = [template_paths[:1], template_paths[1:]]
+        for batch in batches:
+            if not batch:
+                continue
+            future = self._executor.submit(
+                self._render, generation, photos, list(batch), str(output_dir)
+            )
+            self._futures.append(future)
+        return generation
+
+    def cancel(self):
+        """Drop queued renders and invalidate any render already running."""
+        self._generation += 1
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+
+    def preload_templates(self, template_paths):
+        """Decode templates into the worker's cache ahead of the first render."""
+        self._preload_futures = [
+            self._executor.submit(self._image_processor.load_template, template_path)
+            for template_path in template_paths
+        ]
+
+    def cancel_preloads(self):
+        """Drop template decodes not started yet, so a guest's render goes first."""
+        for future in self._preload_futures:
+            future.cancel()
+        self._preload_futures = []
+
+    def invalidate_templates(self, template_paths):
+        """Drop cached decodes of changed templates, in order with queued renders."""
+        self._executor.submit(
+            self._image_processor.invalidate_templates, list(template_paths)
+        )
+
+    def shutdown(self):
+        """Cancel outstanding work and stop the worker thread."""
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _render(self, generation, photo_paths, template_paths, output_dir):
+        # Bail out early if the selection changed while this job was queued
+        if generation != self._generation:
+            return None
+
+        with stage_timers.time("preview_strips"):
+            strip_paths = generate_preview_strips(
+                photo_paths=photo_paths,
+                num_photos=len(photo_paths),
+                template_paths=template_paths,
+                output_dir=output_dir,
+                output_prefix="preview_strip",
+                processor=self._image_processor,
+            )
+        for template_path in template_paths:
+            strip_path = strip_paths.get(template_path)
+            if strip_path:
+                self.preview_ready.emit(generation, template_path, strip_path)
+            else:
+                self.preview_failed.emit(generation, template_path)
+        return strip_paths
@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+import cv2 as cv
+import numpy as np
+
+_BOUNDARY = "photoboothframe"
+
+_PAGE = b"""<!DOCTYPE html><html><head><meta charset='utf-8'>
+<meta name='viewport' content='width=device-width, initial-scale=1'>
+<title>Photobooth monitor</title></head>
+<body style='font-family:sans-serif;background:#222;color:#eee;text-align:center'>
+<img src='/stream' style='max-width:100%'>
+<pre id='state'></pre>
+<script>
+async function poll() {
+  try {
+    const state = await (await fetch('/state')).json();
+    document.getElementById('state').textContent = JSON.stringify(state, null, 2);
+  } catch (e) {}
+  setTimeout(poll, 1000);
+}
+poll();
+</script></body></html>"""
+
+
+class PreviewStream:
+    """
+    MJPEG stream of the live preview and the booth state for attendants.
+
+    offer() is called from the GUI thread with every preview frame. It
+    returns at once when nobody is watching, and otherwise only keeps a
+    reference to the newest frame at most max_fps times a second. A single
+    encoder thread downsizes and JPEG encodes it for every connected client.
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8081,
+        max_fps: float = 8,
+        max_width: int = 640,
+        jpeg_quality: int = 70,
+    ) -> None:
+        self._min_interval = 1.0 / max_fps
+        self._max_width = max_width
+        self._jpeg_quality = jpeg_quality
+        self._next_frame_at = 0.0
+        self._state = {}
+        self._state_lock = threading.Lock()
+
+        # Newest frame offered, replaced rather than queued
+        self._pending: Optional[np.ndarray] = None
+        self._frame_offered = threading.Event()
+        self._stop = threading.Event()
+
+        # Newest encoded frame, clients wait on _encoded for a new sequence
+        self._encoded = threading.Condition()
+        self._jpeg: Optional[bytes] = None
+        self._sequence = 0
+        self.clients = 0
+
+        handler = type("Handler", (_StreamHandler,), {"stream": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._server_thread = threading.Thread(
+            target=self._httpd.serve_forever, name="preview_stream", daemon=True
+        )
+        self._encoder_thread = threading.Thread(
+            target=self._encode_frames, name="preview_stream_encoder", daemon=True
+        )
+
+    def start(self):
+        self._encoder_thread.start()
+        self._server_thread.start()
+        print(f"Preview stream on port {self.port}")
+
+    def stop(self):
+        self._stop.set()
+        self._frame_offered.set()
+        with self._encoded:
+            self._encoded.notify_all()
+        if self._server_thread.is_alive():
+            self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def offer(self, frame: np.ndarray):
+        """Hand over the newest preview frame, never copies or blocks."""
+        if not self.clients:
+            return
+        now = time.monotonic()
+        if now < self._next_frame_at:
+            return
+        self._next_frame_at = now + self._min_interval
+        # Frames are not modified after they are shown, a reference is enough
+        self._pending = frame
+        self._frame_offered.set()
+
+    def set_state(self, **fields):
+        """Update what /state reports, e.g. screen, session and photos taken."""
+        with self._state_lock:
+            self._state.update(fields)
+            self._state["updated_at"] = time.time()
+
+    def state(self) -> dict:
+        with self._state_lock:
+            return dict(self._state)
+
+    def _encode_frames(self):
+        while not self._stop.is_set():
+            self._frame_offered.wait()
+            self._frame_offered.clear()
+            frame, self._pending = self._pending, None
+            if frame is None:
+                continue
+
+            height, width = frame.shape[:2]
+            if width > self._max_width:
+                frame = cv.resize(
+                    frame,
+                    (self._max_width, round(height * self._max_width / width)),
+                    interpolation=cv.INTER_AREA,
+                )
+            ok, buffer = cv.imencode(
+                ".jpg", frame, [cv.IMWRITE_JPEG_QUALITY, self._jpeg_quality]
+            )
+            if not ok:
+                continue
+            with self._encoded:
+                self._jpeg = buffer.tobytes()
+                self._sequence += 1
+                self._encoded.notify_all()
+
+    def wait_for_frame(self, after_sequence: int, timeout: float = 5.0):
+        """
+        Block until a frame newer than after_sequence is encoded.
+
+        Returns:
+            (sequence, jpeg bytes), jpeg is None on timeout or shutdown
+        """
+        with self._encoded:
+            self._encoded.wait_for(
+                lambda: self._sequence > after_sequence or self._stop.is_set(),
+                timeout,
+            )
+            if self._sequence > after_sequence and not self._stop.is_set():
+                return self._sequence, self._jpeg
+            return after_sequence, None
+
+    def latest_frame(self) -> Optional[bytes]:
+        with self._encoded:
+            return self._jpeg
+
+    def _client_connected(self):
+        with self._encoded:
+            self.clients += 1
+
+    def _client_disconnected(self):
+        with self._encoded:
+            self.clients -= 1
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    stream: PreviewStream
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/":
+            self._send(HTTPStatus.OK, "text/html; charset=utf-8", _PAGE)
+        elif path == "/state":
+            self._send(
+                HTTPStatus.OK, "application/json", json.dumps(self.stream.state()).encode()
+            )
+        elif path == "/frame.jpg":
+            self._send_frame()
+        elif path == "/stream":
+            self._send_stream()
+        else:
+            self._send(HTTPStatus.NOT_FOUND, "text/plain", b"404 Not Found")
+
+    def _send(self, status, content_type: str, content: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_frame(self):
+        """A single frame, for clients that cannot show MJPEG."""
+        self.stream._client_connected()
+        try:
+            jpeg = self.stream.latest_frame()
+            if jpeg is None:
+                _, jpeg = self.stream.wait_for_frame(0)
+        finally:
+            self.stream._client_disconnected()
+        if jpeg is None:
+            self._send(HTTPStatus.SERVICE_UNAVAILABLE, "text/plain", b"No frame yet")
+        else:
+            self._send(HTTPStatus.OK, "image/jpeg", jpeg)
+
+    def _send_stream(self):
+        self.send_response(HTTPStatus.OK)
+        self.send_header(
+            "Content-Type", f"multipart/x-mixed-replace; boundary={_BOUNDARY}"
+        )
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        self.stream._client_connected()
+        sequence = 0
+        try:
+            while True:
+                sequence, jpeg = self.stream.wait_for_frame(sequence)
+                if jpeg is None:
+                    if self.stream._stop.is_set():
+                        return
+                    # No new frame, e.g. the camera is stopped, keep waiting
+                    continue
+                self.wfile.write(
+                    f"--{_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode()
+                )
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.stream._client_disconnected()
+
+
+def create_preview_stream_from_env() -> Optional[PreviewStream]:
+    """
+    Build the attendant preview stream, None unless PREVIEW_STREAM=1.
+
+    PREVIEW_STREAM_HOST, PREVIEW_STREAM_PORT, PREVIEW_STREAM_FPS and
+    PREVIEW_STREAM_WIDTH tune it.
+    """
+    if os.getenv("PREVIEW_STREAM", "0") != "1":
+        return None
+    return PreviewStream(
+        host=os.getenv("PREVIEW_STREAM_HOST", "0.0.0.0"),
+        port=int(os.getenv("PREVIEW_STREAM_PORT", "8081")),
+        max_fps=float(os.getenv("PREVIEW_STREAM_FPS", "8")),
+        max_width=int(os.getenv("PREVIEW_STREAM_WIDTH", "640")),
+    )
@@ -0,0 +1,269 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from PIL import Image, ImageCms
+from controllers.image_processor import ImageProcessor
+from controllers.stage_timers import stage_timers
+
+# Rasters used this recently are never pruned, a printer may be about to open them
+_PRUNE_GRACE_S = 300
+
+RENDERING_INTENTS = {
+    "perceptual": ImageCms.Intent.PERCEPTUAL,
+    "relative": ImageCms.Intent.RELATIVE_COLORIMETRIC,
+    "saturation": ImageCms.Intent.SATURATION,
+    "absolute": ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+}
+
+
+class PrintPreparer:
+    """
+    Turns composites or imposed sheets into printer-ready rasters.
+
+    Applies the printer's ICC profile, rotates to the media orientation,
+    scales to the media size at the printer DPI and adds margins. Colour
+    transforms are built once per profile pair and reused. Prepared rasters
+    are cached on disk by content hash of the input plus the settings, so
+    reprints and extra copies skip all of this.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        output_profile: Optional[str] = None,
+        rendering_intent: str = "perceptual",
+        media_size_in: Optional[Tuple[float, float]] = None,
+        dpi: int = 300,
+        margin_in: float = 0.0,
+        rotate: str = "auto",
+        max_cached: int = 200,
+    ) -> None:
+        self._cache_dir = Path(cache_dir)
+        os.makedirs(self._cache_dir, exist_ok=True)
+        self._intent = RENDERING_INTENTS[rendering_intent]
+        self._media_size = (
+            (round(media_size_in[0] * dpi), round(media_size_in[1] * dpi))
+            if media_size_in
+            else None
+        )
+        self._dpi = dpi
+        self._margin = round(margin_in * dpi)
+        self._rotate = rotate
+        self._max_cached = max_cached
+
+        self._output_profile = None
+        self._output_mode = "RGB"
+        profile_hash = None
+        if output_profile:
+            with open(output_profile, "rb") as f:
+                profile_bytes = f.read()
+            profile_hash = hashlib.sha256(profile_bytes).hexdigest()
+            self._output_profile = ImageCms.ImageCmsProfile(output_profile)
+            if self._output_profile.profile.xcolor_space.strip() == "CMYK":
+                self._output_mode = "CMYK"
+
+        # Any change of settings or profile gives new cache keys
+        self._settings_key = json.dumps(
+            {
+                "profile": profile_hash,
+                "intent": rendering_intent,
+                "media": self._media_size,
+                "dpi": dpi,
+                "margin": self._margin,
+                "rotate": rotate,
+            },
+            sort_keys=True,
+        )
+
+        self._lock = threading.Lock()
+        self._transforms: Dict[tuple, ImageCms.ImageCmsTransform] = {}
+        # path -> (mtime_ns, size, sha256), least recently used first. Imposed
+        # sheets get a new path per job, so it is bounded like the rasters
+        self._hashes: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def prepare(self, image_path: str) -> str:
+        """
+        Get the printer-ready raster for an image, rendering it on a cache miss.
+
+        Returns:
+            Path of the prepared raster
+        """
+        extension = "tif" if self._output_mode == "CMYK" else "png"
+        output_path = self._cache_dir / f"{self._cache_key(image_path)}.{extension}"
+        try:
+            os.utime(output_path)  # Keeps recently printed rasters in the cache
+        except FileNotFoundError:
+            pass
+        else:
+            stage_timers.count("print_raster_cache_hits")
+            print(f"Using prepared print raster {output_path.name}")
+            return str(output_path)
+
+        stage_timers.count("print_raster_cache_misses")
+        prepared, icc_profile = self._render(image_path)
+        # Unique per worker, two printers may prepare the same composite at once
+        tmp_path = output_path.with_name(
+            f"{output_path.stem}.tmp.{os.getpid()}.{threading.get_ident()}.{extension}"
+        )
+        prepared.save(tmp_path, dpi=(self._dpi, self._dpi), icc_profile=icc_profile)
+        os.replace(tmp_path, output_path)
+        print(f"Prepared print raster {output_path.name}")
+        self._prune_cache()
+        return str(output_path)
+
+    def _cache_key(self, image_path: str) -> str:
+        stat = os.stat(image_path)
+        with self._lock:
+            cached = self._hashes.get(image_path)
+            if cached is not None:
+                self._hashes.move_to_end(image_path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            content_hash = cached[2]
+        else:
+            digest = hashlib.sha256()
+            with open(image_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            content_hash = digest.hexdigest()
+            with self._lock:
+                self._hashes[image_path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+                self._hashes.move_to_end(image_path)
+                while len(self._hashes) > self._max_cached:
+                    self._hashes.popitem(last=False)
+        return hashlib.sha256(
+            f"{content_hash}:{self._settings_key}".encode()
+        ).hexdigest()[:32]
+
+    def _get_transform(self, input_profile_bytes: Optional[bytes]):
+        key = (input_profile_bytes, self._output_mode)
+        with self._lock:
+            transform = self._transforms.get(key)
+            if transform is None:
+                if input_profile_bytes:
+                    input_profile = ImageCms.ImageCmsProfile(
+                        io.BytesIO(input_profile_bytes)
+                    )
+                else:
+                    input_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+                transform = ImageCms.buildTransform(
+                    input_profile,
+                    self._output_profile,
+                    "RGB",
+                    self._output_mode,
+                    renderingIntent=self._intent,
+                )
+                self._transforms[key] = transform
+        return transform
+
+    def _render(self, image_path: str):
+        source_dpi = ImageProcessor._get_image_dpi(image_path)[0] or self._dpi
+        with Image.open(image_path) as img:
+            embedded_profile = img.info.get("icc_profile")
+            image = img.convert("RGB")
+
+        # Rotate to the media orientation
+        if self._rotate == "auto":
+            if self._media_size is not None and (
+                (image.width > image.height)
+                != (self._media_size[0] > self._media_size[1])
+            ):
+                image = image.transpose(Image.Transpose.ROTATE_90)
+        elif self._rotate != "0":
+            image = image.rotate(int(self._rotate), expand=True)
+
+        # Keep the physical size at the printer DPI, then fit inside the margins
+        scale = self._dpi / source_dpi
+        if self._media_size is not None:
+            usable = (
+                self._media_size[0] - 2 * self._margin,
+                self._media_size[1] - 2 * self._margin,
+            )
+            scale = min(usable[0] / image.width, usable[1] / image.height)
+        size = (round(image.width * scale), round(image.height * scale))
+        if size != image.size:
+            image = image.resize(size, Image.Resampling.LANCZOS)
+
+        if self._media_size is not None or self._margin:
+            canvas_size = self._media_size or (
+                image.width + 2 * self._margin,
+                image.height + 2 * self._margin,
+            )
+            canvas = Image.new("RGB", canvas_size, "white")
+            canvas.paste(
+                image,
+                (
+                    (canvas_size[0] - image.width) // 2,
+                    (canvas_size[1] - image.height) // 2,
+                ),
+            )
+            image = canvas
+
+        # Convert to the printer's colour space, margins included
+        icc_profile = embedded_profile
+        if self._output_profile is not None:
+            image = ImageCms.applyTransform(image, self._get_transform(embedded_profile))
+            icc_profile = self._output_profile.tobytes()
+        return image, icc_profile
+
+    def _prune_cache(self):
+        """Drop the least recently used rasters beyond max_cached."""
+        rasters = []
+        for entry in os.scandir(self._cache_dir):
+            if ".tmp." in entry.name:
+                continue
+            try:
+                rasters.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        rasters.sort(reverse=True)
+        cutoff = time.time() - _PRUNE_GRACE_S
+        for mtime, stale in rasters[self._max_cached :]:
+            if mtime > cutoff:
+                continue
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Could not remove cached print raster {stale}: {e}")
+
+
+def create_preparer_from_env(cache_dir: str) -> Optional[PrintPreparer]:
+    """
+    Build the print preparation stage from the environment.
+
+    PRINT_ICC_PROFILE is the printer's ICC profile and PRINT_ICC_INTENT one
+    of perceptual, relative, saturation or absolute. PRINT_MEDIA_SIZE is the
+    media size in inches, e.g. "4x6", PRINT_DPI the printer resolution,
+    PRINT_MARGIN the margin in inches and PRINT_ROTATE "auto" or degrees.
+    Returns None when none of these are set.
+    """
+    names = (
+        "PRINT_ICC_PROFILE",
+        "PRINT_MEDIA_SIZE",
+        "PRINT_DPI",
+        "PRINT_MARGIN",
+        "PRINT_ROTATE",
+    )
+    if not any(os.getenv(name) for name in names):
+        return None
+
+    media_size = None
+    if os.getenv("PRINT_MEDIA_SIZE"):
+        width, _, height = os.getenv("PRINT_MEDIA_SIZE").lower().partition("x")
+        media_size = (float(width), float(height))
+    return PrintPreparer(
+        cache_dir,
+        output_profile=os.getenv("PRINT_ICC_PROFILE") or None,
+        rendering_intent=os.getenv("PRINT_ICC_INTENT", "perceptual"),
+        media_size_in=media_size,
+        dpi=int(os.getenv("PRINT_DPI", "300")),
+        margin_in=float(os.getenv("PRINT_MARGIN", "0")),
+        rotate=os.getenv("PRINT_ROTATE", "auto"),
+    )
@@ -0,0 +1,543 @@
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from PySide6.QtCore import QObject, Signal
+from controllers.imposition import (
+    STRIPS_PER_COMPOSITE,
+    SheetImposer,
+    composites_for_strips,
+)
+from controllers.print_preparation import PrintPreparer
+from controllers.session_trace import session_tracer
+from controllers.stage_timers import stage_timers
+
+JOB_QUEUED = "queued"
+JOB_RENDERING = "rendering"
+JOB_PRINTING = "printing"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# States a job can be left in by a crash, resumed as queued on startup
+_UNFINISHED_STATES = (JOB_QUEUED, JOB_RENDERING, JOB_PRINTING)
+_FINISHED_STATES = (JOB_DONE, JOB_FAILED)
+
+# Finished jobs are pruned at most this often
+_PRUNE_INTERVAL_S = 60
+
+
+class LocalPrinter:
+    """
+    Stand-in printer for testing the spooler without hardware.
+
+    Sleeps for a configurable latency per copy and optionally copies the
+    printed file into an output directory.
+    """
+
+    def __init__(
+        self,
+        name: str = "local",
+        latency_s: float = 1.0,
+        failure_rate: float = 0.0,
+        output_dir: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        self.output_dir = output_dir
+        self.printed = []
+
+    def print_images(self, image_path, num_copies=1):
+        import random
+
+        for copy_index in range(num_copies):
+            time.sleep(self.latency_s)
+            if random.random() < self.failure_rate:
+                raise RuntimeError(f"{self.name}: simulated paper jam")
+            if self.output_dir:
+                os.makedirs(self.output_dir, exist_ok=True)
+                stem = Path(image_path).stem
+                shutil.copy(
+                    image_path,
+                    os.path.join(self.output_dir, f"{stem}_copy{copy_index + 1}.png"),
+                )
+        self.printed.append((str(image_path), num_copies))
+        print(f"[{self.name}] Printed {num_copies} x {image_path}")
+
+
+def create_printers_from_env() -> Dict[str, object]:
+    """
+    Build the configured printers.
+
+    PRINTERS is a comma separated list of printer specs:
+        mock            MockPrinter from the python_parallel_print submodule
+        local[:latency] LocalPrinter, latency in seconds per copy (default 1)
+    Defaults to a single mock printer.
+    """
+    printers = {}
+    specs = [s.strip() for s in os.getenv("PRINTERS", "mock").split(",") if s.strip()]
+    for i, spec in enumerate(specs):
+        kind, _, argument = spec.partition(":")
+        name = f"{kind}{i}"
+        if kind == "mock":
+            from python_parallel_print import mock_printer
+
+            printers[name] = mock_printer.MockPrinter()
+        elif kind == "local":
+            printers[name] = LocalPrinter(
+                name=name, latency_s=float(argument) if argument else 1.0
+            )
+        else:
+            raise ValueError(f"Unknown printer spec in PRINTERS: {spec}")
+    return printers
+
+
+class PrintSpooler(QObject):
+    """
+    Persistent print queue dispatching jobs across several printers.
+
+    Every job is a JSON file in the spool directory, rewritten atomically on
+    each state change (queued -> rendering -> printing -> done or failed),
+    so jobs left unfinished by a crash are queued again on the next start.
+    One worker thread per printer takes jobs from a shared queue, so jobs go
+    to whichever printer is free. Failed attempts are retried with backoff,
+    possibly on another printer. Done and failed jobs are kept for
+    keep_finished_s, then forgotten and their files deleted.
+
+    With an imposer, the rendering stage packs the strips of a job onto
+    printer sized sheets, topping up the last sheet with strips of other
+    queued jobs, and each sheet is sent to the printer as one raster. With a
+    preparer, rasters are then converted for the printer (colour profile,
+    orientation, media size), reusing cached results for reprints.
+
+    Emits signal
+        job_id: str,
+        state: str
+    """
+
+    job_updated = Signal(str, str)
+
+    def __init__(
+        self,
+        printers: Dict[str, object],
+        spool_dir: str = "./print_spool",
+        max_attempts: int = 3,
+        retry_delay_s: float = 2.0,
+        imposer: Optional[SheetImposer] = None,
+        preparer: Optional[PrintPreparer] = None,
+        max_batch_jobs: int = 8,
+        path_resolver: Optional[Callable[[str], str]] = None,
+        keep_finished_s: float = 24 * 3600,
+    ) -> None:
+        super().__init__()
+        if not printers:
+            raise ValueError("PrintSpooler needs at least one printer")
+        self._printers = printers
+        self._spool_dir = Path(spool_dir)
+        self._jobs_dir = self._spool_dir / "jobs"
+        self._sheets_dir = self._spool_dir / "sheets"
+        os.makedirs(self._jobs_dir, exist_ok=True)
+        self._max_attempts = max_attempts
+        self._retry_delay_s = retry_delay_s
+        self._imposer = imposer
+        self._preparer = preparer
+        # Finds files that moved after the job was queued, e.g. SessionStorage.resolve
+        self._path_resolver = path_resolver
+        self._max_batch_jobs = max_batch_jobs
+        self._keep_finished_s = keep_finished_s
+        self._pruned_at = 0.0
+        self._printer_passes = 0
+
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = {}
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stopping = False
+
+        self._recover_jobs()
+        self._workers = []
+        for name in printers:
+            worker = threading.Thread(
+                target=self._worker_loop,
+                args=(name,),
+                name=f"print_spooler_{name}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(
+        self,
+        image_path: str,
+        strips: int = STRIPS_PER_COMPOSITE,
+        session_id: Optional[str] = None,
+    ) -> str:
+        """
+        Queue a print job.
+
+        Args:
+            image_path: Final composite to print
+            strips: Number of strips wanted, each composite holds two
+            session_id: Session the print belongs to
+
+        Returns:
+            The job id
+        """
+        now = time.time()
+        job = {
+            "id": f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}",
+            "image_path": str(image_path),
+            "strips": int(strips),
+            "session_id": session_id,
+            "state": JOB_QUEUED,
+            "printer": None,
+            "attempts": 0,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._persist(job)
+        # Before a worker can take it, so listeners see the states in order
+        self.job_updated.emit(job["id"], JOB_QUEUED)
+        self._queue.put(job["id"])
+        print(f"Queued print job {job['id']}: {strips} strips of {image_path}")
+        return job["id"]
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Return a snapshot of a job, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a printer."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["state"] == JOB_QUEUED)
+
+    def jobs_per_hour(self) -> int:
+        """Number of jobs finished successfully in the last hour."""
+        cutoff = time.time() - 3600
+        with self._lock:
+            return sum(
+                1
+                for job in self._jobs.values()
+                if job["state"] == JOB_DONE and (job["finished_at"] or 0) >= cutoff
+            )
+
+    @property
+    def printer_passes(self) -> int:
+        """Number of rasters sent to the printers since startup."""
+        return self._printer_passes
+
+    def job_counts(self) -> Dict[str, int]:
+        """Number of jobs in each state."""
+        counts = {
+            state: 0
+            for state in (JOB_QUEUED, JOB_RENDERING, JOB_PRINTING, JOB_DONE, JOB_FAILED)
+        }
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job["state"]] += 1
+        return counts
+
+    def cancel(self, job_id: str, reason: str = "cancelled") -> bool:
+        """
+        Fail a job that is not printing yet, so it is not printed on a later start.
+
+        A job being rendered is dropped from its batch before printing.
+
+        Returns:
+            True if the job was cancelled, False if unknown, printing or finished
+        """
+        return self._set_state(
+            job_id,
+            JOB_FAILED,
+            from_states=(JOB_QUEUED, JOB_RENDERING),
+            error=reason,
+            finished_at=time.time(),
+        )
+
+    def stop(self):
+        """Stop the workers after their current job, queued jobs stay on disk."""
+        self._stopping = True
+        for _ in self._workers:
+            self._queue.put(None)
+
+    def _recover_jobs(self):
+        cutoff = time.time() - self._keep_finished_s
+        for job_file in sorted(self._jobs_dir.glob("*.json")):
+            try:
+                with open(job_file) as f:
+                    job = json.load(f)
+            except Exception as e:
+                print(f"Skipping unreadable print job {job_file}: {e}")
+                continue
+            if _is_expired(job, cutoff):
+                job_file.unlink(missing_ok=True)
+                continue
+            # Spool files written before imposition recorded copies
+            if "strips" not in job:
+                job["strips"] = job.pop("copies", 1) * STRIPS_PER_COMPOSITE
+            self._jobs[job["id"]] = job
+            if job["state"] in _UNFINISHED_STATES:
+                job["state"] = JOB_QUEUED
+                self._persist(job)
+                self._queue.put(job["id"])
+                print(f"Recovered print job {job['id']}")
+
+    def _persist(self, job: dict):
+        """Write a job file atomically. Caller holds the lock."""
+        job_path = self._jobs_dir / f"{job['id']}.json"
+        tmp_path = job_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, job_path)
+
+    def _set_state(self, job_id: str, state: str, from_states=None, **fields) -> bool:
+        """
+        Move a job to a state, only from one of from_states if given.
+
+        Returns:
+            False if the job is unknown or was not in one of from_states
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] == JOB_FAILED:
+                return False  # Failed is final, e.g. cancelled while a worker had it
+            if from_states is not None and job["state"] not in from_states:
+                return False
+            job.update(fields)
+            job["state"] = state
+            job["updated_at"] = time.time()
+            self._persist(job)
+        self.job_updated.emit(job_id, state)
+        if state in _FINISHED_STATES:
+            self._prune_finished()
+        return True
+
+    def _prune_finished(self):
+        """Forget done and failed jobs older than keep_finished_s, with their files."""
+        now = time.time()
+        cutoff = now - self._keep_finished_s
+        with self._lock:
+            if now - self._pruned_at < _PRUNE_INTERVAL_S:
+                return
+            self._pruned_at = now
+            expired = [
+                job_id for job_id, job in self._jobs.items() if _is_expired(job, cutoff)
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        for job_id in expired:
+            (self._jobs_dir / f"{job_id}.json").unlink(missing_ok=True)
+
+    def _worker_loop(self, printer_name: str):
+        printer = self._printers[printer_name]
+        while True:
+            job_id = self._queue.get()
+            if job_id is None or self._stopping:
+                return
+            job = self.get_job(job_id)
+            if job is None or job["state"] != JOB_QUEUED:
+                continue
+            jobs = [job]
+            if self._imposer is not None:
+                jobs += self._gather_jobs(job)
+            self._run_batch(jobs, printer_name, printer)
+
+    def _gather_jobs(self, first_job: dict):
+        """Take queued jobs whose strips can fill the free cells of the last sheet."""
+        try:
+            strip_size = self._imposer.strip_size(self._job_path(first_job))
+        except Exception:
+            return []  # Reported when the job itself is rendered
+        per_sheet = self._imposer.capacity(strip_size)
+        if per_sheet == 0:
+            return []
+
+        gathered, skipped = [], []
+        total = _strips_left(first_job)
+        while total % per_sheet and len(gathered) + 1 < self._max_batch_jobs:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job_id is None:
+                skipped.append(job_id)
+                break
+            job = self.get_job(job_id)
+            if job is None or job["state"] != JOB_QUEUED:
+                continue
+            try:
+                compatible = self._imposer.strip_size(self._job_path(job)) == strip_size
+            except Exception:
+                compatible = False
+            if compatible:
+                gathered.append(job)
+                total += _strips_left(job)
+            else:
+                skipped.append(job_id)
+
+        for job_id in skipped:
+            self._queue.put(job_id)
+        return gathered
+
+    def _job_path(self, job: dict) -> str:
+        if self._path_resolver is None:
+            return job["image_path"]
+        return self._path_resolver(job["image_path"])
+
+    def _run_batch(self, jobs, printer_name: str, printer):
+        batch = []
+        for job in jobs:
+            attempts = job["attempts"] + 1
+            job["image_path"] = self._job_path(job)
+            if not self._set_state(
+                job["id"],
+                JOB_RENDERING,
+                from_states=(JOB_QUEUED,),
+                printer=printer_name,
+                attempts=attempts,
+                started_at=job["started_at"] or time.time(),
+                image_path=job["image_path"],
+            ):
+                continue  # Cancelled since it was taken from the queue
+            if os.path.exists(job["image_path"]):
+                batch.append((job, attempts))
+            else:
+                error = f"Print file missing: {job['image_path']}"
+                print(f"Print job {job['id']} failed: {error}")
+                self._set_state(
+                    job["id"], JOB_FAILED, error=error, finished_at=time.time()
+                )
+        if not batch:
+            return
+
+        sheets = []
+        printed: Dict[str, int] = {}  # job id -> strips printed by this batch
+        try:
+            sheets, print_paths = self._render_sheets(batch)
+            # Jobs cancelled while their sheets were rendered are left out
+            claimed = [
+                (job, attempts)
+                for job, attempts in batch
+                if self._set_state(job["id"], JOB_PRINTING, from_states=(JOB_RENDERING,))
+            ]
+            if len(claimed) < len(batch):
+                if self._imposer is not None:
+                    _remove_sheets(sheets)
+                sheets, batch = [], claimed
+                if not batch:
+                    return
+                sheets, print_paths = self._render_sheets(batch)
+
+            # A sheet can hold strips of several sessions, it is traced in each
+            session_ids = {job["session_id"] for job, _ in batch if job.get("session_id")}
+            for sheet, print_path in zip(sheets, print_paths):
+                start = time.perf_counter()
+                printer.print_images(print_path, num_copies=sheet["copies"])
+                end = time.perf_counter()
+                stage_timers.record("print", end - start)
+                for session_id in session_ids:
+                    session_tracer.add_span("print", start * 1e6, end * 1e6, session_id)
+                with self._lock:
+                    self._printer_passes += 1
+                for job_id, strips in sheet["jobs"].items():
+                    printed[job_id] = printed.get(job_id, 0) + strips
+            for job, _ in batch:
+                self._finish_job(job)
+        except Exception as e:
+            job_ids = ", ".join(job["id"] for job, _ in batch)
+            print(f"Print jobs {job_ids} failed on {printer_name}: {e}")
+            # Sheets printed before the failure are not printed again
+            for job, attempts in batch:
+                strips_printed = job.get("strips_printed", 0) + printed.get(job["id"], 0)
+                if strips_printed >= job["strips"]:
+                    self._finish_job(job)
+                else:
+                    self._retry_or_fail(
+                        job["id"], attempts, str(e), strips_printed=strips_printed
+                    )
+        finally:
+            if self._imposer is not None:
+                _remove_sheets(sheets)
+
+    def _render_sheets(self, batch):
+        """
+        Impose and prepare the rasters for the strips the batch still needs.
+
+        Returns:
+            (sheets as returned by SheetImposer.impose, raster path per sheet)
+        """
+        if self._imposer is not None:
+            sheets = self._imposer.impose(
+                [(job["id"], job["image_path"], _strips_left(job)) for job, _ in batch],
+                str(self._sheets_dir),
+                prefix=batch[0][0]["id"],
+            )
+        else:
+            job = batch[0][0]
+            sheets = [
+                {
+                    "path": job["image_path"],
+                    "copies": composites_for_strips(_strips_left(job)),
+                    "jobs": {job["id"]: _strips_left(job)},
+                }
+            ]
+
+        print_paths = [sheet["path"] for sheet in sheets]
+        if self._preparer is not None:
+            print_paths = [self._preparer.prepare(path) for path in print_paths]
+        return sheets, print_paths
+
+    def _finish_job(self, job: dict):
+        finished_at = time.time()
+        self._set_state(
+            job["id"],
+            JOB_DONE,
+            finished_at=finished_at,
+            error=None,
+            strips_printed=job["strips"],
+        )
+        # Queue wait included, what the guest experiences
+        stage_timers.record("print_job", finished_at - job["created_at"])
+
+    def _retry_or_fail(self, job_id: str, attempts: int, error: str, **fields):
+        if attempts < self._max_attempts:
+            self._set_state(job_id, JOB_QUEUED, error=error, **fields)
+            retry = threading.Timer(
+                self._retry_delay_s * attempts, self._queue.put, args=(job_id,)
+            )
+            retry.daemon = True
+            retry.start()
+        else:
+            self._set_state(
+                job_id, JOB_FAILED, error=error, finished_at=time.time(), **fields
+            )
+
+
+def _strips_left(job: dict) -> int:
+    """Strips of a job not printed yet, earlier attempts may have printed some."""
+    return job["strips"] - job.get("strips_printed", 0)
+
+
+def _remove_sheets(sheets):
+    for sheet in sheets:
+        if os.path.exists(sheet["path"]):
+            os.remove(sheet["path"])
+
+
+def _is_expired(job: dict, cutoff: float) -> bool:
+    """Whether a job finished before cutoff, unfinished jobs never expire."""
+    if job["state"] not in _FINISHED_STATES:
+        return False
+    return (job.get("finished_at") or job.get("updated_at") or 0) < cutoff
@@ -0,0 +1,322 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    closed_at REAL,
+    finished_at REAL,
+    template_path TEXT,
+    num_photos INTEGER,
+    stage TEXT
+);
+CREATE TABLE IF NOT EXISTS photos (
+    path TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    captured_at REAL NOT NULL,
+    slot INTEGER
+);
+CREATE TABLE IF NOT EXISTS composites (
+    path TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    template_path TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS print_jobs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    composite_path TEXT NOT NULL,
+    strips INTEGER,
+    state TEXT NOT NULL,
+    printer TEXT,
+    attempts INTEGER,
+    error TEXT,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions(created_at);
+CREATE INDEX IF NOT EXISTS sessions_template ON sessions(template_path);
+CREATE INDEX IF NOT EXISTS photos_session ON photos(session_id);
+CREATE INDEX IF NOT EXISTS composites_session ON composites(session_id, created_at);
+CREATE INDEX IF NOT EXISTS composites_template ON composites(template_path);
+CREATE INDEX IF NOT EXISTS print_jobs_session ON print_jobs(session_id);
+CREATE INDEX IF NOT EXISTS print_jobs_state ON print_jobs(state, updated_at);
+"""
+
+
+class SessionCatalog:
+    """
+    SQLite index of sessions, their photos, final composites and print jobs.
+
+    Lets staff find a guest's session by time, template or print status
+    without scanning session folders, and gives reprints the path of the
+    already rendered composite. One connection is shared between threads
+    behind a lock; writes are single small statements.
+    """
+
+    def __init__(self, db_path) -> None:
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            # Catalogs written before photo selections were recorded
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(photos)")}
+            if "slot" not in columns:
+                self._conn.execute("ALTER TABLE photos ADD COLUMN slot INTEGER")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params)
+
+    def _query(self, sql: str, params=()) -> List[dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    # Recording
+
+    def add_session(self, session_id: str, folder, created_at: float):
+        self._execute(
+            "INSERT OR IGNORE INTO sessions (id, folder, created_at, stage) "
+            "VALUES (?, ?, ?, 'capture')",
+            (session_id, str(folder), created_at),
+        )
+
+    def update_session(self, session_id: str, **fields):
+        """Set columns of a session, e.g. template_path, stage or finished_at."""
+        if not fields:
+            return
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(
+            f"UPDATE sessions SET {columns} WHERE id = ?",
+            (*fields.values(), session_id),
+        )
+
+    def relocate_session(self, session_id: str, old_folder, new_folder):
+        """Rewrite paths of a session moved to another folder."""
+        old_prefix, new_prefix = str(old_folder), str(new_folder)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET folder = ? WHERE id = ?", (new_prefix, session_id)
+            )
+            for table, column in (
+                ("photos", "path"),
+                ("composites", "path"),
+                ("print_jobs", "composite_path"),
+            ):
+                self._conn.execute(
+                    f"UPDATE {table} SET {column} = ? || substr({column}, ?) "
+                    f"WHERE session_id = ? AND substr({column}, 1, ?) = ?",
+                    (
+                        new_prefix,
+                        len(old_prefix) + 1,
+                        session_id,
+                        len(old_prefix),
+                        old_prefix,
+                    ),
+                )
+
+    def add_photo(self, session_id: str, path, captured_at: Optional[float] = None):
+        self._execute(
+            "INSERT OR IGNORE INTO photos (path, session_id, captured_at) VALUES (?, ?, ?)",
+            (str(path), session_id, captured_at or time.time()),
+        )
+
+    def select_photos(self, session_id: str, paths):
+        """Record the photos picked for the composite, in slot order."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE photos SET slot = NULL WHERE session_id = ?", (session_id,)
+            )
+            # By file name, the screens list the same files by absolute path
+            for slot, path in enumerate(paths):
+                name = os.sep + os.path.basename(path)
+                self._conn.execute(
+                    "UPDATE photos SET slot = ? WHERE session_id = ? AND substr(path, -?) = ?",
+                    (slot, session_id, len(name), name),
+                )
+
+    def move_photo(self, old_path, new_path):
+        """Point a photo at its new file, e.g. after compaction to JPEG."""
+        self._execute(
+            "UPDATE photos SET path = ? WHERE path = ?", (str(new_path), str(old_path))
+        )
+
+    def remove_photos(self, paths):
+        """Forget photos whose files were deleted."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM photos WHERE path = ?", [(str(path),) for path in paths]
+            )
+
+    def add_composite(self, session_id: str, path, template_path: Optional[str]):
+        self._execute(
+            "INSERT OR REPLACE INTO composites (path, session_id, template_path, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (str(path), session_id, template_path, time.time()),
+        )
+
+    def record_print_job(self, job: dict):
+        """Insert or update a print job from its spooler record."""
+        self._execute(
+            "INSERT OR REPLACE INTO print_jobs (id, session_id, composite_path, strips, "
+            "state, printer, attempts, error, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job["id"],
+                job.get("session_id"),
+                job["image_path"],
+                job.get("strips"),
+                job["state"],
+                job.get("printer"),
+                job.get("attempts"),
+                job.get("error"),
+                job.get("created_at"),
+                job.get("updated_at"),
+            ),
+        )
+
+    # Lookup
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        rows = self._query("SELECT * FROM sessions WHERE id = ?", (session_id,))
+        return rows[0] if rows else None
+
+    def latest_session(self) -> Optional[dict]:
+        rows = self._query("SELECT * FROM sessions ORDER BY created_at DESC LIMIT 1")
+        return rows[0] if rows else None
+
+    def find_sessions(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        template: Optional[str] = None,
+        print_state: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[dict]:
+        """
+        Sessions matching every given filter, newest first.
+
+        Args:
+            since, until: Creation time range (epoch seconds)
+            template: Substring of the template path, e.g. "Vertical-03"
+            print_state: Only sessions with a print job in this state
+            limit: Maximum number of sessions returned
+        """
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("s.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("s.created_at < ?")
+            params.append(until)
+        if template:
+            clauses.append("s.template_path LIKE ?")
+            params.append(f"%{template}%")
+        if print_state:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM print_jobs j WHERE j.session_id = s.id AND j.state = ?)"
+            )
+            params.append(print_state)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT s.* FROM sessions s {where} ORDER BY s.created_at DESC LIMIT ?",
+            (*params, limit),
+        )
+
+    def session_photos(self, session_id: str) -> List[str]:
+        """Photo paths of a session, following PNGs compacted to JPEG."""
+        return [
+            _current_photo_path(row["path"])
+            for row in self._query(
+                "SELECT path FROM photos WHERE session_id = ? ORDER BY captured_at",
+                (session_id,),
+            )
+        ]
+
+    def selected_photos(self, session_id: str) -> List[str]:
+        """Photos picked for the composite in slot order, empty if none were recorded."""
+        return [
+            _current_photo_path(row["path"])
+            for row in self._query(
+                "SELECT path FROM photos WHERE session_id = ? AND slot IS NOT NULL "
+                "ORDER BY slot",
+                (session_id,),
+            )
+        ]
+
+    def latest_composite(self, session_id: str) -> Optional[dict]:
+        rows = self._query(
+            "SELECT * FROM composites WHERE session_id = ? ORDER BY created_at DESC LIMIT 1",
+            (session_id,),
+        )
+        return rows[0] if rows else None
+
+    def print_jobs(self, session_id: str) -> List[dict]:
+        return self._query(
+            "SELECT * FROM print_jobs WHERE session_id = ? ORDER BY created_at",
+            (session_id,),
+        )
+
+    # Maintenance
+
+    def backfill(self, sessions_dir) -> int:
+        """
+        Add session folders created before the catalog existed.
+
+        Returns:
+            Number of sessions added
+        """
+        known = {row["id"] for row in self._query("SELECT id FROM sessions")}
+        added = 0
+        for entry in sorted(os.scandir(sessions_dir), key=lambda e: e.name):
+            if not entry.is_dir() or not entry.name.startswith("session_"):
+                continue
+            if entry.name in known:
+                continue
+            try:
+                # Newer names end in milliseconds, e.g. session_20250601_183000_250
+                name = "_".join(entry.name.split("_")[:3])
+                created_at = time.mktime(time.strptime(name, "session_%Y%m%d_%H%M%S"))
+            except ValueError:
+                created_at = entry.stat().st_mtime
+            self.add_session(entry.name, entry.path, created_at)
+            self.update_session(entry.name, stage="done", finished_at=created_at)
+            for file in sorted(os.scandir(entry.path), key=lambda e: e.name):
+                if "final_composite" in file.name:
+                    self._execute(
+                        "INSERT OR IGNORE INTO composites (path, session_id, created_at) "
+                        "VALUES (?, ?, ?)",
+                        (file.path, entry.name, file.stat().st_mtime),
+                    )
+                elif file.name.endswith(("_image.png", "_image.jpg")):
+                    self.add_photo(entry.name, file.path, file.stat().st_mtime)
+            added += 1
+        return added
+
+
+def _current_photo_path(path: str) -> str:
+    """The photo's path, or its JPEG if it was compacted since it was recorded."""
+    if not os.path.exists(path):
+        compacted = str(Path(path).with_suffix(".jpg"))
+        if os.path.exists(compacted):
+            return compacted
+    return path
+
+
+def default_catalog_path(base_dir) -> str:
+    """CATALOG_PATH, or photobooth_catalog.sqlite3 in the session directory."""
+    return os.getenv("CATALOG_PATH", os.path.join(base_dir, "photobooth_catalog.sqlite3"))
@@ -1,85 +1,415 @@
 import datetime
+import itertools
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Optional, Union
+from typing import List, Optional, Union
 import cv2 as cv
+from controllers.session_catalog import SessionCatalog
+from controllers.session_storage import SessionStorage
+from controllers.session_trace import session_tracer
+from controllers.stage_timers import stage_timers
+
+STAGE_CAPTURE = "capture"
+STAGE_SELECTION = "selection"
+STAGE_RENDER = "render"
+STAGE_PRINT = "print"
+STAGE_DONE = "done"
+
+
+class Session:
+    """
+    One guest's run through the booth.
+
+    Carries its own folder, photos, template choice and stage, plus the
+    background work still running for it (photo saves, composite render and
+    save, print jobs). A session closed by the guest leaving stays alive
+    until that work is finished, so the next guest can start straight away.
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        template_path: str = "",
+        num_photos=None,
+        on_stage_changed=None,
+    ) -> None:
+        self.id = folder.name
+        self.folder = folder
+        self.created_at = time.time()
+        self.closed_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stage = STAGE_CAPTURE
+        self.template_path = template_path
+        self.num_photos = num_photos
+        self.preview_path = None
+        self.photo_paths: List[str] = []
+        self.print_job_ids: List[str] = []
+        self.composite_path: Optional[str] = None
+        self._on_stage_changed = on_stage_changed
+        # Where the session ends up once moved out of the hot tier
+        self.persistent_folder: Optional[Path] = None
+
+        self._lock = threading.Lock()
+        self._pending: set = set()  # futures of background stages
+        self._pending_prints = 0  # print requests not yet done or failed
+        self._save_futures: List[Future] = []
+
+    @property
+    def has_pending_work(self) -> bool:
+        with self._lock:
+            return bool(self._pending) or self._pending_prints > 0
+
+    @property
+    def is_closed(self) -> bool:
+        return self.closed_at is not None
+
+    def set_stage(self, stage: str):
+        if self.stage != stage:
+            print(f"Session {self.id}: {self.stage} -> {stage}")
+            self.stage = stage
+            if self._on_stage_changed is not None:
+                self._on_stage_changed(self)
+
+    def track(self, future: Future, on_done=None):
+        """
+        Keep the session alive until a background stage finishes.
+
+        Args:
+            future: The stage's future
+            on_done: Called with the future before the session lets go of
+                it, so the session is not finished and migrated under it
+        """
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda future: self._untrack(future, on_done))
+
+    def _untrack(self, future: Future, on_done=None):
+        try:
+            if on_done is not None:
+                on_done(future)
+        except Exception as e:
+            print(f"Session {self.id}: background stage callback failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(future)
+
+    def add_photo(self, photo_path: str, save_future: Future):
+        """Record a photo whose save to disk is still in flight."""
+        self.photo_paths.append(photo_path)
+        with self._lock:
+            self._save_futures.append(save_future)
+        self.track(save_future)
+
+    def request_print(self):
+        """Count a print the guest asked for, resolved by print_finished."""
+        with self._lock:
+            self._pending_prints += 1
+        self.set_stage(STAGE_PRINT)
+
+    def add_print_job(self, job_id: str):
+        with self._lock:
+            self.print_job_ids.append(job_id)
+
+    def print_finished(self):
+        with self._lock:
+            self._pending_prints = max(0, self._pending_prints - 1)
+
+    def wait_for_saves(self, timeout: Optional[float] = None):
+        """Block until every photo of the session is on disk."""
+        with self._lock:
+            futures = list(self._save_futures)
+        wait(futures, timeout=timeout)
 
 
 class SessionManager:
-    def __init__(self, base_dir) -> None:
+    def __init__(
+        self,
+        base_dir,
+        storage: Optional[SessionStorage] = None,
+        catalog: Optional[SessionCatalog] = None,
+    ) -> None:
         self._base_dir = Path(base_dir) if base_dir else Path.cwd()
-        self._current_session_folder: Optional[Path] = None
-        self._template_path = None
-        self._num_photos = None
-        self._preview_path = None
+        self._catalog = catalog
+        # Without a hot tier sessions are written straight to base_dir
+        self._storage = storage or SessionStorage(self._base_dir)
+        for hot_folder, migration in self._storage.recover():
+            migration.add_done_callback(
+                lambda future, hot_folder=hot_folder: self._on_recovered(
+                    hot_folder, future
+                )
+            )
+        self._current: Optional[Session] = None
+        # Closed sessions whose render or print is still running
+        self._background: List[Session] = []
+        self._finished_times = deque()
+        self._lock = threading.Lock()
+        self._save_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="photo_save"
+        )
 
     def create_session(self, template_path: str, num_photos):
         """Create new session folder and properties"""
-        self._template_path = template_path
-        self._num_photos = num_photos
-        now = datetime.datetime.now()
-        folder_name = now.strftime("session_%Y%m%d_%H%M%S")
-        self._current_session_folder = Path(os.path.join(self._base_dir, folder_name))
-        os.makedirs(self._current_session_folder, exist_ok=True)
-        print(f"Created session folder: {self._current_session_folder}")
-        return self._current_session_folder
+        if self._current is not None:
+            self.close_session()
+        folder = self._make_session_folder(datetime.datetime.now())
+        self._current = Session(
+            folder, template_path, num_photos, on_stage_changed=self._on_stage_changed
+        )
+        if self._catalog is not None:
+            self._catalog.add_session(self._current.id, folder, self._current.created_at)
+        session_tracer.set_session(self._current.id)
+        print(f"Created session folder: {folder}")
+        return folder
+
+    def _make_session_folder(self, now: datetime.datetime) -> Path:
+        """
+        Create a folder with a unique name, which is also the session id.
+
+        Sessions overlap and the id names traces, download tokens and catalog
+        rows, so names have milliseconds and a counter if that is not enough.
+        """
+        base_name = f"{now:session_%Y%m%d_%H%M%S}_{now.microsecond // 1000:03d}"
+        folder_name = base_name
+        for attempt in itertools.count(1):
+            folder = self._storage.session_dir(folder_name)
+            # A finished session may already have moved to the persistent tier
+            if not (self._storage.persistent_dir / folder_name).exists():
+                try:
+                    os.makedirs(folder)
+                    return folder
+                except FileExistsError:
+                    pass
+            folder_name = f"{base_name}_{attempt}"
 
     def create_default_session(self):
         return self.create_session("", None)
 
+    @property
+    def current_session(self) -> Optional[Session]:
+        return self._current
+
+    def set_stage(self, stage: str):
+        if self._current is not None:
+            self._current.set_stage(stage)
+
     def set_template_path(self, template_path: str):
-        self._template_path = template_path
+        if self._current is not None:
+            self._current.template_path = template_path
+            self._update_catalog(self._current, template_path=template_path)
 
     def set_num_photos(self, num_photos: int):
-        self._num_photos = num_photos
+        if self._current is not None:
+            self._current.num_photos = num_photos
+            self._update_catalog(self._current, num_photos=num_photos)
+
+    def set_selected_photos(self, photo_paths: List[str]):
+        if self._current is not None and self._catalog is not None:
+            self._catalog.select_photos(self._current.id, photo_paths)
 
     def set_preview(self, preview_path):
-        self._preview_path = preview_path
+        if self._current is not None:
+            self._current.preview_path = preview_path
 
     @property
     def get_current_session_folder(self):
-        return self._current_session_folder
+        return self._current.folder if self._current is not None else None
 
     @property
     def photo_count(self) -> int:
         """Get number of photos saved in current session."""
-        return self._photo_count
+        return len(self._current.photo_paths) if self._current is not None else 0
 
     @property
     def template_info(self):
         """Get path of templates and index selected"""
+        if self._current is None:
+            return (None, None, None)
         return (
-            self._template_path,
-            self._num_photos,
-            self._preview_path,
+            self._current.template_path,
+            self._current.num_photos,
+            self._current.preview_path,
         )
 
+    @property
+    def background_sessions(self) -> List[Session]:
+        """Closed sessions still rendering or printing."""
+        with self._lock:
+            return list(self._background)
+
+    def active_folder_names(self) -> List[str]:
+        """Folder names of the current session and those finishing in the background."""
+        return [session.folder.name for session in self._sessions()]
+
     def reset_session(self):
-        """Reset the session."""
-        self._current_session_folder = None
-        self._photo_count = 0
-        self._num_photos = None
-        self._template_path = None
-        self._preview_path = None
+        """Reset the session, its background stages carry on."""
+        self.close_session()
 
     def close_session(self):
         """Close the current session."""
-        self._current_session_folder = None
-        self._photo_count = 0
-        self._template_path = None
-        self._preview_path = None
+        session = self._current
+        self._current = None
+        if session is None:
+            return
+        session_tracer.set_session(None)
+        session.closed_at = time.time()
+        self._update_catalog(session, closed_at=session.closed_at)
+        with self._lock:
+            self._background.append(session)
+        self._reap_sessions()
+
+    def print_finished(self, session_id: Optional[str], job_id: Optional[str] = None):
+        """Called when a print job of a session is done or has failed."""
+        for session in self._sessions():
+            # The job id finds the session when the spooler no longer has the job
+            if session.id == session_id or (
+                session_id is None and job_id in session.print_job_ids
+            ):
+                session.print_finished()
+        self._reap_sessions()
+
+    def sessions_per_hour(self) -> int:
+        """Number of sessions finished in the last hour."""
+        self._reap_sessions()
+        cutoff = time.time() - 3600
+        with self._lock:
+            while self._finished_times and self._finished_times[0] < cutoff:
+                self._finished_times.popleft()
+            return len(self._finished_times)
+
+    def finished_in_last_hour(self) -> int:
+        """Like sessions_per_hour, but only reads, safe to call from any thread."""
+        cutoff = time.time() - 3600
+        with self._lock:
+            return sum(1 for finished_at in self._finished_times if finished_at >= cutoff)
+
+    def _sessions(self) -> List[Session]:
+        with self._lock:
+            sessions = list(self._background)
+        if self._current is not None:
+            sessions.append(self._current)
+        return sessions
+
+    def _reap_sessions(self):
+        """Finish closed sessions that have no background work left."""
+        with self._lock:
+            finished = [s for s in self._background if not s.has_pending_work]
+            for session in finished:
+                self._background.remove(session)
+                session.finished_at = time.time()
+                self._finished_times.append(session.finished_at)
+        # Catalog writes stay outside the lock, this runs on any worker thread
+        for session in finished:
+            session.set_stage(STAGE_DONE)
+            self._update_catalog(session, finished_at=session.finished_at)
+            print(
+                f"Session {session.id} finished in "
+                f"{session.finished_at - session.created_at:.0f}s"
+            )
+            session_tracer.finish_session(session.id)
+            migration = self._storage.migrate(session.folder)
+            if migration is not None:
+                migration.add_done_callback(
+                    lambda future, session=session: self._on_migrated(session, future)
+                )
+            else:
+                session.persistent_folder = session.folder
+
+    def _on_migrated(self, session: Session, future: Future):
+        try:
+            session.persistent_folder = future.result()
+        except Exception as e:
+            # Left in the hot tier, retried by recover() on the next start
+            print(f"Could not migrate session {session.id}: {e}")
+            return
+        if self._catalog is not None:
+            self._catalog.relocate_session(
+                session.id, session.folder, session.persistent_folder
+            )
 
-    def save_photo(self, frame):
+    def _on_recovered(self, hot_folder: Path, future: Future):
+        # Sessions left in the hot tier by the last run, the folder name is the id
+        try:
+            persistent_folder = future.result()
+        except Exception as e:
+            print(f"Could not recover session {hot_folder.name}: {e}")
+            return
+        if self._catalog is not None:
+            self._catalog.relocate_session(hot_folder.name, hot_folder, persistent_folder)
+
+    def _on_stage_changed(self, session: Session):
+        self._update_catalog(session, stage=session.stage)
+
+    def _update_catalog(self, session: Session, **fields):
+        if self._catalog is not None:
+            self._catalog.update_session(session.id, **fields)
+
+    def add_composite(self, session: Session, composite_path: str):
+        """Record the saved final composite of a session, reused by reprints."""
+        session.composite_path = composite_path
+        if self._catalog is not None:
+            self._catalog.add_composite(session.id, composite_path, session.template_path)
+
+    def track(self, future: Future, session: Optional[Session] = None, on_done=None):
+        """
+        Attach a background stage to a session (the current one by default).
+
+        on_done runs with the future before the session can be reaped and
+        its folder migrated, e.g. to record a file written by the stage.
+        """
+        session = session or self._current
+        if session is None:
+            return
+        session.track(future, on_done)
+        future.add_done_callback(lambda _: self._reap_sessions())
+
+    def save_photo(self, frame) -> str:
+        """
+        Queue a captured frame to be written to the current session folder.
+
+        PNG encoding of a full resolution frame takes tens of milliseconds,
+        so it runs on a worker instead of the GUI thread.
+
+        Returns:
+            Path the photo will be saved to
+        """
         # Save the captured image to current session folder
         now = datetime.datetime.now()
         formatted_date_time = now.strftime("%Y-%m-%d %H%M%S.%f")
         filename = f"{formatted_date_time}_image.png"
 
         # Save to session folder if it exists, otherwise save to current directory
-        if self._current_session_folder:
-            filepath = os.path.join(self._current_session_folder, filename)
+        session = self._current
+        if session is not None:
+            filepath = os.path.join(session.folder, filename)
         else:
             filepath = filename
 
-        cv.imwrite(filepath, frame)
+        future = self._save_executor.submit(
+            self._write_photo, filepath, frame, session.id if session else None
+        )
+        if session is not None:
+            session.add_photo(filepath, future)
+            if self._catalog is not None:
+                self._catalog.add_photo(session.id, filepath, now.timestamp())
+            future.add_done_callback(lambda _: self._reap_sessions())
+        return filepath
+
+    def wait_for_saves(self, timeout: Optional[float] = None):
+        """Block until the current session's photos are on disk."""
+        if self._current is not None:
+            self._current.wait_for_saves(timeout)
+
+    def shutdown(self):
+        """Finish queued photo saves, unfinished migrations resume on next start."""
+        self._save_executor.shutdown(wait=True)
+        self._storage.shutdown(wait=False)
+
+    @staticmethod
+    def _write_photo(filepath: Union[str, Path], frame, session_id=None):
+        with stage_timers.time("save", session_id):
+            cv.imwrite(filepath, frame)
         print(f"Photo captured and saved as {filepath}")
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+# Partially copied files in the persistent tier, removed on recovery
+PART_SUFFIX = ".part"
+
+
+class SessionStorage:
+    """
+    Two tier storage for session folders.
+
+    Active sessions are written to a RAM backed hot directory (tmpfs) so
+    captures, preview strips and composites never wait on the kiosk's SD or
+    eMMC storage. Finished sessions are copied to the persistent directory on
+    a background thread; every file is verified by SHA-256 before the hot
+    copy is removed. Sessions left in the hot tier by a crash are migrated on
+    the next start. tmpfs does not survive a power cut, so sessions are
+    moved as soon as their last background stage finishes.
+    """
+
+    def __init__(self, persistent_dir: Union[str, Path], hot_dir=None) -> None:
+        self.persistent_dir = Path(persistent_dir)
+        self.hot_dir = Path(hot_dir) if hot_dir else None
+        if self.hot_dir is not None:
+            try:
+                os.makedirs(self.hot_dir, exist_ok=True)
+            except OSError as e:
+                print(f"Hot session storage unavailable ({e}), using {persistent_dir}")
+                self.hot_dir = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="session_migrate"
+        )
+
+    @property
+    def is_tiered(self) -> bool:
+        return self.hot_dir is not None
+
+    def session_dir(self, folder_name: str) -> Path:
+        """Folder to create a new session in."""
+        return (self.hot_dir or self.persistent_dir) / folder_name
+
+    def resolve(self, path: Union[str, Path]) -> str:
+        """Map a path in the hot tier to its persistent copy once migrated."""
+        path = Path(path)
+        if self.hot_dir is None or path.exists():
+            return str(path)
+        try:
+            relative = path.relative_to(self.hot_dir)
+        except ValueError:
+            return str(path)
+        return str(self.persistent_dir / relative)
+
+    def migrate(self, session_folder: Union[str, Path]) -> Optional[Future]:
+        """
+        Queue a finished session to be moved to persistent storage.
+
+        Returns:
+            Future resolving to the persistent folder, None if not tiered
+        """
+        session_folder = Path(session_folder)
+        if self.hot_dir is None or session_folder.parent != self.hot_dir:
+            return None
+        return self._executor.submit(self._migrate, session_folder)
+
+    def recover(self) -> List[Tuple[Path, Future]]:
+        """
+        Migrate sessions a previous run left in the hot tier.
+
+        Returns:
+            (hot folder, future resolving to the persistent folder) per session
+        """
+        migrations = []
+        if self.hot_dir is None:
+            return migrations
+        for session_folder in sorted(self.hot_dir.glob("session_*")):
+            if session_folder.is_dir():
+                print(f"Recovering unmigrated session {session_folder.name}")
+                migrations.append(
+                    (session_folder, self._executor.submit(self._migrate, session_folder))
+                )
+        return migrations
+
+    def shutdown(self, wait: bool = True):
+        """Finish queued migrations, anything left is recovered on next start."""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _migrate(self, session_folder: Path) -> Path:
+        target = self.persistent_dir / session_folder.name
+        for part in target.rglob(f"*{PART_SUFFIX}") if target.exists() else []:
+            part.unlink()
+
+        files = [p for p in session_folder.rglob("*") if p.is_file()]
+        for source in files:
+            destination = target / source.relative_to(session_folder)
+            if destination.exists() and _sha256(destination) == _sha256(source):
+                continue  # Copied by an earlier, interrupted migration
+            self._copy_verified(source, destination)
+
+        shutil.rmtree(session_folder)
+        print(f"Migrated session {session_folder.name} ({len(files)} files) to {target}")
+        return target
+
+    @staticmethod
+    def _copy_verified(source: Path, destination: Path):
+        os.makedirs(destination.parent, exist_ok=True)
+        part = destination.with_name(destination.name + PART_SUFFIX)
+
+        digest = hashlib.sha256()
+        with open(source, "rb") as src, open(part, "wb") as dst:
+            for chunk in iter(lambda: src.read(1 << 20), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        if _sha256(part) != digest.hexdigest():
+            part.unlink()
+            raise IOError(f"Checksum mismatch migrating {source}")
+        os.replace(part, destination)
+        shutil.copystat(source, destination)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def create_session_storage_from_env(persistent_dir) -> SessionStorage:
+    """
+    Build session storage from the environment.
+
+    SESSION_HOT_DIR is the RAM backed directory for active sessions, "off"
+    disables tiering. Defaults to /dev/shm/photobooth where /dev/shm exists.
+    """
+    hot_dir = os.getenv("SESSION_HOT_DIR")
+    if hot_dir is None and os.path.isdir("/dev/shm"):
+        hot_dir = "/dev/shm/photobooth"
+    if hot_dir in ("", "off"):
+        hot_dir = None
+    return SessionStorage(persistent_dir, hot_dir)
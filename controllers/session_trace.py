@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+# Events kept per session, a session left open on a screen cannot grow forever
+MAX_EVENTS_PER_SESSION = 200_000
+
+# Finished sessions remembered, so late spans are dropped instead of kept forever
+MAX_FINISHED_SESSIONS = 1024
+
+_DISABLED = nullcontext()
+
+
+def _now_us() -> float:
+    # Same clock as StageTimers, whose stages are added as spans too
+    return time.perf_counter() * 1e6
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_session_id", "_args", "_start")
+
+    def __init__(self, tracer, name: str, session_id: Optional[str], args: dict) -> None:
+        self._tracer = tracer
+        self._name = name
+        # Bound when the span starts, the guest may have moved on by its end
+        self._session_id = session_id or tracer.current_session
+        self._args = args
+
+    def __enter__(self):
+        self._start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        self._tracer.add_span(
+            self._name, self._start, _now_us(), self._session_id, self._args
+        )
+        return False
+
+
+class SessionTracer:
+    """
+    Records a timeline of each guest session in Chrome trace event format.
+
+    Spans from the GUI thread (screens, navigation, capture) and from the
+    workers (photo saves, composite render and save, preview strips, print
+    calls) are buffered per session and written to <trace_dir>/<session>.json
+    once the session has finished, ready for chrome://tracing or
+    ui.perfetto.dev. Spans without an explicit session belong to the session
+    current when they start; with no session they are dropped, as are spans
+    ending after their session's trace was written. Disabled
+    until enable() is called, span() then returns a shared no-op context.
+    """
+
+    def __init__(self) -> None:
+        self.trace_dir: Optional[str] = None
+        self.current_session: Optional[str] = None
+        self._events: Dict[str, List[dict]] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._finished: Dict[str, None] = {}  # insertion ordered set
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._screen = None  # (name, start, session) of the screen on show
+
+    @property
+    def enabled(self) -> bool:
+        return self.trace_dir is not None
+
+    def enable(self, trace_dir):
+        os.makedirs(trace_dir, exist_ok=True)
+        self.trace_dir = str(trace_dir)
+        print(f"Tracing sessions to {self.trace_dir}")
+
+    def set_session(self, session_id: Optional[str]):
+        """Session that spans without an explicit session are added to."""
+        self.current_session = session_id
+
+    def span(self, name: str, session_id: Optional[str] = None, **args):
+        """Context manager recording its block as a complete event."""
+        if not self.enabled:
+            return _DISABLED
+        return _Span(self, name, session_id, args)
+
+    def add_span(
+        self,
+        name: str,
+        start_us: float,
+        end_us: float,
+        session_id: Optional[str] = None,
+        args: Optional[dict] = None,
+    ):
+        event = {"ph": "X", "name": name, "ts": start_us, "dur": end_us - start_us}
+        if args:
+            event["args"] = args
+        self._add(event, session_id)
+
+    def screen_changed(self, screen_name: str):
+        """End the span of the screen on show and start one for screen_name."""
+        if not self.enabled:
+            return
+        now = _now_us()
+        if self._screen is not None:
+            name, start, session_id = self._screen
+            self.add_span(f"screen: {name}", start, now, session_id)
+        self._screen = (screen_name, now, self.current_session)
+
+    def instant(self, name: str, session_id: Optional[str] = None, **args):
+        """Mark a point in time on the calling thread, e.g. a countdown start."""
+        event = {"ph": "i", "s": "t", "name": name, "ts": _now_us()}
+        if args:
+            event["args"] = args
+        self._add(event, session_id)
+
+    def _add(self, event: dict, session_id: Optional[str]):
+        if not self.enabled:
+            return
+        session_id = session_id or self.current_session
+        if session_id is None:
+            return
+        thread = threading.current_thread()
+        event["pid"] = self._pid
+        event["tid"] = thread.ident
+        with self._lock:
+            if session_id in self._finished:
+                return
+            self._thread_names.setdefault(thread.ident, thread.name)
+            events = self._events.setdefault(session_id, [])
+            if len(events) < MAX_EVENTS_PER_SESSION:
+                events.append(event)
+
+    def finish_session(self, session_id: str) -> Optional[str]:
+        """
+        Write the trace of a finished session and drop its events.
+
+        Returns:
+            Path of the trace file, None if nothing was recorded
+        """
+        with self._lock:
+            events = self._events.pop(session_id, None)
+            self._finished[session_id] = None
+            if len(self._finished) > MAX_FINISHED_SESSIONS:
+                del self._finished[next(iter(self._finished))]
+            thread_names = dict(self._thread_names)
+        if not self.enabled or not events:
+            return None
+
+        metadata = [
+            {
+                "ph": "M",
+                "name": "process_name",
+                "pid": self._pid,
+                "args": {"name": "photobooth"},
+            }
+        ]
+        for tid in {event["tid"] for event in events}:
+            metadata.append(
+                {
+                    "ph": "M",
+                    "name": "thread_name",
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": {"name": thread_names.get(tid, str(tid))},
+                }
+            )
+        trace = {
+            "traceEvents": metadata + sorted(events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"session": session_id},
+        }
+
+        path = os.path.join(self.trace_dir, f"{session_id}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(trace, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write trace of {session_id}: {e}")
+            return None
+        print(f"Trace of {session_id}: {len(events)} events in {path}")
+        return path
+
+
+# Shared by every controller and screen, see main_window for TRACE_SESSIONS
+session_tracer = SessionTracer()
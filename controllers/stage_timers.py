@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import nullcontext
+from typing import Dict, Optional
+from controllers.session_trace import session_tracer
+
+# Returned by StageTimers.time() while disabled, nothing is measured
+_DISABLED = nullcontext()
+
+# Upper bounds in seconds of the cumulative latency histograms
+HISTOGRAM_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+
+
+class _StageTimer:
+    __slots__ = ("_timers", "_stage", "_session_id", "_start")
+
+    def __init__(self, timers: "StageTimers", stage: str, session_id) -> None:
+        self._timers = timers
+        self._stage = stage
+        self._session_id = session_id or session_tracer.current_session
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self._timers.record(self._stage, end - self._start)
+        if session_tracer.enabled:
+            session_tracer.add_span(
+                self._stage, self._start * 1e6, end * 1e6, self._session_id
+            )
+        return False
+
+
+class StageTimers:
+    """
+    Rolling per-stage latency samples for the capture, preview and print paths.
+
+    Each stage keeps its last `window` durations in a ring buffer, appended
+    without locking (deque appends are atomic), and percentiles are only
+    computed when a snapshot is taken. Every sample also lands in a
+    cumulative histogram for the metrics endpoint. Events such as camera
+    frames keep their timestamps for rates, and counters such as dropped
+    frames only grow. Timed stages are also added to the session trace when
+    tracing is on. While both are off, time() returns a shared no-op context and
+    record() and count() return immediately.
+
+    Users such as the HUD and the metrics endpoint turn the timers on with
+    acquire() and off with release(), they stay on while any user holds them.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = 512) -> None:
+        self._users = 1 if enabled else 0
+        self.enabled = enabled
+        self._window = window
+        self._samples: Dict[str, deque] = {}
+        self._events: Dict[str, deque] = {}
+        self._counters: Dict[str, int] = {}
+        # stage -> [bucket counts (last is +Inf), sum of seconds, count]
+        self._histograms: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Turn the timers on until the matching release()."""
+        with self._lock:
+            self._users += 1
+            self.enabled = True
+
+    def release(self):
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            self.enabled = self._users > 0
+
+    def time(self, stage: str, session_id: Optional[str] = None):
+        """
+        Context manager recording the duration of its block as a stage sample.
+
+        Args:
+            stage: Stage name, e.g. "overlay"
+            session_id: Session the span belongs to in the trace, the
+                current one by default
+        """
+        if not self.enabled and not session_tracer.enabled:
+            return _DISABLED
+        return _StageTimer(self, stage, session_id)
+
+    def record(self, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        samples = self._samples.get(stage)
+        if samples is None:
+            with self._lock:
+                samples = self._samples.setdefault(stage, deque(maxlen=self._window))
+        samples.append(seconds)
+        bucket = bisect_left(HISTOGRAM_BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = [[0] * (len(HISTOGRAM_BUCKETS) + 1), 0.0, 0]
+                self._histograms[stage] = histogram
+            histogram[0][bucket] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def event(self, name: str):
+        """Note that an event happened now, e.g. a frame was shown."""
+        if not self.enabled:
+            return
+        events = self._events.get(name)
+        if events is None:
+            with self._lock:
+                events = self._events.setdefault(name, deque(maxlen=self._window))
+        events.append(time.perf_counter())
+
+    def count(self, name: str, amount: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def rate(self, name: str) -> float:
+        """Events per second over the retained window, 0 if not enough events."""
+        events = list(self._events.get(name, ()))
+        if len(events) < 2 or events[-1] == events[0]:
+            return 0.0
+        return (len(events) - 1) / (events[-1] - events[0])
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def histograms(self) -> Dict[str, dict]:
+        """
+        Latency histograms of every stage since startup.
+
+        Returns:
+            {stage: {"buckets": [count per HISTOGRAM_BUCKETS bound, then +Inf],
+                     "sum": total seconds, "count": samples}}
+        """
+        with self._lock:
+            return {
+                stage: {"buckets": list(counts), "sum": total, "count": count}
+                for stage, (counts, total, count) in self._histograms.items()
+            }
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Percentiles of every stage.
+
+        Returns:
+            {stage: {"count", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}
+        """
+        stats = {}
+        for stage, samples in list(self._samples.items()):
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            stats[stage] = {
+                "count": len(ordered),
+                "p50_ms": _percentile(ordered, 0.50) * 1000,
+                "p95_ms": _percentile(ordered, 0.95) * 1000,
+                "p99_ms": _percentile(ordered, 0.99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._events.clear()
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Shared by every controller and screen, STAGE_TIMERS=1 turns it on at startup
+stage_timers = StageTimers(enabled=os.getenv("STAGE_TIMERS", "0") == "1")
@@ -0,0 +1,169 @@
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from PySide6.QtCore import QTimer
+from controllers.session_trace import session_tracer
+from controllers.stage_timers import stage_timers
+
+# Frames under this folder are ours, the rest are Qt, the stdlib or libraries
+_PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+
+
+class StallWatchdog:
+    """
+    Detects freezes of the Qt event loop.
+
+    A QTimer on the GUI thread beats every heartbeat_ms. A watcher thread
+    checks the last beat and, once it is more than threshold_ms old, takes
+    the GUI thread's Python stack with sys._current_frames() and logs it
+    with the screen and session from context(). When the beats resume the
+    stall's duration is added to a ranking of stall sites, the innermost
+    frame of our own code in the stack. Stalls are also recorded as the
+    gui_stall stage of the stage timers and as spans in the session trace.
+
+    Nested event loops such as the one in CameraScreen._capture_photo keep
+    servicing the heartbeat, only the work done between beats is caught.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: int = 250,
+        heartbeat_ms: int = 50,
+        context: Optional[Callable[[], dict]] = None,
+    ) -> None:
+        self._threshold = threshold_ms / 1000
+        self._heartbeat_ms = heartbeat_ms
+        self._context = context or (lambda: {})
+        self._last_beat = time.perf_counter()
+        self._gui_thread_id = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # site -> {"count", "total_ms", "max_ms"}
+        self._sites: Dict[str, dict] = {}
+
+        self._timer = QTimer()
+        self._timer.timeout.connect(self._beat)
+        self._thread = threading.Thread(
+            target=self._watch, name="stall_watchdog", daemon=True
+        )
+
+    def start(self):
+        """Start the heartbeat, must be called from the GUI thread."""
+        self._gui_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._timer.start(self._heartbeat_ms)
+        self._thread.start()
+        print(
+            f"Stall watchdog on, reporting GUI stalls over {self._threshold * 1000:.0f}ms"
+        )
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1)
+        self.print_summary()
+
+    def _beat(self):
+        self._last_beat = time.perf_counter()
+
+    def _watch(self):
+        stall = None  # (last beat before the stall, site, context)
+        while not self._stop.wait(self._heartbeat_ms / 2000):
+            last_beat = self._last_beat
+            if stall is not None:
+                if last_beat != stall[0]:
+                    self._stall_ended(stall, last_beat)
+                    stall = None
+                continue
+            if time.perf_counter() - last_beat > self._threshold:
+                stall = self._stall_started(last_beat)
+
+    def _stall_started(self, last_beat: float):
+        frame = sys._current_frames().get(self._gui_thread_id)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        site = _stall_site(stack)
+        context = self._context()
+        details = ", ".join(f"{key} {value}" for key, value in context.items())
+        print(
+            f"GUI thread stalled for over {self._threshold * 1000:.0f}ms at {site}"
+            + (f" ({details})" if details else "")
+        )
+        print("".join(traceback.format_list(stack[-15:])), end="")
+        return last_beat, site, context
+
+    def _stall_ended(self, stall, resumed_at: float):
+        started_at, site, context = stall
+        seconds = resumed_at - started_at
+        print(f"GUI thread stall at {site} lasted {seconds * 1000:.0f}ms")
+        with self._lock:
+            stats = self._sites.setdefault(
+                site, {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            stats["count"] += 1
+            stats["total_ms"] += seconds * 1000
+            stats["max_ms"] = max(stats["max_ms"], seconds * 1000)
+        stage_timers.record("gui_stall", seconds)
+        session_tracer.add_span(
+            "gui_stall",
+            started_at * 1e6,
+            resumed_at * 1e6,
+            context.get("session"),
+            {"site": site},
+        )
+
+    def summary(self) -> List[dict]:
+        """
+        Stall sites ranked by the total time the GUI thread was frozen there.
+
+        Returns:
+            [{"site", "count", "total_ms", "max_ms"}], worst first
+        """
+        with self._lock:
+            sites = [dict(stats, site=site) for site, stats in self._sites.items()]
+        return sorted(sites, key=lambda stats: stats["total_ms"], reverse=True)
+
+    def print_summary(self, limit: int = 10):
+        sites = self.summary()
+        if not sites:
+            return
+        print("GUI stalls by total time:")
+        for stats in sites[:limit]:
+            print(
+                f"  {stats['total_ms']:8.0f}ms  {stats['count']:4d}x  "
+                f"max {stats['max_ms']:6.0f}ms  {stats['site']}"
+            )
+
+
+def _stall_site(stack: traceback.StackSummary) -> str:
+    """Innermost frame of our own code, the innermost frame otherwise."""
+    for frame in reversed(stack):
+        if frame.filename.startswith(_PROJECT_DIR) and frame.filename != __file__:
+            location = os.path.relpath(frame.filename, _PROJECT_DIR)
+            return f"{location}:{frame.lineno} {frame.name}"
+    if stack:
+        return f"{stack[-1].filename}:{stack[-1].lineno} {stack[-1].name}"
+    return "unknown"
+
+
+def create_stall_watchdog_from_env(
+    context: Optional[Callable[[], dict]] = None,
+) -> Optional[StallWatchdog]:
+    """
+    Build the GUI stall watchdog, None unless STALL_WATCHDOG=1.
+
+    STALL_THRESHOLD_MS (default 250) is how long the event loop may go
+    without servicing the heartbeat, STALL_HEARTBEAT_MS (default 50) how
+    often it beats.
+    """
+    if os.getenv("STALL_WATCHDOG", "0") != "1":
+        return None
+    return StallWatchdog(
+        threshold_ms=int(os.getenv("STALL_THRESHOLD_MS", "250")),
+        heartbeat_ms=int(os.getenv("STALL_HEARTBEAT_MS", "50")),
+        context=context,
+    )
@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QFileSystemWatcher, QObject, QTimer, Signal
+from config.load_metadata import (
+    TEMPLATES_DIR,
+    apply_templates_config,
+    index_templates,
+    templates_config_dict,
+)
+
+
+class TemplateWatcher(QObject):
+    """
+    Watches the templates directory and re-indexes templates that change.
+
+    File system events are debounced, indexing runs on a worker thread
+    (only new or modified files are opened, see index_templates) and the
+    result is applied to templates_config_dict back on the GUI thread.
+
+    Emits signal
+        changed_paths: set of template paths added, modified or removed
+    """
+
+    templates_changed = Signal(object)
+    _indexed = Signal(object, object)  # config, changed paths (worker -> GUI)
+
+    def __init__(self, directory: str = TEMPLATES_DIR, debounce_ms: int = 500) -> None:
+        super().__init__()
+        self._directory = directory
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="template_watcher"
+        )
+        self._indexing = False
+        self._rescan_requested = False
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(debounce_ms)
+        self._debounce.timeout.connect(self._start_reindex)
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_file_system_event)
+        self._watcher.fileChanged.connect(self._on_file_system_event)
+        self._indexed.connect(self._on_indexed)
+        self._watch_paths()
+
+    def stop(self):
+        """Stop watching and shut down the indexing worker."""
+        self._debounce.stop()
+        paths = self._watcher.directories() + self._watcher.files()
+        if paths:
+            self._watcher.removePaths(paths)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _watch_paths(self):
+        """Watch every directory (new files) and template (edits) under the root."""
+        wanted = set()
+        for root, _, files in os.walk(self._directory):
+            wanted.add(os.path.abspath(root))
+            # Including PNGs the index skipped, a half-copied file is retried
+            # once its writes finish
+            wanted.update(
+                os.path.abspath(os.path.join(root, name))
+                for name in files
+                if name.lower().endswith(".png")
+            )
+        wanted.update(templates_config_dict.keys())
+
+        # Replaced files drop out of the watcher, so re-add anything missing
+        watched = set(self._watcher.directories() + self._watcher.files())
+        missing = [p for p in wanted - watched if os.path.exists(p)]
+        if missing:
+            self._watcher.addPaths(missing)
+
+    def _on_file_system_event(self, path: str):
+        self._debounce.start()
+
+    def _start_reindex(self):
+        if self._indexing:
+            # Pick up changes made while the current pass was running
+            self._rescan_requested = True
+            return
+        self._indexing = True
+        known_paths = set(templates_config_dict)
+        self._executor.submit(self._reindex, known_paths)
+
+    def _reindex(self, known_paths):
+        try:
+            config, changed = index_templates(self._directory, known_paths)
+        except Exception as e:
+            print(f"Could not re-index templates: {e}")
+            config, changed = None, set()
+        self._indexed.emit(config, changed)
+
+    def _on_indexed(self, config, changed):
+        self._indexing = False
+        if config is not None and changed:
+            apply_templates_config(config)
+            print(f"Templates changed: {sorted(changed)}")
+            self.templates_changed.emit(changed)
+        self._watch_paths()
+
+        if self._rescan_requested:
+            self._rescan_requested = False
+            self._start_reindex()
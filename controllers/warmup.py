@@ -0,0 +1,125 @@
+import os
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+import cv2 as cv
+import numpy as np
+from PySide6.QtCore import QObject, Signal
+from controllers.composite_pipeline import CompositePipeline
+from controllers.image_processor import ImageProcessor, RenderQuality
+
+
+class Warmup(QObject):
+    """
+    Exercises the capture, preview and print hot paths on synthetic data.
+
+    First calls into cv.resize, cvtColor, the PNG codecs, PIL and QPixmap
+    carry one-off initialisation costs. Running them once while the title
+    screen is idle means the first guest sees steady-state latency. The
+    QPixmap conversions run on the GUI thread (they must), everything else
+    on a worker thread.
+
+    Emits signal
+        timings: {stage: milliseconds}
+    """
+
+    finished = Signal(object)
+
+    def __init__(
+        self,
+        image_processor: ImageProcessor,
+        template_paths: List[str],
+        frame_size=(1920, 1080),
+    ) -> None:
+        super().__init__()
+        self._image_processor = image_processor
+        self._template_paths = list(template_paths)
+        self._frame_size = frame_size
+        self._cancelled = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+
+    def start(self, preview_size=(1280, 720)):
+        """Run the GUI thread stages now and queue the rest on the worker."""
+        self._cancelled = False
+        timings = {}
+        frame = self._synthetic_frame()
+
+        start = time.perf_counter()
+        overlay = np.zeros((frame.shape[0], frame.shape[1], 4), dtype=np.uint8)
+        cv.rectangle(overlay, (0, 0), (frame.shape[1], 80), (0, 0, 255, 180), -1)
+        processed = self._image_processor.apply_overlay(frame, overlay, True)
+        timings["apply_overlay"] = (time.perf_counter() - start) * 1000
+
+        for quality in (RenderQuality.PREVIEW, RenderQuality.PRINT):
+            start = time.perf_counter()
+            ImageProcessor.frame_to_qpixmap(processed, preview_size, quality=quality)
+            timings[f"frame_to_qpixmap_{quality.value}"] = (
+                time.perf_counter() - start
+            ) * 1000
+
+        future = self._executor.submit(self._warm_worker, frame, timings)
+        future.add_done_callback(self._on_worker_done)
+        return future
+
+    def cancel(self):
+        """Skip the remaining worker stages, e.g. when a guest starts a session."""
+        self._cancelled = True
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _synthetic_frame(self) -> np.ndarray:
+        width, height = self._frame_size
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        return cv.GaussianBlur(frame, (0, 0), 2)
+
+    def _warm_worker(self, frame, timings):
+        processor = ImageProcessor()
+        with tempfile.TemporaryDirectory(prefix="photobooth_warmup_") as tmp:
+            # Same encode as SessionManager.save_photo
+            start = time.perf_counter()
+            photo_paths = []
+            for i in range(4):
+                path = os.path.join(tmp, f"warmup_{i}_image.png")
+                cv.imwrite(path, frame)
+                photo_paths.append(path)
+            timings["save_photo"] = (time.perf_counter() - start) * 1000
+
+            # One template per layout, at both preview and print quality
+            layouts = {}
+            for template_path in self._template_paths:
+                layouts.setdefault("horizontal" in template_path.lower(), template_path)
+
+            for template_path in layouts.values():
+                for quality in (RenderQuality.PREVIEW, RenderQuality.PRINT):
+                    if self._cancelled:
+                        return timings
+                    start = time.perf_counter()
+                    composite = processor.create_photo_composite(
+                        photo_paths, template_path, quality
+                    )
+                    timings[f"composite_{quality.value}"] = (
+                        time.perf_counter() - start
+                    ) * 1000
+
+            if self._cancelled or not layouts:
+                return timings
+
+            # Same PIL encode as the final composite save
+            start = time.perf_counter()
+            rendered = Future()
+            rendered.set_result(composite)
+            CompositePipeline._save(rendered, photo_paths, tmp)
+            timings["save_composite"] = (time.perf_counter() - start) * 1000
+        return timings
+
+    def _on_worker_done(self, future: Future):
+        try:
+            timings = future.result()
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+            timings = {}
+        self.finished.emit(timings)
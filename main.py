@@ -1,13 +1,18 @@
+import os
 import sys
-from PySide6 import QtGui
 from PySide6.QtWidgets import QApplication
 from config.load_metadata import initialize_templates_config_dict
-from ui.main_window import PhotoboothGUI
 
 if __name__ == "__main__":
     initialize_templates_config_dict()
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
-    window = PhotoboothGUI("")
+
+    # Imported after QApplication so the title screen can paint before the heavy imports
+    from ui.main_window import PhotoboothGUI
+
+    # Set PHOTOBOOTH_EAGER_STARTUP=1 to build every screen before showing the window
+    lazy_startup = os.getenv("PHOTOBOOTH_EAGER_STARTUP", "0") != "1"
+    window = PhotoboothGUI("", lazy_startup=lazy_startup)
     window.showMaximized()
     sys.exit(app.exec())
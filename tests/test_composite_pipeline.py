@@ -0,0 +1,23 @@
+import datetime
+import numpy as np
+from controllers import composite_pipeline
+from controllers.composite_pipeline import CompositePipeline
+
+
+class FrozenDatetime(datetime.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 6, 1, 18, 30, 0, 250000)
+
+
+def test_composites_saved_in_the_same_millisecond_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(composite_pipeline.datetime, "datetime", FrozenDatetime)
+    composite = np.zeros((40, 60, 3), np.uint8)
+
+    paths = [CompositePipeline._write(composite, [], str(tmp_path)) for _ in range(3)]
+
+    assert [p.rsplit("/", 1)[1] for p in paths] == [
+        "final_composite_20250601_183000_250.png",
+        "final_composite_20250601_183000_250_1.png",
+        "final_composite_20250601_183000_250_2.png",
+    ]
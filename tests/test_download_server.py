@@ -0,0 +1,90 @@
+import http.client
+import numpy as np
+import cv2 as cv
+import pytest
+from controllers.download_server import DownloadServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = DownloadServer(tmp_path / "downloads", host="127.0.0.1", port=0)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def token(server, tmp_path):
+    composite = tmp_path / "final_composite.png"
+    cv.imwrite(str(composite), np.full((1200, 1800, 3), 180, np.uint8))
+    server.publish("session_1", composite).result(timeout=10)
+    return server.token_for("session_1")
+
+
+def request(server, path, headers=None, method="GET"):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    try:
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+    finally:
+        connection.close()
+
+
+def test_page_links_the_published_photos(server, token):
+    response, body = request(server, f"/d/{token}/")
+    assert response.status == 200
+    assert b"photo_1600.jpg" in body and b"photo_800.jpg" in body
+
+
+def test_page_of_unpublished_session_refreshes(server):
+    response, body = request(server, f"/d/{server.token_for('session_2')}/")
+    assert response.status == 200
+    assert b"http-equiv='refresh'" in body
+
+
+def test_conditional_get_returns_not_modified(server, token):
+    response, body = request(server, f"/d/{token}/photo_800.jpg")
+    assert response.status == 200
+    assert body[:2] == b"\xff\xd8"
+    etag = response.getheader("ETag")
+
+    response, body = request(
+        server, f"/d/{token}/photo_800.jpg", {"If-None-Match": etag}
+    )
+    assert response.status == 304
+    assert body == b""
+
+
+def test_byte_ranges(server, token):
+    _, full = request(server, f"/d/{token}/photo_800.jpg")
+
+    response, body = request(server, f"/d/{token}/photo_800.jpg", {"Range": "bytes=0-9"})
+    assert response.status == 206
+    assert body == full[:10]
+    assert response.getheader("Content-Range") == f"bytes 0-9/{len(full)}"
+
+    response, body = request(server, f"/d/{token}/photo_800.jpg", {"Range": "bytes=-5"})
+    assert response.status == 206
+    assert body == full[-5:]
+
+    response, _ = request(
+        server, f"/d/{token}/photo_800.jpg", {"Range": f"bytes={len(full)}-"}
+    )
+    assert response.status == 416
+    assert response.getheader("Content-Range") == f"bytes */{len(full)}"
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/d/not-a-token/",
+        "/d/{token}/photo_123.jpg",
+        "/d/{token}/../.secret",
+        "/d/{token}/.secret",
+        "/downloads/.secret",
+    ],
+)
+def test_unknown_paths_are_not_found(server, token, path):
+    response, _ = request(server, path.format(token=token))
+    assert response.status == 404
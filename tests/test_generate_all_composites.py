@@ -0,0 +1,39 @@
+from controllers.session_catalog import SessionCatalog
+from utils.generate_all_composites import get_session_photos
+
+
+def make_session(tmp_path):
+    folder = tmp_path / "session_20250601_183000_250"
+    folder.mkdir()
+    photos = []
+    for second in range(4):
+        photo = folder / f"2025-06-01 18300{second}.000000_image.png"
+        photo.write_bytes(b"photo")
+        photos.append(photo)
+    (folder / "final_composite_20250601_183010_000.png").write_bytes(b"composite")
+    # Left behind by a housekeeping pass that was stopped mid re-encode
+    (folder / "2025-06-01 183000.000000_image.tmp.jpg").write_bytes(b"partial")
+    return folder, photos
+
+
+def test_session_photos_skip_composites_and_partial_files(tmp_path):
+    folder, photos = make_session(tmp_path)
+
+    assert get_session_photos(str(folder)) == [str(p) for p in photos]
+
+
+def test_session_photos_are_the_selected_ones_in_slot_order(tmp_path):
+    folder, photos = make_session(tmp_path)
+    catalog = SessionCatalog(tmp_path / "catalog.sqlite3")
+    catalog.add_session(folder.name, folder, 0)
+    for captured_at, photo in enumerate(photos):
+        catalog.add_photo(folder.name, photo, captured_at + 1)
+    assert get_session_photos(str(folder), catalog) == [str(p) for p in photos]
+
+    catalog.select_photos(folder.name, [str(photos[3]), str(photos[1])])
+    assert get_session_photos(str(folder), catalog) == [str(photos[3]), str(photos[1])]
+
+    # Compacted to JPEG since
+    jpeg = photos[3].with_suffix(".jpg")
+    photos[3].rename(jpeg)
+    assert get_session_photos(str(folder), catalog) == [str(jpeg), str(photos[1])]
@@ -0,0 +1,47 @@
+import os
+import threading
+import time
+from controllers.housekeeping import COMPACTED_MARKER, Housekeeper
+
+
+def make_session(sessions_dir, name, photo_bytes=1000):
+    folder = sessions_dir / name
+    folder.mkdir(parents=True)
+    (folder / "2025-06-01 183001.000000_image.png").write_bytes(b"p" * photo_bytes)
+    (folder / "final_composite_20250601_183010_000.png").write_bytes(b"c" * 100)
+    return folder
+
+
+def test_over_quota_only_warns_unless_deleting_photos_is_allowed(tmp_path, capsys):
+    old = make_session(tmp_path, "session_20250601_183000_250")
+    new = make_session(tmp_path, "session_20250602_183000_250")
+    for folder in (old, new):
+        (folder / COMPACTED_MARKER).touch()
+
+    Housekeeper(tmp_path, quota_bytes=1500).run_pass()
+    assert "over its" in capsys.readouterr().out
+    assert len(os.listdir(old)) == 3
+
+    stats = Housekeeper(tmp_path, quota_bytes=1500, delete_photos=True).run_pass()
+    assert stats["photos_removed"] == 1
+    # Oldest first, composites are kept
+    assert sorted(os.listdir(old)) == [
+        COMPACTED_MARKER,
+        "final_composite_20250601_183010_000.png",
+    ]
+    assert len(os.listdir(new)) == 3
+
+
+def test_disk_usage_is_not_counted_while_paused(tmp_path):
+    make_session(tmp_path, "session_20250601_183000_250")
+    housekeeper = Housekeeper(tmp_path)
+    housekeeper.pause()
+    result = []
+    counting = threading.Thread(target=lambda: result.append(housekeeper._usage()))
+    counting.start()
+    time.sleep(0.1)
+    assert result == []
+
+    housekeeper.resume()
+    counting.join(timeout=5)
+    assert result == [1100]
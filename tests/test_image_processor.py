@@ -0,0 +1,91 @@
+import numpy as np
+import cv2 as cv
+import pytest
+from config.load_metadata import templates_config_dict
+from controllers.image_processor import ImageProcessor, RenderQuality
+from controllers.stage_timers import stage_timers
+
+SLOTS = [(20, 20, 80, 60), (20, 100, 80, 60)]
+
+
+@pytest.fixture
+def template(tmp_path, monkeypatch):
+    """Opaque frame with a transparent window in the first slot, soft edges."""
+    template = np.full((180, 120, 4), (40, 80, 160, 255), np.uint8)
+    template[30:70, 30:90, 3] = 0
+    template[29, 30:90, 3] = 128
+    template[70, 30:90, 3] = 64
+    path = str(tmp_path / "Vertical-01.png")
+    cv.imwrite(path, template)
+    monkeypatch.setitem(templates_config_dict, path, {"slots": SLOTS})
+    return path
+
+
+@pytest.fixture
+def photo(tmp_path):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "photo.png")
+    cv.imwrite(path, rng.integers(0, 256, (120, 160, 3), np.uint8))
+    return path
+
+
+@pytest.fixture
+def timers(monkeypatch):
+    monkeypatch.setattr(stage_timers, "enabled", True)
+    stage_timers.reset()
+    yield stage_timers
+    stage_timers.reset()
+
+
+def test_each_render_looks_a_template_up_once(template, photo, timers):
+    processor = ImageProcessor()
+    processor.create_photo_composites([photo], [template], RenderQuality.DRAFT)
+    processor.create_photo_composites([photo], [template], RenderQuality.DRAFT)
+
+    counters = timers.counters()
+    assert counters["template_cache_misses"] == 1
+    assert counters["template_cache_hits"] == 1
+
+
+def test_composite_matches_a_float_reference(template, photo):
+    processor = ImageProcessor()
+    composite = processor.create_photo_composite([photo], template, RenderQuality.DRAFT)
+
+    bgra = cv.imread(template, cv.IMREAD_UNCHANGED).astype(np.float64)
+    alpha = bgra[:, :, 3:] / 255
+    reference = bgra[:, :, :3].copy()
+    reference[bgra[:, :, 3] == 0] = 255
+    source = cv.imread(photo)
+    for x, y, w, h in SLOTS:
+        fitted = processor._resize_photo_to_slot(source, w, h, RenderQuality.DRAFT)
+        a = alpha[y : y + h, x : x + w]
+        if (a == 0).any():
+            # Template over photo, only in slots with a transparent window
+            fitted = fitted * (1 - a) + bgra[y : y + h, x : x + w, :3] * a
+        reference[y : y + h, x : x + w] = fitted
+
+    difference = np.abs(composite.astype(np.float64) - reference)
+    # Integer blending rounds to the nearest value
+    assert difference.max() <= 0.5
+
+
+@pytest.mark.parametrize("quality", list(RenderQuality))
+def test_every_quality_fills_the_slot_exactly(photo, quality):
+    fitted = ImageProcessor()._resize_photo_to_slot(cv.imread(photo), 70, 90, quality)
+    assert fitted.shape == (90, 70, 3)
+
+
+def test_print_quality_is_a_single_lanczos_pass(photo):
+    source = cv.imread(photo)
+    expected = cv.resize(source, (40, 30), interpolation=cv.INTER_LANCZOS4)
+    resampled = ImageProcessor._resample(source, 40, 30, RenderQuality.PRINT)
+    assert np.array_equal(resampled, expected)
+
+
+def test_preview_quality_reduces_large_downscales_by_area_first(photo):
+    source = cv.imread(photo)
+    # 160x120 to 20x15 is an 8x reduction, area averaged before bicubic
+    reduced = cv.resize(source, (20, 15), interpolation=cv.INTER_AREA)
+    expected = cv.resize(reduced, (20, 15), interpolation=cv.INTER_CUBIC)
+    resampled = ImageProcessor._resample(source, 20, 15, RenderQuality.PREVIEW)
+    assert np.array_equal(resampled, expected)
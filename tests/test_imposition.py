@@ -0,0 +1,54 @@
+from PIL import Image
+from controllers.imposition import SheetImposer
+
+RED, BLUE, GREEN = (255, 0, 0), (0, 0, 255), (0, 255, 0)
+
+
+def save_composite(path, strip_color):
+    """A 2x6 inch composite at 300 dpi, its first column is the strip."""
+    composite = Image.new("RGB", (600, 1800), GREEN)
+    composite.paste(strip_color, (0, 0, 300, 1800))
+    composite.save(path, dpi=(300, 300))
+    return str(path)
+
+
+def test_strips_keep_their_physical_size():
+    imposer = SheetImposer((4, 6), 300)
+    assert imposer.layout((300, 1800)) == (4, 1, False)
+    # Twice the resolution, same size once on the sheet
+    assert SheetImposer((4, 6), 600).layout((600, 3600)) == (4, 1, False)
+
+
+def test_strips_are_rotated_when_more_fit():
+    assert SheetImposer((6, 4), 300).layout((300, 1800)) == (1, 4, True)
+
+
+def test_strips_of_several_jobs_share_a_sheet(tmp_path):
+    imposer = SheetImposer((4, 6), 300)
+    red = save_composite(tmp_path / "red.png", RED)
+    blue = save_composite(tmp_path / "blue.png", BLUE)
+
+    sheets = imposer.impose([("a", red, 3), ("b", blue, 2)], str(tmp_path / "out"))
+
+    assert [sheet["jobs"] for sheet in sheets] == [{"a": 3, "b": 1}, {"b": 1}]
+    assert [sheet["copies"] for sheet in sheets] == [1, 1]
+    with Image.open(sheets[0]["path"]) as sheet:
+        assert sheet.size == (1200, 1800)
+        assert round(sheet.info["dpi"][0]) == 300
+        centres = [sheet.getpixel((150 + 300 * col, 900)) for col in range(4)]
+    assert centres == [RED, RED, RED, BLUE]
+    with Image.open(sheets[1]["path"]) as sheet:
+        # Cut lines stay where they are on a full sheet
+        assert sheet.getpixel((150, 900)) == BLUE
+        assert sheet.getpixel((450, 900)) == (255, 255, 255)
+
+
+def test_identical_sheets_are_printed_as_copies(tmp_path):
+    imposer = SheetImposer((4, 6), 300)
+    red = save_composite(tmp_path / "red.png", RED)
+
+    sheets = imposer.impose([("a", red, 8)], str(tmp_path / "out"))
+
+    assert len(sheets) == 1
+    assert sheets[0]["copies"] == 2
+    assert sheets[0]["jobs"] == {"a": 8}
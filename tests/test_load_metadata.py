@@ -0,0 +1,57 @@
+import json
+from PIL import Image
+from config import load_metadata
+from config.load_metadata import MANIFEST_FILENAME, index_templates
+
+
+def make_template(path, colour=(200, 30, 30)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (60, 40), colour).save(path)
+    return str(path.absolute())
+
+
+def test_unchanged_templates_are_read_from_the_manifest(tmp_path, monkeypatch):
+    vertical = make_template(tmp_path / "Vertical-01.png")
+    horizontal = make_template(tmp_path / "Horizontal-01.png", (10, 20, 30))
+
+    config, changed = index_templates(str(tmp_path), known_paths=())
+    assert changed == {vertical, horizontal}
+    assert config[vertical]["num_photos"] == 8
+    assert config[horizontal]["num_photos"] == 4
+    assert config[horizontal]["color"] == (10, 20, 30)
+    manifest = json.loads((tmp_path / MANIFEST_FILENAME).read_text())
+    assert sorted(entry["path"] for entry in manifest["templates"]) == [
+        "Horizontal-01.png",
+        "Vertical-01.png",
+    ]
+
+    def fail(*args):
+        raise AssertionError("template opened although the manifest is current")
+
+    monkeypatch.setattr(load_metadata, "_examine_template", fail)
+    again, changed = index_templates(str(tmp_path), known_paths=config)
+    assert again == config
+    assert changed == set()
+
+
+def test_layout_comes_from_the_file_name_only(tmp_path):
+    template = make_template(tmp_path / "horizontal_designs" / "Vertical-02.png")
+
+    config, _ = index_templates(str(tmp_path), known_paths=())
+
+    assert config[template]["num_photos"] == 8
+
+
+def test_unreadable_template_is_skipped_until_it_is_complete(tmp_path):
+    good = make_template(tmp_path / "Vertical-01.png")
+    partial = tmp_path / "Vertical-02.png"
+    partial.write_bytes(b"\x89PNG\r\n\x1a\n half copied")
+
+    config, changed = index_templates(str(tmp_path), known_paths=())
+    assert list(config) == [good]
+    assert changed == {good}
+
+    make_template(partial)
+    config, changed = index_templates(str(tmp_path), known_paths=config)
+    assert list(config) == [good, str(partial.absolute())]
+    assert changed == {str(partial.absolute())}
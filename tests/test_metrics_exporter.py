@@ -0,0 +1,22 @@
+from types import SimpleNamespace
+from controllers.metrics_exporter import MetricsExporter
+
+
+def test_disk_usage_is_served_from_the_last_refresh(tmp_path):
+    session = tmp_path / "session_20250601_183000_250"
+    session.mkdir()
+    (session / "photo.png").write_bytes(b"x" * 100)
+    storage = SimpleNamespace(persistent_dir=tmp_path, hot_dir=None)
+    exporter = MetricsExporter(host="127.0.0.1", port=0, storage=storage)
+    try:
+        assert 'photobooth_sessions_disk_bytes{tier="persistent"}' not in exporter.render()
+
+        exporter.update_disk_usage()
+        (session / "composite.png").write_bytes(b"x" * 50)
+        # Scrapes do not walk the folders, the new file waits for the next refresh
+        assert 'photobooth_sessions_disk_bytes{tier="persistent"} 100' in exporter.render()
+
+        exporter.update_disk_usage()
+        assert 'photobooth_sessions_disk_bytes{tier="persistent"} 150' in exporter.render()
+    finally:
+        exporter.stop()
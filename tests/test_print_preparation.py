@@ -0,0 +1,49 @@
+from PIL import Image
+from controllers.print_preparation import PrintPreparer
+
+
+def save_image(path, color="red"):
+    Image.new("RGB", (60, 90), color).save(path, dpi=(300, 300))
+    return str(path)
+
+
+def test_same_content_reuses_the_prepared_raster(tmp_path):
+    preparer = PrintPreparer(tmp_path / "cache", margin_in=0.1)
+    first = preparer.prepare(save_image(tmp_path / "sheet_1.png"))
+    second = preparer.prepare(save_image(tmp_path / "sheet_2.png"))
+
+    assert first == second
+    with Image.open(first) as raster:
+        assert raster.size == (60 + 2 * 30, 90 + 2 * 30)
+
+
+def test_content_hashes_are_bounded(tmp_path):
+    preparer = PrintPreparer(tmp_path / "cache", max_cached=2)
+    paths = [save_image(tmp_path / f"sheet_{i}.png") for i in range(4)]
+    for path in paths:
+        preparer.prepare(path)
+
+    # Imposed sheets have a new path per job, only the newest are remembered
+    assert list(preparer._hashes) == paths[-2:]
+
+
+def test_landscape_composite_is_rotated_and_fitted_to_the_media(tmp_path):
+    composite = tmp_path / "composite.png"
+    landscape = Image.new("RGB", (90, 60), "white")
+    landscape.paste("red", (0, 0, 45, 60))
+    landscape.save(composite, dpi=(100, 100))
+    preparer = PrintPreparer(tmp_path / "cache", media_size_in=(4, 6), dpi=100)
+
+    with Image.open(preparer.prepare(str(composite))) as raster:
+        assert raster.size == (400, 600)
+        # Turned a quarter counter clockwise, the left half ends up at the bottom
+        assert raster.getpixel((200, 550)) == (255, 0, 0)
+        assert raster.getpixel((200, 50)) == (255, 255, 255)
+
+
+def test_other_settings_prepare_a_new_raster(tmp_path):
+    image = save_image(tmp_path / "sheet.png")
+    first = PrintPreparer(tmp_path / "cache").prepare(image)
+    second = PrintPreparer(tmp_path / "cache", margin_in=0.1).prepare(image)
+
+    assert first != second
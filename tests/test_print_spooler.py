@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+from PIL import Image
+from PySide6.QtCore import Qt
+from controllers.imposition import SheetImposer
+from controllers.print_spooler import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_PRINTING,
+    JOB_QUEUED,
+    JOB_RENDERING,
+    LocalPrinter,
+    PrintSpooler,
+)
+
+
+def wait_for_state(spooler, job_id, states, timeout=10):
+    deadline = time.time() + timeout
+    job = spooler.get_job(job_id)
+    while job["state"] not in states and time.time() < deadline:
+        time.sleep(0.01)
+        job = spooler.get_job(job_id)
+    return job
+
+
+def make_composite(tmp_path):
+    path = tmp_path / "final_composite.png"
+    path.write_bytes(b"not really a png")
+    return str(path)
+
+
+def test_job_goes_through_every_state(tmp_path):
+    printer = LocalPrinter(latency_s=0.01)
+    spooler = PrintSpooler({"local0": printer}, spool_dir=str(tmp_path / "spool"))
+    states = []
+    # Emitted from the printer's worker thread, no event loop runs in tests
+    spooler.job_updated.connect(
+        lambda job_id, state: states.append(state), Qt.ConnectionType.DirectConnection
+    )
+    try:
+        job_id = spooler.submit(make_composite(tmp_path), strips=4, session_id="s1")
+        job = wait_for_state(spooler, job_id, (JOB_DONE, JOB_FAILED))
+        # The signal follows the state change
+        deadline = time.time() + 10
+        while states[-1:] != [job["state"]] and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        spooler.stop()
+
+    assert job["state"] == JOB_DONE
+    assert job["attempts"] == 1
+    assert states == [JOB_QUEUED, JOB_RENDERING, JOB_PRINTING, JOB_DONE]
+    # Two strips per composite
+    assert printer.printed == [(job["image_path"], 2)]
+
+
+def test_failed_job_is_retried_then_fails(tmp_path):
+    printer = LocalPrinter(latency_s=0, failure_rate=1.0)
+    spooler = PrintSpooler(
+        {"local0": printer},
+        spool_dir=str(tmp_path / "spool"),
+        max_attempts=3,
+        retry_delay_s=0.01,
+    )
+    try:
+        job_id = spooler.submit(make_composite(tmp_path))
+        job = wait_for_state(spooler, job_id, (JOB_DONE, JOB_FAILED))
+    finally:
+        spooler.stop()
+
+    assert job["state"] == JOB_FAILED
+    assert job["attempts"] == 3
+    assert "paper jam" in job["error"]
+    assert printer.printed == []
+
+
+def test_unfinished_jobs_are_recovered_after_restart(tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    spooler = PrintSpooler({"local0": LocalPrinter(latency_s=0)}, spool_dir=spool_dir)
+    spooler.stop()
+    time.sleep(0.1)  # Let the workers exit before queueing
+    job_id = spooler.submit(make_composite(tmp_path))
+
+    printer = LocalPrinter(latency_s=0)
+    restarted = PrintSpooler({"local0": printer}, spool_dir=spool_dir)
+    try:
+        job = wait_for_state(restarted, job_id, (JOB_DONE, JOB_FAILED))
+    finally:
+        restarted.stop()
+
+    assert job["state"] == JOB_DONE
+    assert len(printer.printed) == 1
+
+
+def test_expired_finished_jobs_are_not_recovered(tmp_path):
+    spool_dir = tmp_path / "spool"
+    jobs_dir = spool_dir / "jobs"
+    jobs_dir.mkdir(parents=True)
+    old_job = {
+        "id": "old",
+        "image_path": "gone.png",
+        "strips": 2,
+        "state": JOB_DONE,
+        "created_at": 0,
+        "updated_at": 0,
+        "finished_at": 1,
+    }
+    (jobs_dir / "old.json").write_text(json.dumps(old_job))
+
+    spooler = PrintSpooler(
+        {"local0": LocalPrinter(latency_s=0)},
+        spool_dir=str(spool_dir),
+        keep_finished_s=3600,
+    )
+    spooler.stop()
+
+    assert spooler.get_job("old") is None
+    assert not (jobs_dir / "old.json").exists()
+
+
+class BlockingPreparer:
+    """Holds jobs in the rendering stage until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def prepare(self, path):
+        self.started.set()
+        self.release.wait(timeout=10)
+        return path
+
+
+def test_job_cancelled_while_rendering_is_not_printed(tmp_path):
+    printer = LocalPrinter(latency_s=0)
+    preparer = BlockingPreparer()
+    spooler = PrintSpooler(
+        {"local0": printer}, spool_dir=str(tmp_path / "spool"), preparer=preparer
+    )
+    try:
+        job_id = spooler.submit(make_composite(tmp_path))
+        assert preparer.started.wait(timeout=10)
+        assert spooler.cancel(job_id, "staff cancelled")
+        preparer.release.set()
+        time.sleep(0.1)
+        job = spooler.get_job(job_id)
+    finally:
+        spooler.stop()
+
+    assert job["state"] == JOB_FAILED
+    assert job["error"] == "staff cancelled"
+    assert printer.printed == []
+
+
+class JammingPrinter(LocalPrinter):
+    """Jams once, on the given call to print_images."""
+
+    def __init__(self, jam_on_call):
+        super().__init__(latency_s=0)
+        self.jam_on_call = jam_on_call
+        self.calls = 0
+
+    def print_images(self, image_path, num_copies=1):
+        self.calls += 1
+        if self.calls == self.jam_on_call:
+            raise RuntimeError("paper jam")
+        super().print_images(image_path, num_copies)
+
+
+def test_sheets_printed_before_a_failure_are_not_printed_again(tmp_path):
+    spool_dir = str(tmp_path / "spool")
+    composites = []
+    for name, colour in (("a", "red"), ("b", "blue")):
+        path = tmp_path / f"{name}.png"
+        # Two 1x6in strips per composite, four fit on a 4x6in sheet
+        Image.new("RGB", (600, 1800), colour).save(path, dpi=(300, 300))
+        composites.append(str(path))
+
+    # Queued before the workers start, so both jobs go in one batch
+    stopped = PrintSpooler({"local0": LocalPrinter(latency_s=0)}, spool_dir=spool_dir)
+    stopped.stop()
+    time.sleep(0.1)
+    first = stopped.submit(composites[0], strips=6)
+    second = stopped.submit(composites[1], strips=6)
+
+    # Sheets: 4 of the first, 2 + 2, then 4 of the second, which jams
+    printer = JammingPrinter(jam_on_call=3)
+    spooler = PrintSpooler(
+        {"local0": printer},
+        spool_dir=spool_dir,
+        retry_delay_s=0.01,
+        imposer=SheetImposer(sheet_size_in=(4, 6), dpi=300),
+    )
+    try:
+        first_job = wait_for_state(spooler, first, (JOB_DONE, JOB_FAILED))
+        second_job = wait_for_state(spooler, second, (JOB_DONE, JOB_FAILED))
+    finally:
+        spooler.stop()
+
+    # Recovered in job id order, either job can be the one on the jammed sheet
+    assert first_job["state"] == JOB_DONE and second_job["state"] == JOB_DONE
+    assert sorted([first_job["attempts"], second_job["attempts"]]) == [1, 2]
+    # The retry only holds the four strips the jammed sheet had
+    assert len(printer.printed) == 3
+    assert spooler.printer_passes == 3
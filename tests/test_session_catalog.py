@@ -0,0 +1,81 @@
+import pytest
+from controllers.session_catalog import SessionCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = SessionCatalog(tmp_path / "catalog.sqlite3")
+    yield catalog
+    catalog.close()
+
+
+def add_session(catalog, folder, created_at, template_path):
+    folder.mkdir(parents=True)
+    catalog.add_session(folder.name, folder, created_at)
+    catalog.update_session(folder.name, template_path=template_path)
+    return folder.name
+
+
+def test_find_sessions_by_time_template_and_print_state(catalog, tmp_path):
+    early = add_session(catalog, tmp_path / "session_1", 100, "v0.1/Vertical-01.png")
+    late = add_session(catalog, tmp_path / "session_2", 200, "v0.1/Horizontal-03.png")
+    catalog.record_print_job(
+        {"id": "job", "session_id": late, "image_path": "x.png", "state": "failed"}
+    )
+
+    assert [s["id"] for s in catalog.find_sessions()] == [late, early]
+    assert [s["id"] for s in catalog.find_sessions(since=150)] == [late]
+    assert [s["id"] for s in catalog.find_sessions(until=150)] == [early]
+    assert [s["id"] for s in catalog.find_sessions(template="Vertical")] == [early]
+    assert [s["id"] for s in catalog.find_sessions(print_state="failed")] == [late]
+    assert catalog.find_sessions(print_state="done") == []
+    assert [s["id"] for s in catalog.find_sessions(limit=1)] == [late]
+    assert catalog.latest_session()["id"] == late
+
+
+def test_relocate_rewrites_only_the_moved_session(catalog, tmp_path):
+    hot, persistent = tmp_path / "shm", tmp_path / "sessions"
+    moved = add_session(catalog, hot / "session_1", 100, "Vertical-01.png")
+    # Same prefix, must not be touched
+    other = add_session(catalog, hot / "session_10", 200, "Vertical-01.png")
+    for session_id in (moved, other):
+        catalog.add_photo(session_id, hot / session_id / "photo_image.png", 1)
+        catalog.add_composite(session_id, hot / session_id / "final.png", "Vertical-01.png")
+    catalog.record_print_job(
+        {
+            "id": "job",
+            "session_id": moved,
+            "image_path": str(hot / moved / "final.png"),
+            "state": "done",
+        }
+    )
+
+    catalog.relocate_session(moved, hot / moved, persistent / moved)
+
+    assert catalog.get_session(moved)["folder"] == str(persistent / moved)
+    assert catalog.session_photos(moved) == [str(persistent / moved / "photo_image.png")]
+    assert catalog.latest_composite(moved)["path"] == str(persistent / moved / "final.png")
+    assert catalog.print_jobs(moved)[0]["composite_path"] == str(
+        persistent / moved / "final.png"
+    )
+    assert catalog.get_session(other)["folder"] == str(hot / other)
+    assert catalog.session_photos(other) == [str(hot / other / "photo_image.png")]
+
+
+def test_backfill_adds_folders_made_before_the_catalog(catalog, tmp_path):
+    folder = tmp_path / "session_20250601_183000_250"
+    folder.mkdir()
+    (folder / "2025-06-01 183001.000000_image.jpg").write_bytes(b"photo")
+    (folder / "final_composite_20250601_183010_000.png").write_bytes(b"composite")
+
+    assert catalog.backfill(tmp_path) == 1
+    assert catalog.backfill(tmp_path) == 0
+
+    session = catalog.get_session(folder.name)
+    assert session["stage"] == "done"
+    assert catalog.session_photos(folder.name) == [
+        str(folder / "2025-06-01 183001.000000_image.jpg")
+    ]
+    assert catalog.latest_composite(folder.name)["path"] == str(
+        folder / "final_composite_20250601_183010_000.png"
+    )
@@ -0,0 +1,98 @@
+import time
+from concurrent.futures import Future
+from controllers.session_catalog import SessionCatalog
+from controllers.session_manager import SessionManager
+from controllers.session_storage import SessionStorage
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_crash_recovery_relocates_catalog_rows(tmp_path):
+    persistent_dir, hot_dir = tmp_path / "sessions", tmp_path / "shm"
+    persistent_dir.mkdir()
+    catalog = SessionCatalog(tmp_path / "catalog.sqlite3")
+
+    # A session the previous run left in the hot tier
+    hot_folder = hot_dir / "session_20250601_183000_250"
+    hot_folder.mkdir(parents=True)
+    photo = hot_folder / "2025-06-01 183001.000000_image.png"
+    composite = hot_folder / "final_composite_20250601_183010_000.png"
+    photo.write_bytes(b"photo")
+    composite.write_bytes(b"composite")
+    catalog.add_session(hot_folder.name, hot_folder, 0)
+    catalog.add_photo(hot_folder.name, photo, 1)
+    catalog.add_composite(hot_folder.name, composite, "Vertical-01.png")
+
+    storage = SessionStorage(persistent_dir, hot_dir)
+    manager = SessionManager(persistent_dir, storage=storage, catalog=catalog)
+    moved = persistent_dir / hot_folder.name
+    try:
+        assert wait_until(
+            lambda: catalog.get_session(hot_folder.name)["folder"] == str(moved)
+        )
+    finally:
+        manager.shutdown()
+        storage.shutdown()
+
+    assert not hot_folder.exists()
+    assert catalog.session_photos(hot_folder.name) == [str(moved / photo.name)]
+    assert catalog.latest_composite(hot_folder.name)["path"] == str(moved / composite.name)
+    assert [row["id"] for row in catalog.find_sessions()] == [hot_folder.name]
+
+
+def test_stage_callback_runs_before_the_session_is_migrated(tmp_path):
+    persistent_dir = tmp_path / "sessions"
+    persistent_dir.mkdir()
+    storage = SessionStorage(persistent_dir, tmp_path / "shm")
+    manager = SessionManager(persistent_dir, storage=storage)
+    seen = []
+    try:
+        folder = manager.create_session("", None)
+        session = manager.current_session
+        future = Future()
+        manager.track(
+            future,
+            session,
+            on_done=lambda _: seen.append((folder.exists(), session.finished_at)),
+        )
+        manager.close_session()
+        assert manager.background_sessions == [session]
+
+        future.set_result(None)
+        assert wait_until(lambda: session.persistent_folder is not None)
+    finally:
+        manager.shutdown()
+        storage.shutdown()
+
+    # The hot folder was still there and the session not finished yet
+    assert seen == [(True, None)]
+    assert session.stage == "done"
+    assert session.persistent_folder == persistent_dir / folder.name
+
+
+def test_print_finished_finds_the_session_by_job_id(tmp_path):
+    persistent_dir = tmp_path / "sessions"
+    persistent_dir.mkdir()
+    storage = SessionStorage(persistent_dir, tmp_path / "shm")
+    manager = SessionManager(persistent_dir, storage=storage)
+    try:
+        manager.create_session("", None)
+        session = manager.current_session
+        session.request_print()
+        session.add_print_job("job_1")
+        manager.close_session()
+        assert manager.background_sessions == [session]
+
+        # The spooler pruned the job, only its id is known
+        manager.print_finished(None, "job_1")
+        assert wait_until(lambda: session.persistent_folder is not None)
+    finally:
+        manager.shutdown()
+        storage.shutdown()
+
+    assert manager.background_sessions == []
@@ -0,0 +1,65 @@
+import pytest
+import controllers.session_storage as session_storage
+from controllers.session_storage import PART_SUFFIX, SessionStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    persistent_dir = tmp_path / "sessions"
+    persistent_dir.mkdir()
+    storage = SessionStorage(persistent_dir, tmp_path / "shm")
+    yield storage
+    storage.shutdown()
+
+
+def make_hot_session(storage, name="session_20250601_183000_250"):
+    folder = storage.session_dir(name)
+    (folder / "strips").mkdir(parents=True)
+    (folder / "photo_image.png").write_bytes(b"photo" * 1000)
+    (folder / "strips" / "preview_strip.png").write_bytes(b"strip")
+    return folder
+
+
+def test_migration_moves_every_file(storage):
+    folder = make_hot_session(storage)
+
+    target = storage.migrate(folder).result(timeout=10)
+
+    assert target == storage.persistent_dir / folder.name
+    assert not folder.exists()
+    assert (target / "photo_image.png").read_bytes() == b"photo" * 1000
+    assert (target / "strips" / "preview_strip.png").read_bytes() == b"strip"
+    # Paths recorded in the hot tier still find the file
+    assert storage.resolve(folder / "photo_image.png") == str(target / "photo_image.png")
+
+
+def test_recovery_finishes_an_interrupted_migration(storage):
+    folder = make_hot_session(storage)
+    # Killed mid copy: one file done, one partial copy left behind
+    target = storage.persistent_dir / folder.name
+    target.mkdir()
+    (target / "photo_image.png").write_bytes(b"photo" * 1000)
+    (target / "strips").mkdir()
+    (target / "strips" / f"preview_strip.png{PART_SUFFIX}").write_bytes(b"str")
+
+    [(hot_folder, future)] = storage.recover()
+
+    assert hot_folder == folder
+    assert future.result(timeout=10) == target
+    assert not folder.exists()
+    assert sorted(p.name for p in target.rglob("*") if p.is_file()) == [
+        "photo_image.png",
+        "preview_strip.png",
+    ]
+
+
+def test_hot_copy_is_kept_when_a_copy_does_not_verify(storage, monkeypatch):
+    folder = make_hot_session(storage)
+    monkeypatch.setattr(session_storage, "_sha256", lambda path: "corrupt")
+
+    with pytest.raises(IOError, match="Checksum mismatch"):
+        storage.migrate(folder).result(timeout=10)
+
+    assert (folder / "photo_image.png").exists()
+    target = storage.persistent_dir / folder.name
+    assert not [p for p in target.rglob("*") if p.is_file()]
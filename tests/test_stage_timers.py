@@ -0,0 +1,22 @@
+from controllers.stage_timers import StageTimers
+
+
+def test_timers_stay_on_while_any_user_holds_them():
+    timers = StageTimers()
+    timers.acquire()  # HUD shown
+    timers.acquire()  # Metrics endpoint started
+    timers.release()  # HUD hidden
+    assert timers.enabled
+
+    timers.release()
+    assert not timers.enabled
+    timers.release()  # Unbalanced release does not go negative
+    timers.acquire()
+    assert timers.enabled
+
+
+def test_timers_enabled_at_startup_are_never_released():
+    timers = StageTimers(enabled=True)
+    timers.acquire()
+    timers.release()
+    assert timers.enabled
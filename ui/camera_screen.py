@@ -1,3 +1,4 @@
+from typing import Optional
 from PySide6.QtCore import QEventLoop, QTimer, Qt, Signal
 from PySide6.QtGui import QFont
 from PySide6.QtWidgets import (
@@ -9,8 +10,11 @@ from PySide6.QtWidgets import (
 from components.countdown_timer import CountdownTimer
 from components.flash_overlay import FlashOverlay
 from controllers.camera_controller import CameraController
-from controllers.image_processor import ImageProcessor
+from controllers.image_processor import ImageProcessor, RenderQuality
+from controllers.preview_stream import PreviewStream
 from controllers.session_manager import SessionManager
+from controllers.session_trace import session_tracer
+from controllers.stage_timers import stage_timers
 from ui.base_screen import BaseScreen
 from ui.styles import buttons_css, counter_css, timer_css
 from utils.utils import load_sound_effect
@@ -26,6 +30,7 @@ class CameraScreen(BaseScreen):
         image_processor: ImageProcessor,
         session_manager: SessionManager,
         camera_index: int = 0,
+        preview_stream: Optional[PreviewStream] = None,
         parent=None,
     ):
         super().__init__(parent)
@@ -33,6 +38,7 @@ class CameraScreen(BaseScreen):
         self.image_processor = image_processor
         self.session_manager = session_manager
         self.camera_index = camera_index
+        self.preview_stream = preview_stream
         self.photos_to_take = 1
         self.photos_taken = 0
         self.countdown = CountdownTimer()
@@ -121,6 +127,9 @@ class CameraScreen(BaseScreen):
         self.camera_controller.frame_ready.connect(self._on_camera_frame)
 
         # Countdown signals
+        self.countdown.started.connect(
+            lambda seconds: session_tracer.instant("countdown", seconds=seconds)
+        )
         self.countdown.tick.connect(self._on_countdown_tick)
         self.countdown.finished.connect(self._on_countdown_finished)
 
@@ -134,54 +143,66 @@ class CameraScreen(BaseScreen):
         if self.is_flashing:
             return
 
-        # Apply overlay and convert to pixmap
-        processed = self.image_processor.apply_overlay(
-            frame, None, flip_horizontal=True
-        )
-        pixmap = self.image_processor.frame_to_qpixmap(
-            processed,
-            target_size=(self.camera_label.width(), self.camera_label.height()),
-        )
-        self.camera_label.setPixmap(pixmap)
+        with stage_timers.time("preview"):
+            # Apply overlay and convert to pixmap
+            with stage_timers.time("overlay"):
+                processed = self.image_processor.apply_overlay(
+                    frame, None, flip_horizontal=True
+                )
+            pixmap = self.image_processor.frame_to_qpixmap(
+                processed,
+                target_size=(self.camera_label.width(), self.camera_label.height()),
+                quality=RenderQuality.PREVIEW,
+            )
+            with stage_timers.time("set_pixmap"):
+                self.camera_label.setPixmap(pixmap)
+        stage_timers.event("preview_frames")
+        if self.preview_stream is not None:
+            self.preview_stream.offer(processed)
 
     def _capture_photo(self):
-        frame = self.camera_controller.capture_photo()
-        if frame is None:
-            return
-
-        processed = self.image_processor.apply_overlay(
-            frame, None, flip_horizontal=False
-        )
-
-        self.session_manager.save_photo(processed)
-
-        # Add flash effect
-        self.flash.flash()
-        try:
-            self.sound_effect.stop()
-        except:
-            pass
-        self.camera_effect.play()
-        self.photos_taken += 1
-        self._update_counter()
-
-        # Delay for effects to show
-        loop = QEventLoop()
-        QTimer.singleShot(100, loop.quit)
-        loop.exec()
-
-        if self.photos_taken >= self.photos_to_take:
-            self.session_continued.emit()
-            self.navigate_to.emit("selection")
-        else:
-            # Only restart 5 seconds countdown if we still have photos to take
-            self.countdown.start(5)
+        with session_tracer.span("capture_photo", photo=self.photos_taken + 1):
+            frame = self.camera_controller.capture_photo()
+            if frame is None:
+                return
+
+            processed = self.image_processor.apply_overlay(
+                frame, None, flip_horizontal=False
+            )
+
+            self.session_manager.save_photo(processed)
+
+            # Add flash effect
+            self.flash.flash()
+            try:
+                self.sound_effect.stop()
+            except:
+                pass
+            self.camera_effect.play()
+            self.photos_taken += 1
+            self._update_counter()
+
+            # Delay for effects to show
+            loop = QEventLoop()
+            QTimer.singleShot(100, loop.quit)
+            loop.exec()
+
+            if self.photos_taken >= self.photos_to_take:
+                self.session_continued.emit()
+                self.navigate_to.emit("selection")
+            else:
+                # Only restart 5 seconds countdown if we still have photos to take
+                self.countdown.start(5)
 
     def _update_counter(self):
         """Update photo counter display."""
         self.counter_label.setText(
             f"Photos: {self.photos_taken} / {self.photos_to_take}"
         )
+        if self.preview_stream is not None:
+            self.preview_stream.set_state(
+                photos_taken=self.photos_taken, photos_to_take=self.photos_to_take
+            )
 
     def set_photos_to_take(self, count: int):
         """Set how many photos to capture in this session."""
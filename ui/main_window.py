@@ -1,20 +1,29 @@
 import os
-from dotenv import load_dotenv
+from collections import deque
+from PySide6.QtCore import QEvent, QTimer, Signal
+from PySide6.QtGui import QKeySequence, QShortcut
 from PySide6.QtWidgets import QMainWindow, QStackedWidget
-from controllers.camera_controller import CameraController
-from controllers.image_processor import ImageProcessor
-from controllers.session_manager import SessionManager
-from ui.camera_screen import CameraScreen
-from ui.print_screen import PrintScreen
-from ui.selection_screen import SelectionScreen
+from components.stats_hud import StatsHud
+from controllers.session_trace import session_tracer
+from controllers.stage_timers import stage_timers
 from ui.title_screen import TitleScreen
 
-# Load environment variables
-load_dotenv()
-
 
 class PhotoboothGUI(QMainWindow):
-    def __init__(self, DEFAULT_OVERLAY_PATH) -> None:
+    """
+    Main window, switches between the title, camera, selection and print screens.
+
+    With lazy_startup the window shows the title screen first. Controllers,
+    the other screens and their heavy imports (cv2, numpy, PIL,
+    QtMultimedia, python-dotenv, the printer) are built after the title
+    screen's first paint, one step per zero-delay timer tick so input is
+    handled in between, or all at once if a screen is needed before then.
+    """
+
+    # Emitted once every screen is built and the camera has been started
+    screens_ready = Signal()
+
+    def __init__(self, DEFAULT_OVERLAY_PATH, lazy_startup: bool = True) -> None:
         super().__init__()
         self.setWindowTitle("Christmas Photobooth")
         self.setGeometry(100, 100, 800, 600)
@@ -22,12 +31,36 @@ class PhotoboothGUI(QMainWindow):
             800, 600
         )  # Set minimum window size to prevent cutting off content
 
-        # Initialize camera
-        base_dir = os.getcwd()
-        self._camera_controller = CameraController()
-        self._camera_index = int(os.getenv("CAMERA_INDEX", "0"))
-        self._session_manager = SessionManager(base_dir=base_dir)
-        self._image_processor = ImageProcessor()
+        self._camera_controller = None
+        self._session_manager = None
+        self._image_processor = None
+        self._template_watcher = None
+        self._housekeeper = None
+        self._download_server = None
+        self._preview_stream = None
+        self._metrics_exporter = None
+        self._stall_watchdog = None
+        self._catalog = None
+        self._print_spooler = None
+        self._warmup = None
+        self.camera_screen = None
+        self.selection_screen = None
+        self.print_screen = None
+        self._screens = {}
+        self._screen_name = None
+        self._session_storage = None
+        # Controllers and the other screens, built after the title screen
+        self._startup_steps = deque(
+            [
+                self._load_environment,
+                self._create_controllers,
+                self._start_services,
+                self._create_camera_screen,
+                self._create_selection_screen,
+                self._create_print_screen,
+                self._finish_startup,
+            ]
+        )
 
         self.DEFAULT_OVERLAY_PATH = DEFAULT_OVERLAY_PATH
         self.number_of_photos = 1
@@ -35,6 +68,18 @@ class PhotoboothGUI(QMainWindow):
         self.selected_layout_path = None
         self._setup_ui()
 
+        if lazy_startup:
+            # Build the rest once the title screen has painted, see eventFilter
+            self.title_screen.installEventFilter(self)
+        else:
+            self._ensure_screens()
+
+    def eventFilter(self, watched, event):
+        if watched is self.title_screen and event.type() == QEvent.Type.Paint:
+            self.title_screen.removeEventFilter(self)
+            QTimer.singleShot(0, self._build_next_step)
+        return super().eventFilter(watched, event)
+
     def _setup_ui(self):
         # Create stacked widget to switch between screens
         self.stacked_widget = QStackedWidget()
@@ -42,72 +87,297 @@ class PhotoboothGUI(QMainWindow):
         self.setCentralWidget(self.stacked_widget)
 
         self.title_screen = TitleScreen()
+        self._add_screen("title", self.title_screen)
+
+        # Connect this method to the same method if layout screen if not active
+        self.title_screen.create_session_signal.connect(
+            self._on_skip_layout_create_session
+        )
+
+        # Per-stage latencies, toggled with STATS_HUD_KEY (default F3)
+        self._stats_hud = StatsHud(stage_timers, self.stacked_widget)
+        QShortcut(
+            QKeySequence(os.getenv("STATS_HUD_KEY", "F3")), self, self._stats_hud.toggle
+        )
+
+        # Start with title screen
+        self.navigate_to_screen("title")
+
+    def _add_screen(self, screen_name: str, screen):
+        self._screens[screen_name] = screen
+        self.stacked_widget.addWidget(screen)
+        screen.navigate_to.connect(self.navigate_to_screen)
+
+    def _build_next_step(self):
+        """Run one startup step per timer tick, so touches are handled in between."""
+        if self._run_startup_step():
+            QTimer.singleShot(0, self._build_next_step)
+
+    def _run_startup_step(self) -> bool:
+        """
+        Run the next startup step.
+
+        Returns:
+            Whether steps are left
+        """
+        if self._startup_steps:
+            self._startup_steps.popleft()()
+        return bool(self._startup_steps)
+
+    def _ensure_screens(self):
+        """Finish building the controllers and screens now, a screen is needed."""
+        while self._run_startup_step():
+            pass
+
+    def _load_environment(self):
+        from dotenv import load_dotenv
+        from config.load_metadata import templates_config_dict
+        from controllers.stall_watchdog import create_stall_watchdog_from_env
+
+        # Load environment variables
+        load_dotenv()
+        if os.getenv("STAGE_TIMERS", "0") == "1":
+            # Held for the whole run, may also come from .env
+            stage_timers.acquire()
+        # Set TRACE_SESSIONS=1 to write a Chrome trace of every session
+        if os.getenv("TRACE_SESSIONS", "0") == "1":
+            session_tracer.enable(
+                os.getenv("TRACE_DIR", os.path.join(os.getcwd(), "traces"))
+            )
+        # Set STALL_WATCHDOG=1 to log where the GUI thread freezes, started
+        # first so the rest of this startup is watched too
+        self._stall_watchdog = create_stall_watchdog_from_env(
+            context=lambda: {
+                "screen": self._screen_name,
+                "session": session_tracer.current_session,
+            }
+        )
+        if self._stall_watchdog is not None:
+            self._stall_watchdog.start()
+
+        # Templates are normally indexed by main before the window is built
+        if not templates_config_dict:
+            from config.load_metadata import initialize_templates_config_dict
+
+            initialize_templates_config_dict()
+
+    def _create_controllers(self):
+        from controllers.camera_controller import CameraController
+        from controllers.image_processor import ImageProcessor
+        from controllers.imposition import create_imposer_from_env
+        from controllers.print_preparation import create_preparer_from_env
+        from controllers.print_spooler import PrintSpooler, create_printers_from_env
+        from controllers.session_catalog import SessionCatalog, default_catalog_path
+        from controllers.session_manager import SessionManager
+        from controllers.session_storage import create_session_storage_from_env
+
+        # Initialize camera
+        base_dir = os.getcwd()
+        self._camera_controller = CameraController()
+        self._camera_index = int(os.getenv("CAMERA_INDEX", "0"))
+        # Active sessions live in RAM, finished ones move to base_dir
+        self._session_storage = create_session_storage_from_env(base_dir)
+        # Indexes sessions, composites and print jobs for reprints
+        self._catalog = SessionCatalog(default_catalog_path(base_dir))
+        self._session_manager = SessionManager(
+            base_dir=base_dir, storage=self._session_storage, catalog=self._catalog
+        )
+        self._image_processor = ImageProcessor()
+
+        # Jobs left over from a previous run are printed again on startup, done
+        # and failed ones are forgotten after PRINT_JOB_RETENTION_H hours
+        spool_dir = os.getenv("PRINT_SPOOL_DIR", os.path.join(base_dir, "print_spool"))
+        self._print_spooler = PrintSpooler(
+            create_printers_from_env(),
+            spool_dir=spool_dir,
+            imposer=create_imposer_from_env(),
+            preparer=create_preparer_from_env(os.path.join(spool_dir, "prepared")),
+            path_resolver=self._session_storage.resolve,
+            keep_finished_s=float(os.getenv("PRINT_JOB_RETENTION_H", "24")) * 3600,
+        )
+        self._print_spooler.job_updated.connect(self._on_print_job_updated)
+
+    def _start_services(self):
+        from controllers.download_server import create_download_server_from_env
+        from controllers.housekeeping import create_housekeeper_from_env
+        from controllers.metrics_exporter import create_metrics_exporter_from_env
+        from controllers.preview_stream import create_preview_stream_from_env
+
+        base_dir = os.getcwd()
+        # Set DOWNLOAD_SERVER=1 to show guests a QR code of their photo
+        self._download_server = create_download_server_from_env(
+            base_dir, path_resolver=self._session_storage.resolve
+        )
+        if self._download_server is not None:
+            self._download_server.start()
+
+        # Compacts and prunes old sessions and downloads, paused while the
+        # camera screen is up
+        self._housekeeper = create_housekeeper_from_env(
+            base_dir,
+            protected_folders=self._session_manager.active_folder_names,
+            catalog=self._catalog,
+            downloads_dir=(
+                self._download_server.downloads_dir
+                if self._download_server is not None
+                else None
+            ),
+        )
+        if self._housekeeper is not None:
+            self._housekeeper.start()
+
+        # Set PREVIEW_STREAM=1 to watch the booth from another device
+        self._preview_stream = create_preview_stream_from_env()
+        if self._preview_stream is not None:
+            self._preview_stream.start()
+
+        # Set METRICS=1 to scrape the booth's health with Prometheus
+        self._metrics_exporter = create_metrics_exporter_from_env(
+            session_manager=self._session_manager,
+            print_spooler=self._print_spooler,
+            image_processor=self._image_processor,
+            storage=self._session_storage,
+        )
+        if self._metrics_exporter is not None:
+            self._metrics_exporter.start()
+
+    def _create_camera_screen(self):
+        from ui.camera_screen import CameraScreen
+
         self.camera_screen = CameraScreen(
             camera_controller=self._camera_controller,
             image_processor=self._image_processor,
             session_manager=self._session_manager,
             camera_index=self._camera_index,
+            preview_stream=self._preview_stream,
         )
+        self._add_screen("camera", self.camera_screen)
+        self.camera_screen.session_continued.connect(self._on_session_continued)
+
+    def _create_selection_screen(self):
+        from ui.selection_screen import SelectionScreen
+
         self.selection_screen = SelectionScreen(session_manager=self._session_manager)
+        self._add_screen("selection", self.selection_screen)
+        self.selection_screen.layout_selected.connect(self._on_layout_selected)
+
+    def _create_print_screen(self):
+        from ui.print_screen import PrintScreen
+
         self.print_screen = PrintScreen(
-            image_processor=self._image_processor, session_manager=self._session_manager
+            image_processor=self._image_processor,
+            session_manager=self._session_manager,
+            print_spooler=self._print_spooler,
+            download_server=self._download_server,
         )
+        self._add_screen("print", self.print_screen)
 
-        # Order that it is added matters
-        self.stacked_widget.addWidget(self.title_screen)
-        self.stacked_widget.addWidget(self.camera_screen)
-        self.stacked_widget.addWidget(self.selection_screen)
-        self.stacked_widget.addWidget(self.print_screen)
+    def _finish_startup(self):
+        from controllers.template_watcher import TemplateWatcher
 
-        self.title_screen.navigate_to.connect(self.navigate_to_screen)
-        self.camera_screen.navigate_to.connect(self.navigate_to_screen)
-        self.selection_screen.navigate_to.connect(self.navigate_to_screen)
-        self.print_screen.navigate_to.connect(self.navigate_to_screen)
+        # Pick up added or edited frame designs without a restart
+        self._template_watcher = TemplateWatcher()
+        self._template_watcher.templates_changed.connect(self._on_templates_changed)
 
-        # Connect this method to the same method if layout screen if not active
-        self.title_screen.create_session_signal.connect(
-            self._on_skip_layout_create_session
+        # Start camera immediately - stop in on_exit of main window
+        self._camera_controller.start_camera(self._camera_index)
+        self.screens_ready.emit()
+
+        # Set PHOTOBOOTH_WARMUP=0 to skip warming up the hot paths
+        if os.getenv("PHOTOBOOTH_WARMUP", "1") != "0":
+            QTimer.singleShot(0, self._start_warmup)
+
+    def _start_warmup(self):
+        """Pay first-use costs of the capture and print paths while the title screen is idle."""
+        from config.load_metadata import templates_config_dict
+        from controllers.warmup import Warmup
+
+        if self.stacked_widget.currentWidget() is not self.title_screen:
+            return
+
+        template_paths = list(templates_config_dict)
+        self.selection_screen.preload_templates(template_paths)
+        self.print_screen.preload_templates(template_paths)
+
+        frame_size = (
+            int(os.getenv("CAMERA_WIDTH", "1920")),
+            int(os.getenv("CAMERA_HEIGHT", "1080")),
+        )
+        self._warmup = Warmup(self._image_processor, template_paths, frame_size)
+        self._warmup.finished.connect(self._on_warmup_finished)
+        self._warmup.start(
+            preview_size=(self.camera_screen.width(), self.camera_screen.height())
         )
-        self.camera_screen.session_continued.connect(self._on_session_continued)
-        self.selection_screen.layout_selected.connect(self._on_layout_selected)
 
-        # Start with title screen
-        self.navigate_to_screen("title")
-        self.stacked_widget.setCurrentIndex(0)
+    def _cancel_warmup(self):
+        """Leave the CPU and the render workers to the guest."""
+        if self._warmup is not None:
+            self._warmup.cancel()
+        # Queued template decodes would delay the first preview and render
+        self.selection_screen.cancel_preloads()
+        self.print_screen.cancel_preloads()
 
-        # Start camera immediately - stop in on_exit of main window
-        self._camera_controller.start_camera(self._camera_index)
+    def _on_warmup_finished(self, timings):
+        summary = ", ".join(f"{stage} {ms:.0f}ms" for stage, ms in timings.items())
+        print(f"Warm-up finished: {summary}")
 
     def navigate_to_screen(self, screen_name: str):
-        screen_map = {"title": 0, "camera": 1, "selection": 2, "print": 3}
-
-        # Call on_exit for current screen
-        current_widget = self.stacked_widget.currentWidget()
-        if hasattr(current_widget, "on_exit"):
-            current_widget.on_exit()  # type: ignore
-
-        if screen_name == "title":
-            self._session_manager.reset_session()
-            self.camera_screen.reset()
-            self.selection_screen.reset()
-
-        # Special handling for print screen - generate composite
-        if screen_name == "print":
-            selected_photos = self.selection_screen.selected_photos
-            if not selected_photos:
-                print("No photos selected!")
-                return
-            # Generate the composite before switching
-            self.print_screen.generate_composite(selected_photos)
-
-        # Switch to new screen
-        new_index = screen_map[screen_name]
-        self.stacked_widget.setCurrentIndex(new_index)
-
-        # Call on_enter for new screen
-        new_widget = self.stacked_widget.currentWidget()
-        if hasattr(new_widget, "on_enter"):
-            new_widget.on_enter()  # type: ignore
+        if screen_name != "title":
+            self._ensure_screens()
+            self._cancel_warmup()
+
+        # The screen span ends, and navigation is traced, in the session being left
+        session_tracer.screen_changed(screen_name)
+        with session_tracer.span("navigate_to_screen", screen=screen_name):
+            # Call on_exit for current screen
+            current_widget = self.stacked_widget.currentWidget()
+            if hasattr(current_widget, "on_exit"):
+                current_widget.on_exit()  # type: ignore
+
+            if screen_name == "title" and self.print_screen is not None:
+                # Rendering and printing of the session carry on in the background
+                self._session_manager.reset_session()
+                self.camera_screen.reset()
+                self.selection_screen.reset()
+            elif screen_name in ("camera", "selection"):
+                self._session_manager.set_stage(screen_name)
+
+            # Background file work waits while the camera screen is capturing
+            for worker in (self._housekeeper, self._download_server):
+                if worker is None:
+                    continue
+                if screen_name == "camera":
+                    worker.pause()
+                else:
+                    worker.resume()
+
+            # Special handling for print screen - generate composite
+            if screen_name == "print":
+                selected_photos = self.selection_screen.selected_photos
+                if not selected_photos:
+                    print("No photos selected!")
+                    return
+                # Batch renders and reprints use the same photos
+                self._session_manager.set_selected_photos(selected_photos)
+                # Show the preview and queue the composite save, rendering is in the background
+                self.print_screen.generate_composite(selected_photos)
+
+            # Switch to new screen
+            self.stacked_widget.setCurrentWidget(self._screens[screen_name])
+            self._screen_name = screen_name
+            # The new page is raised above the HUD
+            if self._stats_hud.isVisible():
+                self._stats_hud.raise_()
+            if self._preview_stream is not None:
+                session = self._session_manager.current_session
+                self._preview_stream.set_state(
+                    screen=screen_name, session=session.id if session is not None else None
+                )
+
+            # Call on_enter for new screen
+            new_widget = self.stacked_widget.currentWidget()
+            if hasattr(new_widget, "on_enter"):
+                new_widget.on_enter()  # type: ignore
 
     def _on_layout_selected(
         self,
@@ -121,7 +391,39 @@ class PhotoboothGUI(QMainWindow):
         self._session_manager.set_num_photos(num_photos)
         self._session_manager.set_preview(preview_path)
 
+        # Start the print resolution render now so "Next" does not wait on it
+        self.print_screen.prepare_composite(
+            self.selection_screen.selected_photos, layout_path
+        )
+
+    def _on_templates_changed(self, changed_paths):
+        """Invalidate caches of templates that changed on disk and refresh swatches."""
+        self._image_processor.invalidate_templates(changed_paths)
+        self.selection_screen.on_templates_changed(changed_paths)
+        self.print_screen.on_templates_changed(changed_paths)
+
+    def _on_print_job_updated(self, job_id: str, state: str):
+        from controllers.print_spooler import JOB_DONE, JOB_FAILED
+
+        print(
+            f"Print job {job_id}: {state} "
+            f"(queue depth {self._print_spooler.queue_depth}, "
+            f"{self._print_spooler.jobs_per_hour()} jobs/hour)"
+        )
+        job = self._print_spooler.get_job(job_id)
+        # None if pruned from the spooler's history before this update arrived
+        if job is not None:
+            self._catalog.record_print_job(job)
+        if state in (JOB_DONE, JOB_FAILED):
+            self._session_manager.print_finished(
+                job.get("session_id") if job is not None else None, job_id
+            )
+            print(f"{self._session_manager.sessions_per_hour()} sessions/hour")
+
     def _on_skip_layout_create_session(self):
+        self._ensure_screens()
+        self._cancel_warmup()
+
         # Configure camera screen
         self.camera_screen.set_photos_to_take(4)
 
@@ -137,6 +439,25 @@ class PhotoboothGUI(QMainWindow):
         pass
 
     def closeEvent(self, event):
-        """Cleanup when window closes."""
-        self._camera_controller.stop_camera()
+        """Cleanup when window closes, startup may not have finished."""
+        if self._camera_controller is not None:
+            self._camera_controller.stop_camera()
+        for worker in (
+            self._template_watcher,
+            self._print_spooler,
+            self._housekeeper,
+            self._download_server,
+            self._preview_stream,
+            self._metrics_exporter,
+            self._stall_watchdog,
+        ):
+            if worker is not None:
+                worker.stop()
+        if self._warmup is not None:
+            self._warmup.shutdown()
+        for screen in (self.selection_screen, self.print_screen):
+            if screen is not None:
+                screen.cleanup()
+        if self._session_manager is not None:
+            self._session_manager.shutdown()
         event.accept()
@@ -1,5 +1,5 @@
-import os
-import time
+import io
+from typing import Optional
 from PySide6.QtCore import QRect, Qt
 from PySide6.QtGui import QFont, QPixmap
 from PySide6.QtWidgets import (
@@ -10,25 +10,35 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-from PIL import Image
 from components.range_selector import RangeSelectorWidget
+from controllers.composite_pipeline import CompositePipeline
+from controllers.download_server import DownloadServer
 from controllers.image_processor import ImageProcessor
-from controllers.session_manager import SessionManager
+from controllers.print_spooler import PrintSpooler
+from controllers.session_manager import STAGE_RENDER, Session, SessionManager
+from controllers.session_trace import session_tracer
 from ui.base_screen import BaseScreen
 from ui.styles import buttons_css
-import cv2 as cv
-from python_parallel_print import mock_printer
 
 
 class PrintScreen(BaseScreen):
     def __init__(
-        self, image_processor: ImageProcessor, session_manager: SessionManager
+        self,
+        image_processor: ImageProcessor,
+        session_manager: SessionManager,
+        print_spooler: PrintSpooler,
+        download_server: Optional[DownloadServer] = None,
     ):
         super().__init__()
         self._image_processor = image_processor
         self._session_manager = session_manager
-        self._composite_image = None
-        self.printer = mock_printer.MockPrinter()
+        self._pipeline = CompositePipeline()
+        self._render_key = None  # (photos, template) of the queued render
+        self._render_future = None
+        self._save_future = None
+        # Shared with the main window, which starts, stops and records its jobs
+        self._print_spooler = print_spooler
+        self._download_server = download_server
         self._setup_ui()
 
     def _setup_ui(self):
@@ -70,7 +80,18 @@ class PrintScreen(BaseScreen):
             label_text="Number of prints",
         )
         self.add_number_of_prints_label.setMaximumHeight(300)
-        self.preview_layout.addWidget(self.add_number_of_prints_label, 1)
+
+        # Guests scan this to download their photo, see DownloadServer
+        self.download_label = QLabel()
+        self.download_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.download_label.setWordWrap(True)
+        self.download_label.setStyleSheet("color: black;")
+        self.download_label.hide()
+
+        side_layout = QVBoxLayout()
+        side_layout.addWidget(self.add_number_of_prints_label)
+        side_layout.addWidget(self.download_label)
+        self.preview_layout.addLayout(side_layout, 1)
 
         main_layout.addWidget(self.preview_widget)
 
@@ -85,10 +106,10 @@ class PrintScreen(BaseScreen):
         back_button.clicked.connect(lambda: self.navigate_to.emit("selection"))
 
         # Print button
-        print_button = QPushButton("Print Photo")
-        print_button.setFont(QFont("Impact"))
-        print_button.setStyleSheet(buttons_css)
-        print_button.clicked.connect(self._on_print_clicked)
+        self.print_button = QPushButton("Print Photo")
+        self.print_button.setFont(QFont("Impact"))
+        self.print_button.setStyleSheet(buttons_css)
+        self.print_button.clicked.connect(self._on_print_clicked)
 
         # Popup dialog
         self.popup_dialog = QDialog(self)
@@ -120,7 +141,7 @@ class PrintScreen(BaseScreen):
         start_over_button.clicked.connect(lambda: self.navigate_to.emit("title"))
 
         button_layout.addWidget(back_button)
-        button_layout.addWidget(print_button)
+        button_layout.addWidget(self.print_button)
         button_layout.addWidget(start_over_button)
 
         main_layout.addLayout(button_layout)
@@ -132,24 +153,108 @@ class PrintScreen(BaseScreen):
         # This will be called with selected photos from SelectionScreen
         pass
 
+    def prepare_composite(self, photos_path, template_path):
+        """
+        Start rendering the final composite in the background.
+
+        Called as soon as a layout is selected so the render is usually done
+        by the time the guest reaches this screen. A render for a previous
+        selection is cancelled if it has not started yet.
+        """
+        render_key = (tuple(photos_path), template_path)
+        if render_key == self._render_key and self._render_future is not None:
+            return self._render_future
+
+        if self._render_future is not None:
+            self._render_future.cancel()
+        session = self._session_manager.current_session
+        self._render_key = render_key
+        self._render_future = self._pipeline.submit_render(
+            photos_path, template_path, session.id if session is not None else None
+        )
+        self._save_future = None
+        return self._render_future
+
+    def preload_templates(self, template_paths):
+        self._pipeline.preload_templates(template_paths)
+
+    def cancel_preloads(self):
+        self._pipeline.cancel_preloads()
+
+    def on_templates_changed(self, changed_paths):
+        """Forget a queued render of a template that changed on disk."""
+        self._pipeline.invalidate_templates(changed_paths)
+        if self._render_key is not None and self._render_key[1] in changed_paths:
+            self._render_future.cancel()
+            self._render_key = None
+            self._render_future = None
+            self._save_future = None
+
     def generate_composite(self, photos_path):
-        """Create and display the photo composite."""
+        """Display the preview strip and queue the final composite to be saved."""
         # Get template info from session manager
         template_path, num_photos, preview_path = self._session_manager.template_info
 
         if template_path is None or num_photos is None or preview_path is None:
             raise ValueError("No template info available in session")
 
-        # Create the composite
-        self._composite_image = self._image_processor.create_photo_composite(
-            photo_paths=photos_path,
-            template_path=template_path,
-        )
+        # Reuses the render started at layout selection if it matches
+        render_future = self.prepare_composite(photos_path, template_path)
+
+        # Encode and save as a second stage, owned by the session so it
+        # finishes even if the guest leaves before it is done
+        session = self._session_manager.current_session
+        if session is not None and self._save_future is None:
+            self._save_future = self._pipeline.submit_save(
+                render_future, photos_path, session.folder, session.id
+            )
+            # Recorded and published before the session can migrate its folder
+            self._session_manager.track(
+                self._save_future,
+                session,
+                on_done=lambda future: self._on_composite_saved(session, future),
+            )
+            session.set_stage(STAGE_RENDER)
 
         # Display the selected preview strip in the preview
         self._display_preview_strip(preview_path)
+        self._display_download_code(session)
+
+        return self._save_future
 
-        return self._composite_image
+    def _on_composite_saved(self, session: Session, save_future):
+        """Record and publish the composite, runs before the session is reaped."""
+        if save_future.cancelled() or save_future.exception() is not None:
+            return
+        self._session_manager.add_composite(session, save_future.result())
+        if self._download_server is not None:
+            # Keeps the session, and its hot folder, until the composite is read
+            self._session_manager.track(
+                self._download_server.publish(session.id, save_future.result()), session
+            )
+
+    def _display_download_code(self, session: Optional[Session]):
+        """Show a QR code of the session's download page, or its URL without qrcode."""
+        if self._download_server is None or session is None:
+            self.download_label.hide()
+            return
+
+        url = self._download_server.url_for(session.id)
+        try:
+            import qrcode
+        except ImportError:
+            # Optional dependency, the URL can still be typed in
+            self.download_label.setText(f"Download your photo at\n{url}")
+            self.download_label.show()
+            return
+
+        buffer = io.BytesIO()
+        qrcode.make(url, box_size=6, border=2).save(buffer)
+        pixmap = QPixmap()
+        pixmap.loadFromData(buffer.getvalue())
+        self.download_label.setPixmap(pixmap)
+        self.download_label.setToolTip(url)
+        self.download_label.show()
 
     def _display_preview_strip(self, preview_path):
         """Display the preview image in the preview label."""
@@ -169,30 +274,40 @@ class PrintScreen(BaseScreen):
 
     def _on_print_clicked(self):
         """Handle print button click."""
-        if self._composite_image is None:
+        if self._save_future is None:
             print("No composite image to print")
             return
 
-        # Save the composite to session folder with DPI preserved
-        session_folder = self._session_manager.get_current_session_folder
-        if session_folder:
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            output_path = os.path.join(session_folder, f"final_composite_{timestamp}.png")
-
-            # Get DPI from image processor (preserves original or defaults to 300)
-            dpi = self._image_processor.get_composite_dpi()
-
-            # Convert BGR to RGB for PIL
-            composite_rgb = cv.cvtColor(self._composite_image, cv.COLOR_BGR2RGB)
+        # Queued as soon as the composite is on disk, even if the guest has
+        # moved on and the next session is already capturing
+        session = self._session_manager.current_session
+        strips = int(self.add_number_of_prints_label.current_value)
+        if session is not None:
+            session.request_print()
+        session_tracer.instant("print_requested", strips=strips)
+        self._save_future.add_done_callback(
+            lambda future: self._send_to_printer(future, session, strips)
+        )
+        self.popup_dialog.show()
 
-            # Save with PIL to preserve/set DPI
-            img = Image.fromarray(composite_rgb)
-            img.save(output_path, dpi=dpi)
-            print(f"Composite saved to: {output_path} (DPI: {dpi})")
+    def _send_to_printer(self, save_future, session: Optional[Session], strips: int):
+        """Submit a saved composite to the spooler, runs on the save worker."""
+        try:
+            output_path = save_future.result()
+        except Exception as e:
+            print(f"Could not render composite: {e}")
+            if session is not None:
+                self._session_manager.print_finished(session.id)
+            return
 
-        print("Sending to printer...")
-        self.popup_dialog.show()
-        self.printer.print_images(
+        # Queued on disk and printed by the spooler workers, never blocks the GUI
+        job_id = self._print_spooler.submit(
             output_path,
-            num_copies=int(self.add_number_of_prints_label.current_value / 2),
+            strips=strips,
+            session_id=session.id if session is not None else None,
         )
+        if session is not None:
+            session.add_print_job(job_id)
+
+    def cleanup(self):
+        self._pipeline.shutdown()
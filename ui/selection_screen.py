@@ -10,11 +10,12 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 from components.clickable_label import ClickableLabel
+from controllers.preview_renderer import PreviewRenderer
 from controllers.session_manager import SessionManager
+from controllers.session_trace import session_tracer
 from ui.base_screen import BaseScreen
 from utils.utils import clear_layout, get_png_file_paths
 from ui.styles import buttons_css
-from utils.generate_preview_strips import generate_preview_strip
 from config.load_metadata import templates_config_dict
 
 from PySide6.QtWidgets import QSizePolicy
@@ -36,21 +37,18 @@ class SelectionScreen(BaseScreen):
         super().__init__(parent)
         self.session_manager = session_manager
         self.current_session_folder = None
-        self.filtered_templates_dict = {
-            2: self._get_suitable_templates(2),
-            4: self._get_suitable_templates(4),
-        }
-        self.filtered_templates_dict["default"] = list(
-            self.filtered_templates_dict.get(2).keys()
-        )[0]
-        self.filtered_templates_dict["default_4"] = list(
-            self.filtered_templates_dict.get(4).keys()
-        )[0]
+        self._refresh_filtered_templates()
+        self._preview_renderer = PreviewRenderer()
+        self._preview_renderer.preview_ready.connect(self._on_preview_ready)
+        self._preview_renderer.preview_failed.connect(self._on_preview_failed)
         self._setup_ui()
 
     def on_enter(self):
         print(f"Widget size on enter: {self.size()}")
         self.current_session_folder = self.session_manager.get_current_session_folder
+        # The last capture may still be being written
+        with session_tracer.span("wait_for_saves"):
+            self.session_manager.wait_for_saves()
         # Load images from current session folder
         if self.current_session_folder and os.path.exists(self.current_session_folder):
             all_pngs = get_png_file_paths(self.current_session_folder)
@@ -72,6 +70,7 @@ class SelectionScreen(BaseScreen):
         self.update_image_grid()
 
     def reset(self):
+        self._cancel_speculative_previews()
         self.selected_photos = []
         self.selected_labels = {}
         self.selected_template_path = None
@@ -86,7 +85,11 @@ class SelectionScreen(BaseScreen):
         self.selected_photos = []  # Track selected image paths
         self.selected_labels = {}  # Track labels by path for styling
         self.all_image_paths = []  # Will be populated when showing selection screen
-        self.preview_strip_paths = {}  # Store preview strip paths {2: path, 3: path}
+        self.preview_strip_paths = {}  # Rendered variants {template_path: strip_path}
+        self._preview_pixmaps = {}  # Scaled pixmaps {strip_path: QPixmap}
+        self._generated_previews = set()  # Every strip written, for cleanup
+        self._preview_selection = None  # Photos the variants were rendered for
+        self._preview_generation = None  # Generation of the variants being rendered
         self.selected_template_path = None  # Track currently selected template
 
         # Navigation buttons
@@ -278,7 +281,7 @@ class SelectionScreen(BaseScreen):
         self._update_preview_strip()
 
     def _update_preview_strip(self):
-        """Generate and display preview strip based on number of selected photos and template."""
+        """Render preview strips for the selection and display the selected template."""
         # Always disable print button initially
         self.print_button.setEnabled(False)
 
@@ -289,6 +292,7 @@ class SelectionScreen(BaseScreen):
         if self.current_session_folder:
             if filtered_templates is None or len(filtered_templates) == 0:
                 print(f"No suitable templates found for {num_selected} photos")
+                self._cancel_speculative_previews()
                 self._hide_preview_strip()
                 self.selected_template_path = None
                 return
@@ -304,43 +308,88 @@ class SelectionScreen(BaseScreen):
                 )
                 return
 
-            # Generate preview strip
-            strip_path = generate_preview_strip(
-                photo_paths=self.selected_photos,
-                num_photos=num_selected,
-                template_path=self.selected_template_path,
-                output_dir=self.current_session_folder,
-                output_prefix="preview_strip",
-            )
+            # Render every colour variant in the background when the selection changes
+            if tuple(self.selected_photos) != self._preview_selection:
+                self._start_speculative_previews(list(filtered_templates.keys()))
 
-            if strip_path and os.path.exists(strip_path):
-                # Store generated preview strip
-                self.preview_strip_paths[num_selected] = strip_path
-                # Load and display the preview strip
-                pixmap = QPixmap(strip_path)
-                # Scale to reasonable size (e.g., 600px wide)
-                scaled_pixmap = pixmap.scaled(
-                    self.preview_strip_label.size(),
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation,
-                )
-                self.preview_strip_label.setPixmap(scaled_pixmap)
-                self.preview_strip_label.setVisible(True)
-                print(f"Updated preview strip with {num_selected} photos: {strip_path}")
-                self.layout_selected.emit(
-                    self.selected_template_path,
-                    num_selected,
-                    strip_path,
-                )
-                self.print_button.setEnabled(True)
-            else:
-                print(f"Failed to generate preview strip for {num_selected} photos")
-                self._hide_preview_strip()
+            self._show_selected_preview()
         else:
             # Hide preview if not 2 or 4 photos selected
+            self._cancel_speculative_previews()
             self._hide_preview_strip()
             self.selected_template_path = None
 
+    def _start_speculative_previews(self, template_paths):
+        """Queue a preview render for every variant, default template first."""
+        default_path = self.selected_template_path
+        ordered = [default_path] + [p for p in template_paths if p != default_path]
+        self.preview_strip_paths = {}
+        self._preview_pixmaps = {}
+        self._preview_selection = tuple(self.selected_photos)
+        self._preview_generation = self._preview_renderer.render_variants(
+            photo_paths=self.selected_photos,
+            template_paths=ordered,
+            output_dir=self.current_session_folder,
+        )
+
+    def _cancel_speculative_previews(self):
+        """Drop rendered variants and cancel any render still in flight."""
+        self._preview_renderer.cancel()
+        self._preview_generation = None
+        self._preview_selection = None
+        self.preview_strip_paths = {}
+        self._preview_pixmaps = {}
+
+    def _show_selected_preview(self):
+        """Display the rendered variant for the selected template, if it is ready."""
+        strip_path = self.preview_strip_paths.get(self.selected_template_path)
+        if not strip_path or not os.path.exists(strip_path):
+            # Still rendering - _on_preview_ready will display it
+            self.print_button.setEnabled(False)
+            return
+
+        num_selected = len(self.selected_photos)
+        scaled_pixmap = self._preview_pixmaps.get(strip_path)
+        if scaled_pixmap is None:
+            scaled_pixmap = self._load_preview_pixmap(strip_path)
+        self.preview_strip_label.setPixmap(scaled_pixmap)
+        self.preview_strip_label.setVisible(True)
+        print(f"Updated preview strip with {num_selected} photos: {strip_path}")
+        self.layout_selected.emit(
+            self.selected_template_path,
+            num_selected,
+            strip_path,
+        )
+        self.print_button.setEnabled(True)
+
+    def _on_preview_ready(self, generation: int, template_path: str, strip_path: str):
+        """Store a speculatively rendered variant and show it if it is selected."""
+        self._generated_previews.add(strip_path)
+        if generation != self._preview_generation:
+            return
+        self.preview_strip_paths[template_path] = strip_path
+        # Decode and scale now so switching colours is only a pixmap swap
+        self._load_preview_pixmap(strip_path)
+        if template_path == self.selected_template_path:
+            self._show_selected_preview()
+
+    def _load_preview_pixmap(self, strip_path: str) -> QPixmap:
+        """Load a preview strip scaled to the preview label and cache it."""
+        pixmap = QPixmap(strip_path).scaled(
+            self.preview_strip_label.size(),
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+        self._preview_pixmaps[strip_path] = pixmap
+        return pixmap
+
+    def _on_preview_failed(self, generation: int, template_path: str):
+        if generation != self._preview_generation:
+            return
+        print(f"Failed to generate preview strip for {template_path}")
+        if template_path == self.selected_template_path:
+            self._hide_preview_strip()
+
     def _update_color_selection_buttons(self, num_photos: int):
         """Update the color selection buttons based on number of photos."""
         if num_photos not in [2, 4]:
@@ -368,6 +417,61 @@ class SelectionScreen(BaseScreen):
             if i != len(templates_config_dict) - 1:
                 self.template_selection_labels.addSpacing(20)
 
+    def _refresh_filtered_templates(self):
+        """Group templates by number of photos and pick the default of each."""
+        self.filtered_templates_dict = {
+            2: self._get_suitable_templates(2),
+            4: self._get_suitable_templates(4),
+        }
+        self.filtered_templates_dict["default"] = next(
+            iter(self.filtered_templates_dict.get(2)), None
+        )
+        self.filtered_templates_dict["default_4"] = next(
+            iter(self.filtered_templates_dict.get(4)), None
+        )
+
+    def preload_templates(self, template_paths):
+        self._preview_renderer.preload_templates(template_paths)
+
+    def cancel_preloads(self):
+        self._preview_renderer.cancel_preloads()
+
+    def on_templates_changed(self, changed_paths):
+        """Rebuild the swatches and re-render previews after templates changed on disk."""
+        self._preview_renderer.invalidate_templates(changed_paths)
+        self._refresh_filtered_templates()
+
+        num_selected = len(self.selected_photos)
+        if self.selected_template_path not in templates_config_dict:
+            self.selected_template_path = None
+        selected_template_path = self.selected_template_path
+        self._update_color_selection_buttons(num_selected)
+        if selected_template_path:
+            self._style_swatch(selected_template_path, selected=True)
+
+        # Swatches and variants changed, render the selection again
+        if num_selected in [2, 4] and self._preview_selection is not None:
+            self._cancel_speculative_previews()
+            self._update_preview_strip()
+
+    def _style_swatch(self, template_path, selected: bool):
+        """Style a colour swatch, with a gold border when selected."""
+        # Look up through the layout, cleared swatches linger until deleteLater runs
+        widget = None
+        for i in range(self.template_selection_labels.count()):
+            item_widget = self.template_selection_labels.itemAt(i).widget()
+            if item_widget is not None and item_widget.objectName() == template_path:
+                widget = item_widget
+                break
+        if widget is None:
+            return
+        rgb = templates_config_dict[template_path]["color"]
+        border = "border: 5px solid #C9A961;" if selected else ""
+        widget.setStyleSheet(f"""background-color: rgb({rgb[0]}, {rgb[1]}, {rgb[2]});
+                                border-radius: {40 // 2}px;
+                                {border}""")
+        widget.is_selected = selected
+
     def _get_suitable_templates(self, num_photos) -> dict[str, dict]:
         """
         Get templates suitable for the given number of photos.
@@ -387,39 +491,29 @@ class SelectionScreen(BaseScreen):
         else:
             # Clear previously selected if available and Select new
             if self.selected_template_path:
-                previous_widget = self.template_selection_widget.findChild(
-                    ClickableLabel, self.selected_template_path
-                )
-                rgb = templates_config_dict[self.selected_template_path]["color"]
-                # TODO ensure that previous_widget is not None
-                previous_widget.setStyleSheet(f"""background-color: rgb({rgb[0]}, 
-                                                                        {rgb[1]}, 
-                                                                        {rgb[2]});
-                                                border-radius: {40 // 2}px;""")
-                previous_widget.is_selected = False
+                self._style_swatch(self.selected_template_path, selected=False)
 
             self.selected_template_path = color_label
-            selected_widget = self.template_selection_widget.findChild(
-                ClickableLabel, color_label
-            )
-            rgb = templates_config_dict[self.selected_template_path]["color"]
-            # TODO ensure that selected_widget is not None
-            selected_widget.setStyleSheet(f"""background-color: rgb({rgb[0]}, 
-                                                                        {rgb[1]}, 
-                                                                        {rgb[2]});
-                                                border-radius: {40 // 2}px;
-                                                border: 5px solid #C9A961;""")
-            selected_widget.is_selected = True
+            self._style_swatch(color_label, selected=True)
             # Update preview strip when new template selected
             self._update_preview_strip()
 
+    def cleanup(self):
+        self._preview_renderer.shutdown()
+
     def _hide_preview_strip(self):
         """Hide the preview strip."""
         self.preview_strip_label.setVisible(False)
 
     def _cleanup_old_previews(self):
-        try:
-            for p in self.preview_strip_paths.values():
+        self._cancel_speculative_previews()
+        for p in self._generated_previews:
+            try:
                 os.remove(p)
-        except:
-            pass  # expect that the path might not always exists
+            except FileNotFoundError:
+                pass  # expect that the path might not always exists
+            except OSError as e:
+                # Left for housekeeping to remove once the session is closed
+                print(f"Could not remove preview strip {p}: {e}")
+        self._generated_previews = set()
+        self.preview_strip_paths = {}
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark template compositing: plain slot paste vs alpha-aware layering.
+
+Run from the repository root: python -m utils.benchmark_compositor
+"""
+
+import os
+import tempfile
+import time
+import cv2 as cv
+import numpy as np
+from config.load_metadata import (
+    initialize_templates_config_dict,
+    templates_config_dict,
+)
+from controllers.image_processor import ImageProcessor
+
+
+def make_layered_template(template_path, output_path, border=24, sticker_radius=60):
+    """
+    Turn an opaque template into a layered one for benchmarking.
+
+    Each slot gets a transparent window inset by `border` pixels, so the
+    frame overlaps the photo edges, plus an opaque sticker on one corner.
+    """
+    template = cv.imread(template_path, cv.IMREAD_UNCHANGED)
+    if template.shape[2] == 3:
+        template = cv.cvtColor(template, cv.COLOR_BGR2BGRA)
+    for slot_x, slot_y, slot_w, slot_h in templates_config_dict[template_path]["slots"]:
+        template[
+            slot_y + border : slot_y + slot_h - border,
+            slot_x + border : slot_x + slot_w - border,
+            3,
+        ] = 0
+        cv.circle(
+            template,
+            (slot_x + slot_w - border, slot_y + border),
+            sticker_radius,
+            (40, 200, 255, 255),
+            -1,
+            cv.LINE_AA,
+        )
+    cv.imwrite(output_path, template)
+    return output_path
+
+
+def naive_blend(canvas, template_bgra, slots, slot_contents):
+    """Reference: blend the whole template over every slot in float, no precomputation."""
+    alpha = template_bgra[:, :, 3:4].astype(np.float32) / 255.0
+    for (slot_x, slot_y, slot_w, slot_h), photo in zip(slots, slot_contents):
+        region = np.s_[slot_y : slot_y + slot_h, slot_x : slot_x + slot_w]
+        a = alpha[region]
+        canvas[region] = (
+            photo * (1.0 - a) + template_bgra[region][:, :, :3] * a
+        ).astype(np.uint8)
+    return canvas
+
+
+def time_call(fn, repeat):
+    fn()  # warm up caches
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    initialize_templates_config_dict()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        photo_paths = []
+        for i in range(4):
+            path = os.path.join(tmp, f"photo_{i}.png")
+            cv.imwrite(path, rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8))
+            photo_paths.append(path)
+
+        for layout in ("Horizontal", "Vertical"):
+            plain_path = next(p for p in templates_config_dict if layout in p)
+            layered_path = make_layered_template(
+                plain_path, os.path.join(tmp, f"layered_{layout}.png")
+            )
+            templates_config_dict[layered_path] = dict(templates_config_dict[plain_path])
+            slots = templates_config_dict[plain_path]["slots"]
+
+            processor = ImageProcessor()
+            slot_contents = processor._prepare_slot_contents(photo_paths, slots)
+            layered_bgra = cv.imread(layered_path, cv.IMREAD_UNCHANGED)
+
+            def place(template_path):
+                layers = processor._load_template_layers(template_path)
+                canvas = layers["base"].copy()
+                for i, photo in enumerate(slot_contents):
+                    x, y, w, h = slots[i]
+                    canvas[y : y + h, x : x + w] = photo
+                    foreground = layers["foregrounds"].get(i)
+                    if foreground is not None:
+                        processor._apply_slot_foreground(canvas, slots[i], foreground)
+                return canvas
+
+            start = time.perf_counter()
+            ImageProcessor()._load_template_layers(layered_path)
+            precompute_ms = (time.perf_counter() - start) * 1000
+
+            results = {
+                "plain paste": time_call(lambda: place(plain_path), args.repeat),
+                "layered (precomputed)": time_call(
+                    lambda: place(layered_path), args.repeat
+                ),
+                "layered (naive float)": time_call(
+                    lambda: naive_blend(
+                        layered_bgra[:, :, :3].copy(), layered_bgra, slots, slot_contents
+                    ),
+                    args.repeat,
+                ),
+                "full composite, plain": time_call(
+                    lambda: processor.create_photo_composite(photo_paths, plain_path),
+                    max(1, args.repeat // 4),
+                ),
+                "full composite, layered": time_call(
+                    lambda: processor.create_photo_composite(photo_paths, layered_path),
+                    max(1, args.repeat // 4),
+                ),
+            }
+
+            print(f"\n{layout} ({len(slots)} slots)")
+            print(f"  {'layer precompute (once)':<28} {precompute_ms:8.2f} ms")
+            for name, ms in results.items():
+                print(f"  {name:<28} {ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
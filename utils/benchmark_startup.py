@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark application startup: time to first paint and time to camera ready.
+
+Run from the repository root: python -m utils.benchmark_startup [--eager] [--runs N]
+
+Each run is a fresh process so import costs are included. Times are measured
+from interpreter start of the measured process:
+    first paint: title screen painted for the first time
+    screens ready: every screen built and the camera started
+    camera ready: camera delivered its first frame after the startup skip
+"""
+
+import time
+
+_PROCESS_START = time.perf_counter()
+
+# The start time is taken before anything else is imported
+import json  # noqa: E402
+import os  # noqa: E402
+import statistics  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+
+
+def measure(eager: bool, timeout_s: float) -> dict:
+    """Start the app in this process and return startup timings in milliseconds."""
+    from PySide6.QtCore import QEvent, QObject, QTimer
+    from PySide6.QtWidgets import QApplication
+    from config.load_metadata import initialize_templates_config_dict
+
+    timings = {}
+
+    def mark(name):
+        if name not in timings:
+            timings[name] = (time.perf_counter() - _PROCESS_START) * 1000
+
+    initialize_templates_config_dict()
+    app = QApplication(sys.argv)
+    app.setStyle("Fusion")
+    from ui.main_window import PhotoboothGUI
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint:
+                mark("first_paint_ms")
+            return False
+
+    first_paint = FirstPaint()
+    window = PhotoboothGUI("", lazy_startup=not eager)
+    window.title_screen.installEventFilter(first_paint)
+
+    def on_screens_ready():
+        mark("screens_ready_ms")
+        window._camera_controller.camera_ready.connect(
+            lambda: (mark("camera_ready_ms"), app.quit())
+        )
+        window._camera_controller.camera_error.connect(
+            lambda message: (timings.setdefault("camera_error", message), app.quit())
+        )
+
+    if window.print_screen is not None:
+        on_screens_ready()
+    else:
+        window.screens_ready.connect(on_screens_ready)
+
+    window.showMaximized()
+    QTimer.singleShot(int(timeout_s * 1000), app.quit)
+    app.exec()
+    window.close()
+    return timings
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark photobooth startup")
+    parser.add_argument(
+        "--eager", action="store_true", help="Build every screen before showing"
+    )
+    parser.add_argument("--runs", type=int, default=1, help="Fresh processes to run")
+    parser.add_argument(
+        "--timeout", type=float, default=15.0, help="Seconds to wait for the camera"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.eager, args.timeout)))
+        return
+
+    command = [sys.executable, "-m", "utils.benchmark_startup", "--child"]
+    command += ["--timeout", str(args.timeout)] + (["--eager"] if args.eager else [])
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            command, capture_output=True, text=True, cwd=os.getcwd()
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"Startup mode: {'eager' if args.eager else 'lazy'} ({args.runs} runs)")
+    for key in ("first_paint_ms", "screens_ready_ms", "camera_ready_ms"):
+        values = [run[key] for run in runs if key in run]
+        if values:
+            print(f"  {key:<18} median {statistics.median(values):8.1f} ms")
+        else:
+            print(f"  {key:<18} not reached")
+    errors = {run["camera_error"] for run in runs if "camera_error" in run}
+    for error in errors:
+        print(f"  camera error: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Export an event's composites and photos as a web gallery.
+
+Sessions are walked as a stream. Every image is decoded once, at a reduced
+size where the largest target allows it, then resized and encoded to JPEG
+or WebP at each target size on a process pool. Only a bounded window of
+images is in flight, and results are consumed in order. Each one is
+appended to index.html and, with --zip, to a ZIP archive, so memory does not
+grow with the event.
+
+Derivatives already present and newer than their source are reused, so an
+interrupted export resumes where it stopped. The index and ZIP are written
+to .partial files and renamed once complete.
+
+Run from the repository root:
+    python -m utils.export_gallery --output-dir gallery
+    python -m utils.export_gallery --output-dir gallery --zip event.zip --format webp
+"""
+
+import html
+import os
+import time
+import zipfile
+from urllib.parse import quote
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Tuple
+import cv2 as cv
+from PIL import Image
+from controllers.session_catalog import SessionCatalog, default_catalog_path
+
+FORMATS = {
+    "jpeg": (".jpg", cv.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv.IMWRITE_WEBP_QUALITY),
+}
+
+# cv.imread flags decoding at 1/2, 1/4 and 1/8 scale
+REDUCED_READS = (
+    (8, cv.IMREAD_REDUCED_COLOR_8),
+    (4, cv.IMREAD_REDUCED_COLOR_4),
+    (2, cv.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def iter_session_dirs(base_dir) -> Iterator[Path]:
+    """Session folders oldest first, from the catalog if there is one."""
+    catalog_path = default_catalog_path(base_dir)
+    if os.path.exists(catalog_path):
+        for session in reversed(SessionCatalog(catalog_path).find_sessions(limit=-1)):
+            if os.path.isdir(session["folder"]):
+                yield Path(session["folder"])
+        return
+    entries = (e for e in os.scandir(base_dir) if e.name.startswith("session_"))
+    for name in sorted(e.name for e in entries if e.is_dir()):
+        yield Path(base_dir) / name
+
+
+def iter_sources(session_dirs, include_photos=True) -> Iterator[Tuple[str, Path]]:
+    """Yield (session name, image) for final composites, then photos, of each session."""
+    for session_dir in session_dirs:
+        files = sorted(os.listdir(session_dir))
+        composites = [f for f in files if f.startswith("final_composite")]
+        photos = [f for f in files if f.endswith(("_image.png", "_image.jpg"))]
+        for name in composites + (photos if include_photos else []):
+            yield session_dir.name, session_dir / name
+
+
+def _targets(output_dir, session, source: Path, sizes, extension) -> List[Tuple[int, str]]:
+    return [
+        (size, os.path.join(output_dir, session, f"{source.stem}_{size}{extension}"))
+        for size in sizes
+    ]
+
+
+def _is_up_to_date(source: Path, targets) -> bool:
+    source_mtime = source.stat().st_mtime
+    for _, path in targets:
+        try:
+            if os.path.getmtime(path) < source_mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def read_reduced(source: Path, largest: int):
+    """Decode at the smallest scale that still covers the largest target."""
+    with Image.open(source) as img:
+        long_edge = max(img.size)
+    for factor, flag in REDUCED_READS:
+        if long_edge // factor >= largest:
+            return cv.imread(str(source), flag)
+    return cv.imread(str(source), cv.IMREAD_COLOR)
+
+
+def export_image(source: Path, targets, fmt: str, quality: int) -> List[Tuple[int, int]]:
+    """
+    Write every target size of one image, largest first, runs in a worker.
+
+    Returns:
+        (width, height) of each target, in the order given
+    """
+    extension, quality_flag = FORMATS[fmt]
+    ordered = sorted(targets, key=lambda t: t[0], reverse=True)
+    image = read_reduced(source, ordered[0][0])
+    if image is None:
+        raise IOError(f"Could not read {source}")
+
+    dimensions = {}
+    for size, path in ordered:
+        height, width = image.shape[:2]
+        scale = size / max(width, height)
+        if scale < 1:
+            # Each smaller size is resized from the previous one
+            image = cv.resize(
+                image,
+                (round(width * scale), round(height * scale)),
+                interpolation=cv.INTER_AREA,
+            )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{extension}"
+        if not cv.imwrite(tmp_path, image, [quality_flag, quality]):
+            raise IOError(f"Could not encode {path}")
+        os.replace(tmp_path, path)
+        dimensions[path] = (image.shape[1], image.shape[0])
+    return [dimensions[path] for _, path in targets]
+
+
+def _init_worker():
+    cv.setNumThreads(1)
+
+
+class GalleryWriter:
+    """Appends exported images to index.html and optionally a ZIP, in order."""
+
+    def __init__(self, output_dir, zip_path=None) -> None:
+        self._output_dir = output_dir
+        self._index_path = os.path.join(output_dir, "index.html")
+        os.makedirs(output_dir, exist_ok=True)
+        self._index = open(f"{self._index_path}.partial", "w", encoding="utf-8")
+        self._index.write(
+            "<!DOCTYPE html>\n<html><head><meta charset='utf-8'>"
+            "<meta name='viewport' content='width=device-width, initial-scale=1'>"
+            "<title>Photobooth gallery</title><style>"
+            "body{font-family:sans-serif;margin:1em}"
+            "img{margin:4px;border-radius:4px}</style></head><body>\n"
+        )
+        self._zip_path = zip_path
+        self._zip = (
+            zipfile.ZipFile(f"{zip_path}.partial", "w", zipfile.ZIP_STORED)
+            if zip_path
+            else None
+        )
+        self._session = None
+
+    def add(self, session: str, source: Path, targets, dimensions):
+        if session != self._session:
+            if self._session is not None:
+                self._index.write("</section>\n")
+            self._index.write(f"<section><h2>{html.escape(session)}</h2>\n")
+            self._session = session
+
+        (_, thumb_path), (_, full_path) = targets[-1], targets[0]
+        thumb_w, thumb_h = dimensions[-1]
+        self._index.write(
+            f"<a href='{quote(os.path.relpath(full_path, self._output_dir))}'>"
+            f"<img src='{quote(os.path.relpath(thumb_path, self._output_dir))}' "
+            f"width='{thumb_w}' height='{thumb_h}' loading='lazy' "
+            f"alt='{html.escape(source.stem)}'></a>\n"
+        )
+        if self._zip is not None:
+            for _, path in targets:
+                # Already compressed images, stored as is
+                self._zip.write(path, os.path.relpath(path, self._output_dir))
+
+    def close(self):
+        if self._session is not None:
+            self._index.write("</section>\n")
+        self._index.write("</body></html>\n")
+        self._index.close()
+        os.replace(f"{self._index_path}.partial", self._index_path)
+        if self._zip is not None:
+            self._zip.writestr("index.html", Path(self._index_path).read_bytes())
+            self._zip.close()
+            os.replace(f"{self._zip_path}.partial", self._zip_path)
+
+
+def export_gallery(
+    session_dirs,
+    output_dir,
+    sizes=(2048, 1024, 320),
+    fmt="jpeg",
+    quality=85,
+    zip_path=None,
+    include_photos=True,
+    workers=None,
+    max_in_flight=None,
+) -> dict:
+    """
+    Export every session as a gallery, see the module docstring.
+
+    Returns:
+        Counts of exported, reused and failed images and the wall time
+    """
+    extension = FORMATS[fmt][0]
+    sizes = sorted(set(sizes), reverse=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    writer = GalleryWriter(output_dir, zip_path)
+    stats = {"exported": 0, "reused": 0, "failed": 0}
+    start = time.perf_counter()
+
+    # (session, source, targets, future or None when the outputs are current)
+    window = deque()
+
+    def drain(limit):
+        while len(window) > limit:
+            session, source, targets, future = window.popleft()
+            try:
+                if future is None:
+                    dimensions = []
+                    for _, path in targets:
+                        with Image.open(path) as img:
+                            dimensions.append(img.size)
+                    stats["reused"] += 1
+                else:
+                    dimensions = future.result()
+                    stats["exported"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"Could not export {source}: {e}")
+                continue
+            writer.add(session, source, targets, dimensions)
+            done = stats["exported"] + stats["reused"]
+            if done % 50 == 0:
+                rate = done / (time.perf_counter() - start)
+                print(f"{done} images ({stats['reused']} reused), {rate:.1f} images/s")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for session, source in iter_sources(session_dirs, include_photos):
+            targets = _targets(output_dir, session, source, sizes, extension)
+            future = None
+            if not _is_up_to_date(source, targets):
+                future = pool.submit(export_image, source, targets, fmt, quality)
+            window.append((session, source, targets, future))
+            drain(max_in_flight)
+        drain(0)
+    writer.close()
+
+    stats["wall_s"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--session",
+        type=str,
+        nargs="+",
+        help="Session directories (default: every session in the catalog or ./session_*)",
+    )
+    parser.add_argument("--output-dir", type=str, default="./gallery")
+    parser.add_argument("--zip", type=str, help="Also pack the gallery into this ZIP")
+    parser.add_argument("--format", choices=list(FORMATS), default="jpeg")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        default="2048,1024,320",
+        help="Long edge of each output size in pixels",
+    )
+    parser.add_argument(
+        "--composites-only", action="store_true", help="Skip the captured photos"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    session_dirs = (
+        [Path(d) for d in args.session] if args.session else iter_session_dirs(os.getcwd())
+    )
+    stats = export_gallery(
+        session_dirs,
+        args.output_dir,
+        sizes=[int(s) for s in args.sizes.split(",")],
+        fmt=args.format,
+        quality=args.quality,
+        zip_path=args.zip,
+        include_photos=not args.composites_only,
+        workers=args.workers,
+    )
+    total = stats["exported"] + stats["reused"]
+    print(
+        f"Exported {stats['exported']} images, reused {stats['reused']}, "
+        f"{stats['failed']} failed in {stats['wall_s']:.1f}s "
+        f"({total / stats['wall_s']:.1f} images/s)"
+    )
+    print(f"Gallery: {os.path.join(args.output_dir, 'index.html')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,107 +1,238 @@
 #!/usr/bin/env python3
-"""Utility script to generate photo composites for all available templates."""
+"""
+Batch render photo composites of sessions for all available templates.
+
+Every session x template pair is rendered on a process pool. Templates that
+share a layout are rendered together so each session's photos are decoded
+once per layout. Outputs newer than their photos and template are skipped,
+and outputs are written atomically, so an interrupted run picks up where it
+stopped.
+
+Run from the repository root:
+    python -m utils.generate_all_composites
+    python -m utils.generate_all_composites --session ./session_20251111_003314
+    python -m utils.generate_all_composites --template Vertical --workers 4
+"""
 
 import os
 import sys
 import glob
-import cv2 as cv
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from controllers.image_processor import ImageProcessor
-from config.load_metadata import templates_config
+from typing import Dict, List, Optional
+import cv2 as cv
+from PIL import Image
+from config.load_metadata import initialize_templates_config_dict, templates_config_dict
+from controllers.image_processor import ImageProcessor, RenderQuality
+from controllers.session_catalog import SessionCatalog, default_catalog_path
+
+# One ImageProcessor per worker process, keeps decoded templates cached
+_processor = None
 
 
-def get_session_photos(session_path):
-    """Get all photo paths from a session directory."""
+def get_session_photos(session_path, catalog: Optional[SessionCatalog] = None):
+    """
+    Get the photo paths of a session directory.
+
+    The photos the guest picked, in slot order, when the catalog has them,
+    otherwise every photo in the directory.
+    """
     if not os.path.exists(session_path):
         return []
 
-    # Get all PNG images except final_composite.png
+    if catalog is not None:
+        selected = catalog.selected_photos(Path(session_path).name)
+        if selected and all(os.path.exists(p) for p in selected):
+            return selected
+
+    # Captured photos only, compacted sessions hold JPEGs
     photos = []
-    for file in sorted(glob.glob(os.path.join(session_path, "*.png"))):
-        if "final_composite" not in file and "composite_template" not in file:
-            photos.append(file)
+    for pattern in ("*.png", "*.jpg"):
+        for file in sorted(glob.glob(os.path.join(session_path, pattern))):
+            name = os.path.basename(file)
+            if (
+                "final_composite" not in name
+                and "composite_template" not in name
+                and "preview_strip" not in name
+                # Half-written re-encodes of the housekeeper
+                and ".tmp." not in name
+            ):
+                photos.append(file)
 
     return photos
 
 
-def generate_all_composites(photo_paths, output_dir=None, output_prefix="composite"):
-    """
-    Generate composites for all available templates.
+def open_catalog() -> Optional[SessionCatalog]:
+    """The session catalog of the working directory, None if there is none."""
+    catalog_path = default_catalog_path(os.getcwd())
+    return SessionCatalog(catalog_path) if os.path.exists(catalog_path) else None
 
-    Args:
-        photo_paths: List of paths to photos to use in composites
-        output_dir: Directory to save composites (defaults to current directory)
-        output_prefix: Prefix for output filenames (default: "composite")
 
-    Returns:
-        dict: Dictionary mapping template_index to output path
-    """
-    if output_dir is None:
-        output_dir = os.getcwd()
+def find_sessions(catalog: Optional[SessionCatalog] = None) -> List[str]:
+    """Session folders from the catalog, or from the working directory without one."""
+    if catalog is not None:
+        sessions = catalog.find_sessions(limit=-1)
+        return [s["folder"] for s in reversed(sessions) if os.path.isdir(s["folder"])]
+    return sorted(glob.glob("./session_*"))
 
-    os.makedirs(output_dir, exist_ok=True)
 
-    processor = ImageProcessor()
-    results = {}
+def _photos_for_slots(photo_paths, num_slots):
+    """Repeat the photos in order until every slot is filled."""
+    return [photo_paths[i % len(photo_paths)] for i in range(num_slots)]
 
-    print(f"\nGenerating composites for all {len(templates_config)} templates...")
-    print(f"Using {len(photo_paths)} photos")
-    print(f"Output directory: {output_dir}\n")
 
-    for template_index, template_info in templates_config.items():
-        num_photos_needed = template_info["num_photos"]
-        template_name = f"template{template_index}"
+def _is_up_to_date(output_path, input_paths) -> bool:
+    try:
+        output_mtime = os.path.getmtime(output_path)
+    except OSError:
+        return False
+    return all(os.path.getmtime(p) <= output_mtime for p in input_paths)
 
-        # Get the template file path
-        template_files = {
-            0: "./resources/templates/v0.1/templateup4.png",  # 2x3, 6 photos
-            1: "./resources/templates/templateup1.png",  # 4x2, 4 photos
-            2: "./resources/templates/templateup2.png",  # 1x3, 3 photos
-            3: "./resources/templates/v0.1/templateup3.png",  # 2x2, 4 photos
-        }
 
-        template_path = template_files.get(template_index)
-        if not template_path or not os.path.exists(template_path):
-            print(
-                f"Template {template_index}: Template file not found at {template_path}"
-            )
-            continue
+def plan_jobs(sessions, template_paths, output_dir, force=False):
+    """
+    Build the render jobs, one per session and template layout.
 
-        # Check if we have enough photos
-        if len(photo_paths) < num_photos_needed:
-            print(
-                f"Template {template_index}: Needs {num_photos_needed} photos, but only {len(photo_paths)} provided. Skipping."
-            )
+    Args:
+        sessions: {name: list of photo paths}
+        template_paths: Templates to render, from templates_config_dict
+        output_dir: Root directory, outputs go to <output_dir>/<name>/<template>.png
+        force: Render even if the output is up to date
+
+    Returns:
+        (jobs, number of up to date outputs skipped)
+    """
+    layouts: Dict[tuple, List[str]] = {}
+    for template_path in template_paths:
+        slots = tuple(templates_config_dict[template_path]["slots"])
+        layouts.setdefault(slots, []).append(template_path)
+
+    jobs, skipped = [], 0
+    for name, photo_paths in sessions.items():
+        if not photo_paths:
+            print(f"{name}: no photos, skipping")
             continue
+        for slots, layout_templates in layouts.items():
+            photos = _photos_for_slots(photo_paths, len(slots))
+            outputs = {}
+            for template_path in layout_templates:
+                output_path = os.path.join(
+                    output_dir, name, f"{Path(template_path).stem}.png"
+                )
+                if not force and _is_up_to_date(output_path, photos + [template_path]):
+                    skipped += 1
+                else:
+                    outputs[template_path] = output_path
+            if outputs:
+                jobs.append({"name": name, "photos": photos, "outputs": outputs})
+    return jobs, skipped
+
+
+def _init_worker():
+    global _processor
+    # Parallelism comes from the pool, not from OpenCV's own threads
+    cv.setNumThreads(1)
+    if not templates_config_dict:
+        initialize_templates_config_dict()
+    _processor = ImageProcessor()
+
+
+def _render_job(job, quality: RenderQuality):
+    """Render one session for every template of a layout, runs in a worker process."""
+    start = time.perf_counter()
+    composites = _processor.create_photo_composites(
+        job["photos"], list(job["outputs"]), quality
+    )
+    dpi = ImageProcessor._get_image_dpi(job["photos"][0])
+    for template_path, output_path in job["outputs"].items():
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = f"{output_path}.tmp.png"
+        rgb = cv.cvtColor(composites[template_path], cv.COLOR_BGR2RGB)
+        Image.fromarray(rgb).save(tmp_path, dpi=dpi)
+        # Never leave a partial output that looks finished to the next run
+        os.replace(tmp_path, output_path)
+    return (time.perf_counter() - start) * 1000
 
-        # Use the required number of photos (cycle if we have more)
-        photos_to_use = photo_paths[:num_photos_needed]
 
-        print(f"Template {template_index} ({template_info['num_photos']} photos)...")
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
 
-        try:
-            composite = processor.create_photo_composite(
-                photo_paths=photos_to_use,
-                template_path=template_path,
-                template_index=template_index,
-            )
 
-            # Save the composite
-            output_filename = f"{output_prefix}_template{template_index}.png"
-            output_path = os.path.join(output_dir, output_filename)
-            cv.imwrite(output_path, composite)
+def run_batch(jobs, workers=None, quality=RenderQuality.PRINT) -> dict:
+    """
+    Render jobs on a process pool and report progress as they finish.
+
+    Returns:
+        Summary with rendered, failed, wall time, throughput and latencies
+    """
+    total = sum(len(job["outputs"]) for job in jobs)
+    latencies = []
+    rendered = failed = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_render_job, job, quality): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            count = len(job["outputs"])
+            try:
+                elapsed_ms = future.result()
+            except Exception as e:
+                failed += count
+                print(f"Error rendering {job['name']}: {e}")
+                continue
+            rendered += count
+            latencies.extend([elapsed_ms / count] * count)
+            print(
+                f"[{rendered + failed}/{total}] {job['name']}: {count} composites "
+                f"in {elapsed_ms:.0f} ms"
+            )
 
-            results[template_index] = output_path
-            print(f"Saved: {output_path}")
+    wall_s = time.perf_counter() - start
+    summary = {
+        "rendered": rendered,
+        "failed": failed,
+        "wall_s": wall_s,
+        "throughput": rendered / wall_s if wall_s else 0.0,
+    }
+    if latencies:
+        summary.update(
+            p50_ms=_percentile(latencies, 0.50),
+            p95_ms=_percentile(latencies, 0.95),
+            max_ms=max(latencies),
+        )
+    return summary
+
+
+def generate_all_composites(
+    photo_paths, output_dir=None, output_prefix="composite", workers=None, force=False
+):
+    """
+    Generate composites of one photo set for all available templates.
 
-        except Exception as e:
-            print(f"Error generating composite for template {template_index}: {e}")
-            import traceback
+    Args:
+        photo_paths: List of paths to photos to use in composites
+        output_dir: Directory to save composites (defaults to current directory)
+        output_prefix: Sub directory for this photo set (default: "composite")
 
-            traceback.print_exc()
+    Returns:
+        dict: Dictionary mapping template path to output path
+    """
+    if output_dir is None:
+        output_dir = os.getcwd()
+    if not templates_config_dict:
+        initialize_templates_config_dict()
 
-    print(f"\n✨ Generated {len(results)} composites successfully!")
-    return results
+    jobs, _ = plan_jobs(
+        {output_prefix: photo_paths}, list(templates_config_dict), output_dir, force
+    )
+    run_batch(jobs, workers)
+    return {
+        template_path: os.path.join(output_dir, output_prefix, f"{Path(template_path).stem}.png")
+        for template_path in templates_config_dict
+    }
 
 
 def main():
@@ -109,14 +240,20 @@ def main():
     import argparse
 
     parser = argparse.ArgumentParser(
-        description="Generate photo composites for all available templates"
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
     )
     parser.add_argument(
-        "--session", type=str, help="Path to session directory containing photos"
+        "--session",
+        type=str,
+        nargs="+",
+        help="Session directories (default: every session in the catalog or ./session_*)",
     )
     parser.add_argument(
         "--photos", type=str, nargs="+", help="List of photo paths to use"
     )
+    parser.add_argument(
+        "--template", type=str, help="Only templates whose path contains this text"
+    )
     parser.add_argument(
         "--output-dir",
         type=str,
@@ -127,55 +264,63 @@ def main():
         "--output-prefix",
         type=str,
         default="composite",
-        help="Prefix for output filenames (default: composite)",
+        help="Output sub directory for --photos (default: composite)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: CPU count)"
+    )
+    parser.add_argument(
+        "--quality",
+        choices=[q.value for q in RenderQuality],
+        default=RenderQuality.PRINT.value,
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Render outputs that are up to date too"
     )
 
     args = parser.parse_args()
+    initialize_templates_config_dict()
 
     # Determine which photos to use
-    photo_paths = []
-
-    if args.session:
-        print(f"Loading photos from session: {args.session}")
-        photo_paths = get_session_photos(args.session)
-        if not photo_paths:
-            print(f"Error: No photos found in session directory: {args.session}")
-            sys.exit(1)
-    elif args.photos:
-        photo_paths = args.photos
+    if args.photos:
+        sessions = {args.output_prefix: args.photos}
     else:
-        # Try to find the most recent session
-        sessions = sorted(glob.glob("./session_*"), reverse=True)
-        if sessions:
-            latest_session = sessions[0]
-            print(f"No photos specified, using latest session: {latest_session}")
-            photo_paths = get_session_photos(latest_session)
-
-        if not photo_paths:
-            print("Error: No photos specified and no sessions found.")
-            print("\nUsage examples:")
-            print(
-                "  python generate_all_composites.py --session ./session_20251111_003314"
-            )
-            print(
-                "  python generate_all_composites.py --photos photo1.png photo2.png photo3.png photo4.png photo5.png photo6.png"
-            )
-            sys.exit(1)
-
-    print(f"Found {len(photo_paths)} photos:")
-    for i, path in enumerate(photo_paths, 1):
-        print(f"  {i}. {path}")
-
-    # Generate composites
-    results = generate_all_composites(
-        photo_paths=photo_paths,
-        output_dir=args.output_dir,
-        output_prefix=args.output_prefix,
+        catalog = open_catalog()
+        session_dirs = args.session or find_sessions(catalog)
+        sessions = {Path(d).name: get_session_photos(d, catalog) for d in session_dirs}
+    if not sessions:
+        print("Error: No photos specified and no sessions found.")
+        print("\nUsage examples:")
+        print(
+            "  python -m utils.generate_all_composites --session ./session_20251111_003314"
+        )
+        print(
+            "  python -m utils.generate_all_composites --photos photo1.png photo2.png photo3.png photo4.png"
+        )
+        sys.exit(1)
+
+    template_paths = [
+        p for p in templates_config_dict if not args.template or args.template in p
+    ]
+    jobs, skipped = plan_jobs(sessions, template_paths, args.output_dir, args.force)
+    print(
+        f"{len(sessions)} sessions x {len(template_paths)} templates: "
+        f"{sum(len(j['outputs']) for j in jobs)} to render, {skipped} up to date"
     )
+    if not jobs:
+        return
 
-    print("\n📂 Output files:")
-    for template_index, output_path in sorted(results.items()):
-        print(f"  Template {template_index}: {output_path}")
+    summary = run_batch(jobs, args.workers, RenderQuality(args.quality))
+    print(
+        f"\nRendered {summary['rendered']} composites ({summary['failed']} failed) "
+        f"in {summary['wall_s']:.1f}s, {summary['throughput']:.2f} composites/s"
+    )
+    if "p50_ms" in summary:
+        print(
+            f"Per composite latency: p50 {summary['p50_ms']:.0f} ms, "
+            f"p95 {summary['p95_ms']:.0f} ms, max {summary['max_ms']:.0f} ms"
+        )
+    print(f"📂 Output directory: {args.output_dir}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Generate contact sheets of every final composite of an event.
+
+Pages are a grid of slots laid out with ImageProcessor.grid_slots, each
+composite is fitted into its slot whole. Sources are decoded at reduced
+resolution on a thread pool with a bounded window, placed on a single page
+canvas and each page is written as soon as it is full, so memory stays flat
+however many sessions there are.
+
+Run from the repository root:
+    python -m utils.generate_contact_sheets
+    python -m utils.generate_contact_sheets --columns 16 --page-size 11x17 --dpi 300
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import cv2 as cv
+import numpy as np
+from PIL import Image
+from controllers.image_processor import ImageProcessor, RenderQuality
+from utils.export_gallery import iter_session_dirs, iter_sources, read_reduced
+
+BACKGROUND = 255
+
+
+def _parse_size(value: str):
+    width, height = value.lower().split("x")
+    return float(width), float(height)
+
+
+def _thumbnail(processor: ImageProcessor, source: Path, width: int, height: int):
+    """Decode at reduced resolution and fit into a width x height slot."""
+    image = read_reduced(source, max(width, height))
+    if image is None:
+        raise IOError(f"Could not read {source}")
+    return processor.fit_photo_in_slot(
+        image, width, height, RenderQuality.PREVIEW, BACKGROUND
+    )
+
+
+class ContactSheetWriter:
+    """Places thumbnails on a reused page canvas and writes each full page."""
+
+    def __init__(
+        self, output_dir, page_px, slots, caption_px, dpi, prefix="contact_sheet"
+    ) -> None:
+        self._output_dir = output_dir
+        self._slots = slots
+        self._caption_px = caption_px
+        self._dpi = dpi
+        self._prefix = prefix
+        self._page = np.full((page_px[1], page_px[0], 3), BACKGROUND, dtype=np.uint8)
+        self._count = 0
+        self.pages = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def add(self, thumbnail: np.ndarray, caption: str):
+        x, y, w, h = self._slots[self._count]
+        self._page[y : y + thumbnail.shape[0], x : x + w] = thumbnail
+        if self._caption_px:
+            caption = caption.removeprefix("session_")
+            (text_w, _), _ = cv.getTextSize(caption, cv.FONT_HERSHEY_SIMPLEX, 1, 1)
+            scale = min(self._caption_px / 30, w / text_w)
+            cv.putText(
+                self._page,
+                caption,
+                (x, y + h - self._caption_px // 4),
+                cv.FONT_HERSHEY_SIMPLEX,
+                scale,
+                (60, 60, 60),
+                max(1, round(scale)),
+                cv.LINE_AA,
+            )
+        self._count += 1
+        if self._count == len(self._slots):
+            self.flush()
+
+    def flush(self):
+        if not self._count:
+            return
+        path = os.path.join(
+            self._output_dir, f"{self._prefix}_{len(self.pages) + 1:03d}.jpg"
+        )
+        tmp_path = f"{path}.tmp.jpg"
+        rgb = cv.cvtColor(self._page, cv.COLOR_BGR2RGB)
+        Image.fromarray(rgb).save(tmp_path, quality=90, dpi=(self._dpi, self._dpi))
+        os.replace(tmp_path, path)
+        print(f"Page {len(self.pages) + 1}: {self._count} composites -> {path}")
+        self.pages.append(path)
+        self._page[:] = BACKGROUND
+        self._count = 0
+
+
+def generate_contact_sheets(
+    session_dirs,
+    output_dir,
+    page_size_in=(8.5, 11),
+    dpi=200,
+    columns=10,
+    rows=None,
+    margin_in=0.25,
+    gap_in=0.05,
+    captions=True,
+    workers=None,
+) -> list:
+    """
+    Write contact sheets of the final composites of every session.
+
+    Args:
+        session_dirs: Session folders, may be a generator
+        page_size_in: (width, height) of a page in inches
+        columns: Thumbnails per row
+        rows: Rows per page, by default as many 3:2 cells as fit
+
+    Returns:
+        Paths of the written pages
+    """
+    page_px = (round(page_size_in[0] * dpi), round(page_size_in[1] * dpi))
+    margin, gap = round(margin_in * dpi), round(gap_in * dpi)
+    cell_w = (page_px[0] - 2 * margin - (columns - 1) * gap) // columns
+    caption_px = max(8, cell_w // 10) if captions else 0
+    if rows is None:
+        # Composites are 3:2 either way round, landscape cells waste least
+        cell_h = cell_w * 2 // 3 + caption_px
+        rows = max(1, (page_px[1] - 2 * margin + gap) // (cell_h + gap))
+    slots = ImageProcessor.grid_slots(page_px[0], page_px[1], columns, rows, margin, gap)
+    _, _, slot_w, slot_h = slots[0]
+    thumb_h = slot_h - caption_px
+
+    processor = ImageProcessor()
+    writer = ContactSheetWriter(output_dir, page_px, slots, caption_px, dpi)
+    workers = workers or os.cpu_count() or 1
+    window = deque()
+    placed = failed = 0
+    start = time.perf_counter()
+    print(f"{columns}x{rows} composites per page at {dpi} DPI")
+
+    def drain(limit):
+        nonlocal placed, failed
+        while len(window) > limit:
+            session, source, future = window.popleft()
+            try:
+                thumbnail = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Could not add {source}: {e}")
+                continue
+            writer.add(thumbnail, session)
+            placed += 1
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="contact_sheet") as pool:
+        for session, source in iter_sources(session_dirs, include_photos=False):
+            future = pool.submit(_thumbnail, processor, source, slot_w, thumb_h)
+            window.append((session, source, future))
+            drain(workers * 4)
+        drain(0)
+    writer.flush()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Placed {placed} composites ({failed} failed) on {len(writer.pages)} pages "
+        f"in {elapsed:.1f}s"
+    )
+    return writer.pages
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--session",
+        type=str,
+        nargs="+",
+        help="Session directories (default: every session in the catalog or ./session_*)",
+    )
+    parser.add_argument("--output-dir", type=str, default="./contact_sheets")
+    parser.add_argument("--page-size", type=str, default="8.5x11", help="Inches, WxH")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=None)
+    parser.add_argument("--margin", type=float, default=0.25, help="Inches")
+    parser.add_argument("--no-captions", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    # Parallelism comes from the thread pool, not from OpenCV's own threads
+    cv.setNumThreads(1)
+    session_dirs = (
+        [Path(d) for d in args.session] if args.session else iter_session_dirs(os.getcwd())
+    )
+    pages = generate_contact_sheets(
+        session_dirs,
+        args.output_dir,
+        page_size_in=_parse_size(args.page_size),
+        dpi=args.dpi,
+        columns=args.columns,
+        rows=args.rows,
+        margin_in=args.margin,
+        captions=not args.no_captions,
+        workers=args.workers,
+    )
+    if pages:
+        print(f"📂 Output directory: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
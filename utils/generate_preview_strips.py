@@ -2,12 +2,42 @@
 """Generate preview strips (half vertical cut) for template composites."""
 
 import os
+from pathlib import Path
 import cv2 as cv
-from controllers.image_processor import ImageProcessor
+from controllers.image_processor import ImageProcessor, RenderQuality
+
+
+def _photos_for_composite(photo_paths, num_photos):
+    """Duplicate the selected photos to fill all slots, the composite is cropped later."""
+    if num_photos == 2:
+        # Duplicate photos: [photo1, photo2, photo1, photo2]
+        return photo_paths + photo_paths
+    elif num_photos == 4:
+        # Duplicate photos: [photo1, photo2, photo3, photo1, photo2, photo3]
+        return photo_paths + photo_paths
+    return photo_paths
+
+
+def _save_preview_strip(composite, output_path):
+    """Crop the left column of a composite and save it as a preview strip."""
+    # Crop the composite based on template type
+    # 2x2 and 4x2: take left column (left half)
+    height, width = composite.shape[:2]
+    half_width = width // 2
+    composite_half = composite[:, :half_width].copy()
+    cv.imwrite(output_path, composite_half)
+    print(f"Generated preview strip: {output_path}")
+    return output_path
 
 
 def generate_preview_strip(
-    photo_paths, num_photos, template_path, output_dir, output_prefix="preview_strip"
+    photo_paths,
+    num_photos,
+    template_path,
+    output_dir,
+    output_prefix="preview_strip",
+    processor=None,
+    quality=RenderQuality.PREVIEW,
 ):
     """
     Generate a preview strip with selected photos.
@@ -18,6 +48,8 @@ def generate_preview_strip(
         template_path: Path to the selected template
         output_dir: Directory to save the preview strip
         output_prefix: Prefix for output filename
+        processor: ImageProcessor to render with (a new one if None)
+        quality: Resampling tier, previews default to RenderQuality.PREVIEW
 
     Returns:
         str: Path to generated preview strip, or None if generation failed
@@ -33,45 +65,21 @@ def generate_preview_strip(
         return None
 
     try:
-        # Load the template
-        template = cv.imread(template_path)
-        if template is None:
-            print(f"Failed to load template from {template_path}")
-            return None
-
         # Create composite using ImageProcessor
-        processor = ImageProcessor()
-
-        # Prepare photos for composite
-        # We'll duplicate the photos to fill all slots, then crop later
-        if num_photos == 2:
-            # Duplicate photos: [photo1, photo2, photo1, photo2]
-            photos_for_composite = photo_paths + photo_paths
-        elif num_photos == 4:
-            # Duplicate photos: [photo1, photo2, photo3, photo1, photo2, photo3]
-            photos_for_composite = photo_paths + photo_paths
-        else:
-            photos_for_composite = photo_paths
+        if processor is None:
+            processor = ImageProcessor()
 
         # Create a full composite first, then crop it
         composite = processor.create_photo_composite(
-            photo_paths=photos_for_composite,
+            photo_paths=_photos_for_composite(photo_paths, num_photos),
             template_path=template_path,
+            quality=quality,
         )
 
-        # Crop the composite based on template type
-        # 2x2 and 4x2: take left column (left half)
-        height, width = composite.shape[:2]
-        half_width = width // 2
-        composite_half = composite[:, :half_width].copy()
-
         # Save the preview strip
         output_filename = f"{output_prefix}_{num_photos}photos.png"
         output_path = os.path.join(output_dir, output_filename)
-        cv.imwrite(output_path, composite_half)
-
-        print(f"Generated preview strip: {output_path}")
-        return output_path
+        return _save_preview_strip(composite, output_path)
 
     except Exception as e:
         print(f"Error generating preview strip: {e}")
@@ -79,3 +87,68 @@ def generate_preview_strip(
 
         traceback.print_exc()
         return None
+
+
+def generate_preview_strips(
+    photo_paths,
+    num_photos,
+    template_paths,
+    output_dir,
+    output_prefix="preview_strip",
+    processor=None,
+    quality=RenderQuality.PREVIEW,
+):
+    """
+    Generate preview strips of the same photos for several templates sharing a layout.
+
+    The photos are fitted to the slots once and written into every template
+    in a single pass, see ImageProcessor.create_photo_composites.
+
+    Args:
+        photo_paths: List of paths to photos
+        num_photos: Number of photos
+        template_paths: Paths to templates with the same layout
+        output_dir: Directory to save the preview strips
+        output_prefix: Prefix for output filenames, the template name is appended
+        processor: ImageProcessor to render with (a new one if None)
+        quality: Resampling tier, previews default to RenderQuality.PREVIEW
+
+    Returns:
+        dict: Template path to generated preview strip path, failed templates are omitted
+    """
+    if len(photo_paths) != num_photos:
+        print(f"Error: Expected {num_photos} photos, got {len(photo_paths)}")
+        return {}
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    existing = [p for p in template_paths if os.path.exists(p)]
+    for template_path in set(template_paths) - set(existing):
+        print(f"Template not found at {template_path}")
+
+    try:
+        if processor is None:
+            processor = ImageProcessor()
+
+        composites = processor.create_photo_composites(
+            photo_paths=_photos_for_composite(photo_paths, num_photos),
+            template_paths=existing,
+            quality=quality,
+        )
+
+        results = {}
+        for template_path in existing:
+            template_name = Path(template_path).stem
+            output_filename = f"{output_prefix}_{template_name}_{num_photos}photos.png"
+            output_path = os.path.join(output_dir, output_filename)
+            results[template_path] = _save_preview_strip(
+                composites[template_path], output_path
+            )
+        return results
+
+    except Exception as e:
+        print(f"Error generating preview strips: {e}")
+        import traceback
+
+        traceback.print_exc()
+        return {}
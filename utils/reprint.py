@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Find sessions in the catalog and reprint their final composite.
+
+Run from the repository root:
+    python -m utils.reprint --list --since 2025-06-01 --template Vertical
+    python -m utils.reprint --list --status failed
+    python -m utils.reprint --session session_20250601_183000 --strips 4
+    python -m utils.reprint --latest
+"""
+
+import datetime
+import os
+import sys
+import time
+from concurrent.futures import Future
+from dotenv import load_dotenv
+from controllers.composite_pipeline import CompositePipeline
+from controllers.image_processor import ImageProcessor
+from controllers.imposition import create_imposer_from_env
+from controllers.print_preparation import create_preparer_from_env
+from controllers.print_spooler import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_PRINTING,
+    JOB_QUEUED,
+    JOB_RENDERING,
+    PrintSpooler,
+    create_printers_from_env,
+)
+from controllers.session_catalog import SessionCatalog, default_catalog_path
+from controllers.session_storage import create_session_storage_from_env
+
+
+def parse_time(value: str) -> float:
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def format_time(timestamp) -> str:
+    if not timestamp:
+        return "-"
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def list_sessions(catalog: SessionCatalog, args):
+    sessions = catalog.find_sessions(
+        since=parse_time(args.since) if args.since else None,
+        until=parse_time(args.until) if args.until else None,
+        template=args.template,
+        print_state=args.status,
+        limit=args.limit,
+    )
+    for session in sessions:
+        jobs = catalog.print_jobs(session["id"])
+        states = ", ".join(f"{job['strips']} strips {job['state']}" for job in jobs)
+        template = os.path.basename(session["template_path"] or "") or "-"
+        print(
+            f"{session['id']}  {format_time(session['created_at'])}  "
+            f"{template:<32} {states or 'not printed'}"
+        )
+    print(f"{len(sessions)} sessions")
+
+
+def find_composite(catalog: SessionCatalog, storage, session: dict) -> str:
+    """Path of the session's final composite, rendered again only if it is gone."""
+    composite = catalog.latest_composite(session["id"])
+    if composite is not None:
+        path = storage.resolve(composite["path"])
+        if os.path.exists(path):
+            print(f"Reusing final composite {path}")
+            return path
+
+    # Sessions recorded before selections were kept use every photo
+    photo_paths = catalog.selected_photos(session["id"]) or catalog.session_photos(
+        session["id"]
+    )
+    template_path = session["template_path"]
+    if not template_path or not photo_paths:
+        raise FileNotFoundError(f"No composite or photos left for {session['id']}")
+
+    print(f"Final composite missing, rendering {session['id']} again")
+    from config.load_metadata import initialize_templates_config_dict
+
+    initialize_templates_config_dict()
+    rendered = Future()
+    rendered.set_result(ImageProcessor().create_photo_composite(photo_paths, template_path))
+    path = CompositePipeline._save(rendered, photo_paths, session["folder"])
+    catalog.add_composite(session["id"], path, template_path)
+    return path
+
+
+def reprint(catalog: SessionCatalog, session: dict, strips: int, timeout: float):
+    base_dir = os.getcwd()
+    storage = create_session_storage_from_env(base_dir)
+    composite_path = find_composite(catalog, storage, session)
+
+    # Separate queue from the booth's so a running booth does not pick it up twice
+    spool_dir = os.path.join(
+        os.getenv("PRINT_SPOOL_DIR", os.path.join(base_dir, "print_spool")), "reprints"
+    )
+    spooler = PrintSpooler(
+        create_printers_from_env(),
+        spool_dir=spool_dir,
+        imposer=create_imposer_from_env(),
+        preparer=create_preparer_from_env(os.path.join(spool_dir, "prepared")),
+        path_resolver=storage.resolve,
+    )
+    job_id = spooler.submit(composite_path, strips=strips, session_id=session["id"])
+
+    deadline = time.time() + timeout
+    job = spooler.get_job(job_id)
+    while job["state"] not in (JOB_DONE, JOB_FAILED) and time.time() < deadline:
+        time.sleep(0.2)
+        job = spooler.get_job(job_id)
+    if job["state"] not in (JOB_DONE, JOB_FAILED):
+        # Otherwise the next reprint run would recover and print it
+        if not spooler.cancel(job_id, f"timed out after {timeout:.0f}s"):
+            print(f"Reprint {job_id} is already on the printer, not cancelled")
+        job = spooler.get_job(job_id)
+    spooler.stop()
+    catalog.record_print_job(job)
+    print(f"Reprint {job_id}: {job['state']}")
+    return job["state"] == JOB_DONE
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--list", action="store_true", help="List matching sessions")
+    target.add_argument("--session", type=str, help="Session id to reprint")
+    target.add_argument("--latest", action="store_true", help="Reprint the latest session")
+    parser.add_argument("--since", type=str, help="ISO date or time, e.g. 2025-06-01T18:00")
+    parser.add_argument("--until", type=str, help="ISO date or time")
+    parser.add_argument("--template", type=str, help="Part of the template file name")
+    parser.add_argument(
+        "--status",
+        choices=[JOB_QUEUED, JOB_RENDERING, JOB_PRINTING, JOB_DONE, JOB_FAILED],
+        help="Print job state",
+    )
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--strips", type=int, default=2, help="Strips to print")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Add session folders made before the catalog existed",
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    catalog = SessionCatalog(default_catalog_path(os.getcwd()))
+    if args.backfill:
+        print(f"Added {catalog.backfill(os.getcwd())} sessions to the catalog")
+
+    if args.list:
+        list_sessions(catalog, args)
+        return
+
+    session = catalog.latest_session() if args.latest else catalog.get_session(args.session)
+    if session is None:
+        print("Session not found in the catalog, try --backfill")
+        sys.exit(1)
+    if not reprint(catalog, session, args.strips, args.timeout):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,6 @@
 import os
 from pathlib import Path
 
-from PySide6.QtCore import QUrl
-from PySide6.QtMultimedia import QSoundEffect
-
 
 def get_png_file_paths(directory_path):
     """
@@ -36,6 +33,10 @@ def clear_layout(layout):
 
 
 def load_sound_effect(file_path):
+    # Imported here so QtMultimedia is only loaded once a screen needs sound
+    from PySide6.QtCore import QUrl
+    from PySide6.QtMultimedia import QSoundEffect
+
     effect = QSoundEffect()
     abs_path = os.path.abspath(file_path)
     effect.setSource(QUrl.fromLocalFile(abs_path))